@@ -0,0 +1,174 @@
+"""
+HTTP API for NexusAI
+This module serves the service layer over an async HTTP API, with streaming chat responses.
+
+Run with: python api_server.py --host 0.0.0.0 --port 8000
+"""
+
+import json
+import argparse
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel
+import service
+from instrumentation import get_metrics_registry
+from index_manager import WorkspaceAccessDenied
+from warmup import DEFAULT_API_STEPS, configured_steps, get_warmup_report, run_warmup
+
+# Load environment variables
+load_dotenv()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm up before uvicorn starts accepting connections"""
+    await run_in_threadpool(run_warmup, configured_steps("NEXUSAI_API_WARMUP", DEFAULT_API_STEPS))
+    yield
+
+app = FastAPI(title="NexusAI API", lifespan=lifespan)
+
+class ChatRequest(BaseModel):
+    messages: List[Dict[str, str]]
+    model: str = service.DEFAULT_CHAT_MODEL
+    temperature: float = 0.7
+    max_tokens: int = 1024
+    top_p: float = 1.0
+    stream: bool = False
+
+class ImageAnalysisRequest(BaseModel):
+    image_base64: str
+    prompt: Optional[str] = None
+    model: Optional[str] = None
+
+class ImageGenerationRequest(BaseModel):
+    prompt: str
+    size: Optional[str] = None
+    provider: Optional[str] = None
+    style: Optional[str] = None
+    quality: Optional[str] = None
+
+class SpeechRequest(BaseModel):
+    text: str
+    voice: Optional[str] = None
+    model: Optional[str] = None
+    output_format: str = "wav"
+
+class TranscriptionRequest(BaseModel):
+    audio_base64: str
+    filename: Optional[str] = None
+    model: Optional[str] = None
+    language: Optional[str] = None
+    temperature: Optional[float] = None
+    compress: Optional[bool] = None
+
+class DocumentRequest(BaseModel):
+    name: str
+    content_base64: str
+    access_key: Optional[str] = None
+
+class DocumentQueryRequest(BaseModel):
+    query: str
+    model: Optional[str] = None
+    access_key: Optional[str] = None
+    chat_history: Optional[List[List[str]]] = None
+
+async def run(operation: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Run a blocking service operation on the thread pool, mapping failures to HTTP errors"""
+    try:
+        params = service.decode_params(operation, {k: v for k, v in params.items() if v is not None})
+        return await run_in_threadpool(service.run_operation, operation, params)
+    except service.ProviderUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except service.ProviderError as e:
+        raise HTTPException(status_code=502, detail=f"Provider request failed: {e}")
+    except service.ServiceError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except WorkspaceAccessDenied as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Provider request failed: {e}")
+
+@app.get("/health")
+async def health():
+    """Report that the server is up"""
+    return {"status": "ok"}
+
+@app.get("/ready")
+async def ready():
+    """Report the warm-up timings, or 503 until warm-up has finished"""
+    report = get_warmup_report()
+    if report is None:
+        raise HTTPException(status_code=503, detail="Warming up")
+    return report
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Expose provider metrics in the Prometheus text format"""
+    return PlainTextResponse(get_metrics_registry().render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.post("/v1/chat")
+async def chat(request: ChatRequest):
+    """Chat completion; with stream=true the reply is sent as server-sent events"""
+    params = request.model_dump(exclude={"stream"})
+    if not request.stream:
+        return await run("chat", params)
+
+    def events():
+        try:
+            for text in service.chat_stream(**params):
+                yield f"data: {json.dumps({'content': text})}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+        yield "data: [DONE]\n\n"
+
+    # Starlette iterates synchronous generators on its thread pool
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@app.post("/v1/images/analyze")
+async def image_analysis(request: ImageAnalysisRequest):
+    """Analyze a base64-encoded image"""
+    return await run("image_analysis", request.model_dump())
+
+@app.post("/v1/images/generate")
+async def image_generation(request: ImageGenerationRequest):
+    """Generate an image and return its URL"""
+    return await run("image_generation", request.model_dump())
+
+@app.post("/v1/audio/speech")
+async def speech(request: SpeechRequest):
+    """Synthesize speech and return the encoded audio"""
+    result = await run("speech", request.model_dump())
+    media_type = service.AUDIO_MEDIA_TYPES.get(result["format"], "application/octet-stream")
+    return Response(content=result["audio"], media_type=media_type)
+
+@app.post("/v1/audio/transcriptions")
+async def transcription(request: TranscriptionRequest):
+    """Transcribe base64-encoded audio"""
+    return await run("transcription", request.model_dump())
+
+@app.post("/v1/documents/{collection}")
+async def document_ingest(collection: str, request: DocumentRequest):
+    """Add a base64-encoded document to a collection"""
+    return await run("document_ingest", {"collection": collection, **request.model_dump()})
+
+@app.post("/v1/documents/{collection}/query")
+async def document_query(collection: str, request: DocumentQueryRequest):
+    """Ask a question about a collection's documents"""
+    return await run("document_query", {"collection": collection, **request.model_dump()})
+
+def main():
+    """Parse arguments and serve the API with uvicorn"""
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve the NexusAI HTTP API")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes")
+    args = parser.parse_args()
+    uvicorn.run("api_server:app", host=args.host, port=args.port, workers=args.workers)
+
+if __name__ == "__main__":
+    main()
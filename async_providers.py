@@ -0,0 +1,256 @@
+"""
+Async Providers for NexusAI
+This module runs provider requests on one shared asyncio event loop using the async OpenAI and Groq clients.
+
+Page code keeps calling the provider functions in the feature modules with a client from
+get_async_client(). Those functions pass the client's coroutine to resolve(), which runs it on the
+loop. Waiting for it costs the Streamlit script thread nothing but the wait, and the socket work for
+every session shares one loop and one connection pool per provider.
+"""
+
+import os
+import asyncio
+import inspect
+import threading
+from concurrent.futures import Future, wait as wait_futures
+from contextlib import contextmanager
+from typing import Any, Awaitable, Dict, Optional
+from openai import AsyncAzureOpenAI, AsyncOpenAI
+from groq import AsyncGroq
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from concurrency import CancellationScope, RequestCancelled, current_scope, use_scope
+from session_utils import get_session_id, on_session_end
+
+# How often a waiting script thread checks whether Streamlit wants to rerun or stop it
+POLL_INTERVAL_SECONDS = 0.1
+
+class ProviderLoop:
+    """An asyncio event loop on a daemon thread that runs provider requests for every session"""
+
+    def __init__(self, max_in_flight: int):
+        """
+        Start the loop thread
+
+        Args:
+            max_in_flight: Most provider requests awaited at once; the rest queue on the loop
+        """
+        self.loop = asyncio.new_event_loop()
+        self.semaphore = asyncio.Semaphore(max_in_flight)
+        self.lock = threading.Lock()
+        self.pending = set()
+        self.thread = threading.Thread(target=self._run, name="provider-loop", daemon=True)
+        self.thread.start()
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    async def _bounded(self, awaitable: Awaitable) -> Any:
+        async with self.semaphore:
+            return await awaitable
+
+    def submit(self, awaitable: Awaitable, scope: Optional[CancellationScope] = None) -> Future:
+        """
+        Schedule a coroutine on the loop
+
+        Args:
+            awaitable: Coroutine making the provider request
+            scope: Cancellation scope the request belongs to
+
+        Returns:
+            Future: Resolves to the coroutine's result; cancelling it cancels the request
+        """
+        future = asyncio.run_coroutine_threadsafe(self._bounded(awaitable), self.loop)
+        with self.lock:
+            self.pending.add(future)
+        future.add_done_callback(self._forget)
+        if scope is not None:
+            scope.add(future)
+        return future
+
+    def _forget(self, future: Future) -> None:
+        with self.lock:
+            self.pending.discard(future)
+
+    def in_flight(self) -> int:
+        """Count the submitted requests that haven't finished"""
+        with self.lock:
+            return len(self.pending)
+
+class RequestTracker:
+    """The latest request scope of each page of each session"""
+
+    def __init__(self):
+        """Initialize with no scopes"""
+        self.lock = threading.Lock()
+        # (session id, page) -> CancellationScope
+        self.scopes = {}
+
+    def begin(self, session_id: str, page: str) -> CancellationScope:
+        """
+        Open a new scope for a page, cancelling the page's previous one
+
+        Returns:
+            CancellationScope: Scope for the requests of this run of the page
+        """
+        scope = CancellationScope()
+        with self.lock:
+            previous = self.scopes.get((session_id, page))
+            self.scopes[(session_id, page)] = scope
+        if previous is not None:
+            previous.cancel()
+        return scope
+
+    def cancel(self, session_id: str, page: Optional[str] = None) -> None:
+        """Cancel the requests of one page of a session, or of all its pages"""
+        with self.lock:
+            keys = [key for key in self.scopes if key[0] == session_id and page in (None, key[1])]
+            scopes = [self.scopes.pop(key) for key in keys]
+        for scope in scopes:
+            scope.cancel()
+
+_provider_loop = None
+_provider_loop_lock = threading.Lock()
+
+def get_provider_loop() -> ProviderLoop:
+    """Get the process-wide provider loop, starting it on first use"""
+    global _provider_loop
+    with _provider_loop_lock:
+        if _provider_loop is None:
+            _provider_loop = ProviderLoop(int(os.getenv("NEXUSAI_MAX_IN_FLIGHT", "256")))
+        return _provider_loop
+
+_request_tracker = None
+_request_tracker_lock = threading.Lock()
+
+def get_request_tracker() -> RequestTracker:
+    """Get the process-wide request tracker; an ended session's requests are cancelled"""
+    global _request_tracker
+    with _request_tracker_lock:
+        if _request_tracker is None:
+            _request_tracker = RequestTracker()
+            on_session_end(_request_tracker.cancel)
+        return _request_tracker
+
+@contextmanager
+def page_request(page: str):
+    """
+    Run one rerun of a page in a fresh cancellation scope
+
+    Whatever the page's previous run still has in flight, such as batch workers a rerun left behind,
+    is cancelled, so only the latest request per page uses provider capacity.
+    """
+    scope = get_request_tracker().begin(get_session_id(), page)
+    with use_scope(scope):
+        yield scope
+
+def _interrupt_requested(ctx) -> bool:
+    """Check, without consuming it, whether Streamlit has a rerun or stop pending for this script run"""
+    requests = getattr(ctx, "script_requests", None) if ctx is not None else None
+    state = getattr(requests, "_state", None)
+    return state is not None and getattr(state, "name", "CONTINUE") != "CONTINUE"
+
+def wait(future: Future) -> Any:
+    """
+    Wait for a submitted request from a script or worker thread
+
+    On a Streamlit script thread the request is cancelled as soon as a rerun or stop is pending, e.g.
+    because the user switched pages, and the next st call then hands control back to Streamlit.
+
+    Raises:
+        RequestCancelled: If the request was cancelled before it finished
+    """
+    ctx = get_script_run_ctx(suppress_warning=True)
+    while True:
+        done, _ = wait_futures([future], timeout=POLL_INTERVAL_SECONDS if ctx is not None else None)
+        if done:
+            break
+        if _interrupt_requested(ctx):
+            future.cancel()
+            raise RequestCancelled("The request was cancelled because the page was rerun")
+    if future.cancelled():
+        raise RequestCancelled("The request was cancelled")
+    return future.result()
+
+def resolve(value: Any) -> Any:
+    """
+    Return value, first running it on the provider loop if it is awaitable
+
+    This lets one provider function serve both the synchronous clients used by the service layer
+    and the async clients used by the pages. The request joins the current cancellation scope, and
+    its result is dropped if the scope is cancelled while it runs.
+
+    Raises:
+        RequestCancelled: If the scope was cancelled before or while the request ran
+    """
+    if not inspect.isawaitable(value):
+        return value
+    scope = current_scope()
+    if scope is not None and scope.cancelled:
+        if inspect.iscoroutine(value):
+            # Close the coroutine that will never run so Python doesn't warn about it
+            value.close()
+        scope.check()
+    result = wait(get_provider_loop().submit(value, scope))
+    if scope is not None:
+        scope.check()
+    return result
+
+def is_async_client(client: Any) -> bool:
+    """Check whether a client returns coroutines"""
+    return isinstance(client, (AsyncOpenAI, AsyncGroq))
+
+def _client_settings(provider: str) -> Optional[tuple]:
+    """Read a provider's connection settings from the environment; None when it isn't configured"""
+    if provider in ("groq", "whisper"):
+        settings = (os.getenv("GROQ_API_KEY"), os.getenv("GROQ_BASE_URL", "https://api.groq.com").rstrip("/"))
+    elif provider == "openai":
+        settings = (os.getenv("OPENAI_API_KEY"), os.getenv("OPENAI_BASE_URL"))
+    elif provider == "azure":
+        settings = (
+            os.getenv("AZURE_OPENAI_API_KEY"),
+            os.getenv("AZURE_OPENAI_ENDPOINT"),
+            os.getenv("OPENAI_API_VERSION", "2024-04-01-preview")
+        )
+    else:
+        raise ValueError(f"Unknown provider: {provider}")
+    required = settings[:2] if provider == "azure" else settings[:1]
+    return settings if all(required) else None
+
+def _create_client(provider: str, settings: tuple) -> Any:
+    """Build the async client for a provider"""
+    if provider == "groq":
+        return AsyncOpenAI(api_key=settings[0], base_url=settings[1] + "/openai/v1")
+    if provider == "whisper":
+        return AsyncGroq(api_key=settings[0], base_url=settings[1])
+    if provider == "openai":
+        return AsyncOpenAI(api_key=settings[0], base_url=settings[1])
+    return AsyncAzureOpenAI(api_key=settings[0], azure_endpoint=settings[1], api_version=settings[2])
+
+_clients: Dict[str, tuple] = {}
+_clients_lock = threading.Lock()
+
+def get_async_client(provider: str) -> Any:
+    """
+    Get the process-wide async client for a provider
+
+    Clients are shared by every session so their connection pools are reused, and are rebuilt when
+    the API Setup page changes the provider's settings.
+
+    Args:
+        provider: "groq" (chat, vision and speech), "whisper" (Groq transcription), "openai" or "azure"
+
+    Returns:
+        The client, or None if the provider's API key isn't set
+    """
+    settings = _client_settings(provider)
+    if settings is None:
+        return None
+    with _clients_lock:
+        current = _clients.get(provider)
+        if current is not None and current[0] == settings:
+            return current[1]
+        # Requests still running on a replaced client keep it alive until they finish
+        client = _create_client(provider, settings)
+        _clients[provider] = (settings, client)
+        return client
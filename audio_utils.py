@@ -0,0 +1,188 @@
+"""
+Audio Utilities for NexusAI
+This module provides helpers for joining and converting audio shared by the TTS and STT modules.
+"""
+
+import io
+import wave
+import shutil
+import subprocess
+from typing import List, Tuple
+import numpy as np
+
+# Formats whose chunks can be joined sample-exactly into one playable file. MP3 and AAC chunks each
+# carry their own encoder delay and padding (and MP3 its own ID3/Xing headers), so they aren't
+JOINABLE_FORMATS = ("wav", "pcm")
+
+# Whisper resamples everything to 16 kHz mono, so anything more is wasted upload
+WHISPER_SAMPLE_RATE = 16000
+
+def join_audio_chunks(chunks: List[bytes], audio_format: str) -> bytes:
+    """
+    Join encoded audio chunks into a single gapless file
+
+    WAV chunks are decoded and their frames rewritten under one header. Raw PCM has no header,
+    so it is concatenated directly.
+
+    Args:
+        chunks: Encoded audio chunks in playback order
+        audio_format: One of JOINABLE_FORMATS
+
+    Returns:
+        bytes: The joined audio file
+    """
+    if audio_format not in JOINABLE_FORMATS:
+        raise ValueError(f"Cannot join {audio_format} audio chunks")
+
+    if audio_format != "wav":
+        return b"".join(chunks)
+
+    output = io.BytesIO()
+    writer = None
+    for chunk in chunks:
+        with wave.open(io.BytesIO(chunk), "rb") as reader:
+            if writer is None:
+                writer = wave.open(output, "wb")
+                writer.setparams(reader.getparams())
+            # Streamed WAV headers may carry a placeholder length, so read until exhausted
+            while True:
+                frames = reader.readframes(65536)
+                if not frames:
+                    break
+                writer.writeframes(frames)
+    if writer is not None:
+        writer.close()
+    return output.getvalue()
+
+def ffmpeg_available() -> bool:
+    """Check whether the ffmpeg binary is on the PATH"""
+    return shutil.which("ffmpeg") is not None
+
+def decode_audio(path: str, sample_rate: int = WHISPER_SAMPLE_RATE) -> Tuple[np.ndarray, int]:
+    """
+    Decode an audio file to mono 16-bit PCM samples
+
+    ffmpeg is used when available and resamples to sample_rate. Without it only WAV files can be
+    decoded, and they keep their native sample rate.
+
+    Returns:
+        tuple: (int16 sample array, sample rate)
+    """
+    if ffmpeg_available():
+        result = subprocess.run(
+            ["ffmpeg", "-nostdin", "-v", "error", "-i", path, "-f", "s16le", "-ac", "1", "-ar", str(sample_rate), "-"],
+            capture_output=True,
+            check=True
+        )
+        return np.frombuffer(result.stdout, dtype=np.int16), sample_rate
+
+    try:
+        with wave.open(path, "rb") as reader:
+            channels = reader.getnchannels()
+            sample_width = reader.getsampwidth()
+            native_rate = reader.getframerate()
+            frames = reader.readframes(reader.getnframes())
+    except wave.Error:
+        raise ValueError("ffmpeg is required to decode this audio format")
+
+    if sample_width != 2:
+        raise ValueError("ffmpeg is required to decode audio that isn't 16-bit PCM")
+    samples = np.frombuffer(frames, dtype=np.int16)
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1).astype(np.int16)
+    return samples, native_rate
+
+def encode_wav(samples: np.ndarray, sample_rate: int) -> bytes:
+    """Encode mono 16-bit PCM samples as a WAV file"""
+    output = io.BytesIO()
+    with wave.open(output, "wb") as writer:
+        writer.setnchannels(1)
+        writer.setsampwidth(2)
+        writer.setframerate(sample_rate)
+        writer.writeframes(samples.astype(np.int16).tobytes())
+    return output.getvalue()
+
+def resample(samples: np.ndarray, from_rate: int, to_rate: int) -> np.ndarray:
+    """Resample mono 16-bit PCM, low-pass filtering first when downsampling"""
+    if from_rate == to_rate or len(samples) == 0:
+        return samples
+    signal = samples.astype(np.float32)
+    if to_rate < from_rate:
+        # Windowed-sinc low-pass at the new Nyquist frequency to avoid aliasing
+        cutoff = 0.5 * to_rate / from_rate
+        taps = np.arange(-32, 33)
+        kernel = 2 * cutoff * np.sinc(2 * cutoff * taps) * np.hamming(len(taps))
+        signal = np.convolve(signal, kernel / kernel.sum(), mode="same")
+    positions = np.arange(0, len(signal) - 1, from_rate / to_rate)
+    resampled = np.interp(positions, np.arange(len(signal)), signal)
+    return np.clip(resampled, -32768, 32767).astype(np.int16)
+
+def encode_for_upload(samples: np.ndarray, sample_rate: int) -> Tuple[bytes, str]:
+    """
+    Encode mono 16-bit PCM compactly for upload
+
+    Uses lossless FLAC through ffmpeg when available, otherwise WAV.
+
+    Returns:
+        tuple: (encoded bytes, file extension)
+    """
+    if ffmpeg_available():
+        result = subprocess.run(
+            ["ffmpeg", "-nostdin", "-v", "error", "-f", "s16le", "-ac", "1", "-ar", str(sample_rate), "-i", "-",
+             "-c:a", "flac", "-f", "flac", "-"],
+            input=samples.astype(np.int16).tobytes(),
+            capture_output=True,
+            check=True
+        )
+        return result.stdout, "flac"
+    return encode_wav(samples, sample_rate), "wav"
+
+def compress_for_transcription(path: str) -> Tuple[bytes, str]:
+    """
+    Decode, downmix and resample audio to 16 kHz mono, then re-encode it compactly
+
+    Returns:
+        tuple: (encoded bytes, file extension)
+    """
+    samples, sample_rate = decode_audio(path, WHISPER_SAMPLE_RATE)
+    samples = resample(samples, sample_rate, WHISPER_SAMPLE_RATE)
+    return encode_for_upload(samples, WHISPER_SAMPLE_RATE)
+
+def find_silence_cuts(
+    samples: np.ndarray,
+    sample_rate: int,
+    max_chunk_seconds: float,
+    search_seconds: float = 30.0,
+    window_seconds: float = 0.05
+) -> List[int]:
+    """
+    Choose cut points so no chunk exceeds max_chunk_seconds, preferring the quietest window
+
+    Each cut is placed at the lowest-energy window within the last search_seconds before the
+    chunk limit, so words are rarely split.
+
+    Returns:
+        list: Sample offsets of the cuts, starting with 0 and ending with len(samples)
+
+    Raises:
+        ValueError: If max_chunk_seconds is shorter than one sample
+    """
+    window = max(1, int(window_seconds * sample_rate))
+    max_chunk = int(max_chunk_seconds * sample_rate)
+    if max_chunk < 1:
+        raise ValueError(f"Chunk length must be positive, got {max_chunk_seconds}s")
+    search = min(int(search_seconds * sample_rate), max_chunk // 2)
+
+    cuts = [0]
+    while len(samples) - cuts[-1] > max_chunk:
+        limit = cuts[-1] + max_chunk
+        region = samples[limit - search:limit].astype(np.float32)
+        usable = len(region) // window * window
+        if usable == 0:
+            cuts.append(limit)
+            continue
+        energy = np.sqrt(np.mean(region[:usable].reshape(-1, window) ** 2, axis=1))
+        quietest = int(np.argmin(energy))
+        cuts.append(limit - search + quietest * window + window // 2)
+    cuts.append(len(samples))
+    return cuts
@@ -0,0 +1,231 @@
+"""
+Blob Store Module for NexusAI
+This module provides a content-addressed, disk-backed store for history images and audio with per-history quotas.
+"""
+
+import os
+import io
+import time
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional
+from history_store import get_history_store, on_entries_deleted
+
+THUMBNAIL_SIZE = (256, 256)
+# History entry fields holding the digest of a stored blob
+HISTORY_MEDIA_FIELDS = ("image_hash", "audio_hash")
+
+class BlobStore:
+    """
+    Content-addressed blob store shared by all sessions in the process
+
+    References are owned by history keys rather than Streamlit sessions, so the media of a saved
+    history outlives the session that created it; they are released when the history is cleared or pruned.
+    References are kept in memory, so after a restart they are rebuilt from the history with adopt().
+    """
+
+    def __init__(self, root: str, owner_quota_bytes: int, orphan_age_seconds: int = 6 * 3600):
+        """
+        Initialize the blob store
+
+        Args:
+            root: Directory where blobs are written
+            owner_quota_bytes: Maximum bytes a single history may reference
+            orphan_age_seconds: Age after which unreferenced files are removed by remove_orphans()
+        """
+        self.root = root
+        self.owner_quota_bytes = owner_quota_bytes
+        self.orphan_age_seconds = orphan_age_seconds
+        self.lock = threading.Lock()
+        # owner -> OrderedDict(digest -> [size, refs]) in least-recently-used order
+        self.owners = {}
+        # digest -> number of owners referencing the blob
+        self.refcounts = {}
+        os.makedirs(self.root, exist_ok=True)
+
+    def _blob_path(self, digest: str) -> str:
+        """Get the on-disk path for a digest"""
+        return os.path.join(self.root, digest[:2], digest)
+
+    def put(self, data: bytes, owner: str) -> str:
+        """
+        Store bytes and reference them from an owner
+
+        Args:
+            data: The blob contents
+            owner: The history key that owns the reference
+
+        Returns:
+            str: The sha256 digest addressing the blob
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+
+        # Check, write and reference under one lock, so a concurrent release can't delete the file in between
+        with self.lock:
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                # Write atomically so readers never see a partial blob
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+                with os.fdopen(fd, "wb") as tmp_file:
+                    tmp_file.write(data)
+                os.replace(tmp_path, path)
+
+            entries = self.owners.setdefault(owner, OrderedDict())
+            if digest in entries:
+                entries[digest][1] += 1
+                entries.move_to_end(digest)
+            else:
+                entries[digest] = [len(data), 1]
+                self.refcounts[digest] = self.refcounts.get(digest, 0) + 1
+            self._evict(owner, keep=digest)
+
+        return digest
+
+    def adopt(self, digest: str, owner: str) -> bool:
+        """
+        Reference a blob that is already on disk, e.g. one a history entry kept across a restart
+
+        Returns:
+            bool: False if the blob no longer exists
+        """
+        path = self._blob_path(digest)
+        with self.lock:
+            if not os.path.exists(path):
+                return False
+            entries = self.owners.setdefault(owner, OrderedDict())
+            if digest in entries:
+                entries[digest][1] += 1
+            else:
+                entries[digest] = [os.path.getsize(path), 1]
+                self.refcounts[digest] = self.refcounts.get(digest, 0) + 1
+        return True
+
+    def get(self, digest: str, owner: Optional[str] = None) -> Optional[bytes]:
+        """Load a blob, or None if it has been evicted"""
+        if owner is not None:
+            with self.lock:
+                entries = self.owners.get(owner)
+                if entries and digest in entries:
+                    entries.move_to_end(digest)
+
+        try:
+            with open(self._blob_path(digest), "rb") as blob_file:
+                return blob_file.read()
+        except FileNotFoundError:
+            return None
+
+    def path(self, digest: str) -> Optional[str]:
+        """Get the path of a stored blob, or None if it has been evicted"""
+        path = self._blob_path(digest)
+        return path if os.path.exists(path) else None
+
+    def release(self, digest: str, owner: str) -> None:
+        """Drop one of an owner's references to a blob"""
+        with self.lock:
+            entries = self.owners.get(owner)
+            if not entries or digest not in entries:
+                return
+            entries[digest][1] -= 1
+            if entries[digest][1] <= 0:
+                del entries[digest]
+                self._unreference(digest)
+
+    def release_owner(self, owner: str) -> None:
+        """Drop every reference held by an owner"""
+        with self.lock:
+            entries = self.owners.pop(owner, None) or {}
+            for digest in entries:
+                self._unreference(digest)
+
+    def owner_usage(self, owner: str) -> int:
+        """Get the number of bytes referenced by an owner"""
+        with self.lock:
+            return sum(size for size, _ in self.owners.get(owner, {}).values())
+
+    def remove_orphans(self) -> int:
+        """
+        Delete old files that nothing references, e.g. blobs of histories pruned while the process was down
+
+        Returns:
+            int: Number of files removed
+        """
+        cutoff = time.time() - self.orphan_age_seconds
+        removed = 0
+        with self.lock:
+            for directory, _, file_names in os.walk(self.root):
+                for file_name in file_names:
+                    path = os.path.join(directory, file_name)
+                    # Partial writes left by a crash have temporary names and are never referenced
+                    if file_name in self.refcounts or os.path.getmtime(path) >= cutoff:
+                        continue
+                    try:
+                        os.remove(path)
+                        removed += 1
+                    except FileNotFoundError:
+                        pass
+        return removed
+
+    def _evict(self, owner: str, keep: str) -> None:
+        """Evict an owner's least recently used blobs until it fits its quota (lock held)"""
+        entries = self.owners[owner]
+        usage = sum(size for size, _ in entries.values())
+        for digest in list(entries):
+            if usage <= self.owner_quota_bytes:
+                break
+            if digest == keep:
+                continue
+            usage -= entries.pop(digest)[0]
+            self._unreference(digest)
+
+    def _unreference(self, digest: str) -> None:
+        """Decrement a blob's refcount and delete it once unreferenced (lock held)"""
+        count = self.refcounts.get(digest, 0) - 1
+        if count > 0:
+            self.refcounts[digest] = count
+            return
+        self.refcounts.pop(digest, None)
+        try:
+            os.remove(self._blob_path(digest))
+        except FileNotFoundError:
+            pass
+
+def make_thumbnail(image_bytes: bytes, max_size=THUMBNAIL_SIZE) -> Optional[bytes]:
+    """Create a small JPEG thumbnail, or None if the image can't be decoded"""
+    try:
+        from PIL import Image
+
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            image.thumbnail(max_size)
+            buffer = io.BytesIO()
+            image.convert("RGB").save(buffer, format="JPEG", quality=80)
+            return buffer.getvalue()
+    except Exception:
+        return None
+
+_blob_store = None
+_blob_store_lock = threading.Lock()
+
+def _release_history_media(history_key: str, entries: list) -> None:
+    """Release the blobs referenced by cleared or pruned history entries"""
+    for entry in entries:
+        for field in HISTORY_MEDIA_FIELDS:
+            if entry.get(field):
+                _blob_store.release(entry[field], history_key)
+
+def get_blob_store() -> BlobStore:
+    """Get the process-wide blob store configured from the environment"""
+    global _blob_store
+    with _blob_store_lock:
+        if _blob_store is None:
+            root = os.getenv("NEXUSAI_BLOB_DIR", os.path.join(tempfile.gettempdir(), "nexusai_blobs"))
+            quota_mb = int(os.getenv("NEXUSAI_SESSION_BLOB_QUOTA_MB", "200"))
+            _blob_store = BlobStore(root, quota_mb * 1024 * 1024)
+            # Restore the references of saved histories, then sweep what they no longer reference
+            for history_key, digest in get_history_store().media_references(HISTORY_MEDIA_FIELDS):
+                _blob_store.adopt(digest, history_key)
+            _blob_store.remove_orphans()
+            on_entries_deleted(_release_history_media)
+        return _blob_store
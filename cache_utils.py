@@ -0,0 +1,160 @@
+"""
+Cache Utilities for NexusAI
+This module provides thread-safe caches with LRU and TTL eviction shared by the provider modules.
+"""
+
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+class LRUCache:
+    """In-memory cache with least-recently-used and time-to-live eviction"""
+
+    def __init__(self, max_entries=1000, ttl_seconds=None):
+        """
+        Initialize the cache
+
+        Args:
+            max_entries: Maximum number of entries kept
+            ttl_seconds: Seconds an entry stays valid, or None to never expire
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _expired(self, stored_at, now):
+        """Check whether an entry stored at stored_at has outlived the TTL"""
+        return self.ttl_seconds is not None and now - stored_at > self.ttl_seconds
+
+    def get(self, key, default=None):
+        """Get a value and mark it as recently used"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return default
+            value, stored_at = entry
+            if self._expired(stored_at, time.time()):
+                del self.entries[key]
+                return default
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        """Store a value, evicting the least recently used entries if full"""
+        with self.lock:
+            self.entries[key] = (value, time.time())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def touch(self, key):
+        """Mark an entry as recently used without reading it"""
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+
+    def items(self):
+        """Get a snapshot of the unexpired (key, value) pairs"""
+        now = time.time()
+        with self.lock:
+            for key in [key for key, (_, stored_at) in self.entries.items() if self._expired(stored_at, now)]:
+                del self.entries[key]
+            return [(key, value) for key, (value, _) in self.entries.items()]
+
+    def clear(self):
+        """Remove every entry"""
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        with self.lock:
+            return len(self.entries)
+
+class DiskCache:
+    """Persistent content-addressed cache of byte values with a size quota and LRU eviction"""
+
+    def __init__(self, root, max_bytes):
+        """
+        Initialize the cache, indexing entries left by earlier runs
+
+        Args:
+            root: Directory where entries are written
+            max_bytes: Maximum total size of cached entries
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        # key -> size in least-recently-used order
+        self.index = OrderedDict()
+        self.total_bytes = 0
+        os.makedirs(self.root, exist_ok=True)
+
+        entries = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name.startswith(".") or not os.path.isfile(path):
+                continue
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(entries):
+            self.index[name] = size
+            self.total_bytes += size
+
+    @staticmethod
+    def make_key(*parts, suffix=""):
+        """Build a cache key by hashing the given parts"""
+        digest = hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode("utf-8")).hexdigest()
+        return f"{digest}{suffix}"
+
+    def path(self, key):
+        """Get the path of a cached entry and mark it as recently used, or None on a miss"""
+        with self.lock:
+            if key not in self.index:
+                return None
+            path = os.path.join(self.root, key)
+            if not os.path.exists(path):
+                self.total_bytes -= self.index.pop(key)
+                return None
+            self.index.move_to_end(key)
+            # The mtime doubles as the recency order when the index is rebuilt
+            os.utime(path)
+            return path
+
+    def get(self, key):
+        """Get a cached value, or None on a miss"""
+        path = self.path(key)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def set(self, key, data):
+        """Store a value, evicting least recently used entries to stay within the quota"""
+        path = os.path.join(self.root, key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".")
+        with os.fdopen(fd, "wb") as tmp_file:
+            tmp_file.write(data)
+        os.replace(tmp_path, path)
+
+        with self.lock:
+            if key in self.index:
+                self.total_bytes -= self.index.pop(key)
+            self.index[key] = len(data)
+            self.total_bytes += len(data)
+            for old_key in list(self.index):
+                if self.total_bytes <= self.max_bytes or old_key == key:
+                    break
+                self.total_bytes -= self.index.pop(old_key)
+                try:
+                    os.remove(os.path.join(self.root, old_key))
+                except FileNotFoundError:
+                    pass
+        return path
@@ -5,8 +5,11 @@ This module provides chat functionality using Groq's LLM API.
 
 import streamlit as st
 import os
-import time
+import json
 from openai import OpenAI
+from instrumentation import track_call
+from async_providers import get_async_client, resolve
+from media_utils import clear_history, load_history_page, save_history_entry
 
 def initialize_chat_client():
     """Initialize the chat client with Groq API"""
@@ -17,7 +20,7 @@ def initialize_chat_client():
     try:
         client = OpenAI(
             api_key=groq_api_key,
-            base_url="https://api.groq.com/openai/v1"
+            base_url=os.getenv("GROQ_BASE_URL", "https://api.groq.com").rstrip("/") + "/openai/v1"
         )
         return client
     except Exception as e:
@@ -30,27 +33,55 @@ def chat_completion(client, messages, model, temperature=0.7, max_tokens=1024, t
         return "Error: Groq API key not set. Please enter your Groq API key in the API Setup page."
 
     try:
-        response = client.chat.completions.create(
+        with track_call("groq", "chat", model) as call:
+            call.add_request_bytes(len(json.dumps(messages).encode("utf-8")))
+            response = resolve(client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                top_p=top_p
+            ))
+            content = response.choices[0].message.content
+            call.add_usage(response.usage)
+            call.add_response_bytes(len((content or "").encode("utf-8")))
+        return content
+    except Exception as e:
+        return f"Error: {str(e)}"
+
+def chat_completion_stream(client, messages, model, temperature=0.7, max_tokens=1024, top_p=1.0):
+    """Stream chat completion text from Groq as it is generated"""
+    if not client:
+        raise ValueError("Groq API key not set. Please enter your Groq API key in the API Setup page.")
+
+    with track_call("groq", "chat_stream", model) as call:
+        call.add_request_bytes(len(json.dumps(messages).encode("utf-8")))
+        stream = client.chat.completions.create(
             model=model,
             messages=messages,
             temperature=temperature,
             max_tokens=max_tokens,
-            top_p=top_p
+            top_p=top_p,
+            stream=True
         )
-        return response.choices[0].message.content
-    except Exception as e:
-        return f"Error: {str(e)}"
+        for chunk in stream:
+            # Groq reports usage on the final chunk under x_groq
+            x_groq = getattr(chunk, "x_groq", None)
+            usage = getattr(chunk, "usage", None)
+            if usage is None and x_groq is not None:
+                usage = x_groq.get("usage") if isinstance(x_groq, dict) else getattr(x_groq, "usage", None)
+            call.add_usage(usage)
+            if chunk.choices and chunk.choices[0].delta.content:
+                call.first_byte()
+                call.add_response_bytes(len(chunk.choices[0].delta.content.encode("utf-8")))
+                yield chunk.choices[0].delta.content
 
 def display_chat_interface():
     """Display the chat interface"""
     st.title("💬 Chat with AI")
     
-    # Initialize chat history
-    if 'chat_history' not in st.session_state:
-        st.session_state.chat_history = []
-    
-    # Initialize client
-    client = initialize_chat_client()
+    # Shared async client; requests run on the provider loop
+    client = get_async_client("groq")
     
     # Model selection and parameters
     col1, col2 = st.columns(2)
@@ -63,17 +94,18 @@ def display_chat_interface():
     with col2:
         temperature = st.slider("Temperature:", 0.0, 1.0, 0.7, 0.1)
     
-    # Display chat history
-    for chat in st.session_state.chat_history:
+    # Display one page of chat history, oldest message first
+    history = load_history_page("chat", "messages")
+    for chat in reversed(history):
         with st.chat_message("user"):
             st.markdown(chat['message'])
         with st.chat_message("assistant"):
             st.markdown(chat['response'])
 
     # Clear chat history button
-    if st.session_state.chat_history:
+    if history:
         if st.button("Clear Chat History"):
-            st.session_state.chat_history = []
+            clear_history("chat")
             st.rerun()
         st.markdown("---")
 
@@ -97,8 +129,4 @@ def display_chat_interface():
                 st.markdown(response)
 
                 # Save to history
-                st.session_state.chat_history.append({
-                    'message': prompt,
-                    'response': response,
-                    'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
-                })
+                save_history_entry("chat", {'message': prompt, 'response': response}, f"{prompt}\n{response}")
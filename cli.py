@@ -0,0 +1,80 @@
+"""
+Batch CLI for NexusAI
+This module runs JSONL files of requests through the service layer with bounded concurrency.
+
+Each input line is {"id": ..., "operation": ..., "params": {...}}. Binary parameters are given
+as "<name>_base64" or as a local file via "<name>_path". Each output line is
+{"id", "operation", "status", "result" or "error", "latency"} in completion order.
+
+Run with: python cli.py requests.jsonl -o results.jsonl --concurrency 8
+"""
+
+import sys
+import json
+import time
+import argparse
+from dotenv import load_dotenv
+from concurrency import run_concurrently
+import service
+
+# Load environment variables
+load_dotenv()
+
+def read_requests(lines):
+    """Parse JSONL request lines, yielding malformed lines as errors instead of stopping"""
+    for line_number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict) or "operation" not in request:
+                raise ValueError("expected an object with an operation")
+        except ValueError as e:
+            request = {"id": line_number, "operation": None, "error": f"Line {line_number}: {e}"}
+        request.setdefault("id", line_number)
+        yield request
+
+def run_request(request):
+    """Run one request, returning its output record"""
+    if request.get("error"):
+        raise service.ServiceError(request["error"])
+    start_time = time.perf_counter()
+    params = service.decode_params(request["operation"], request.get("params") or {}, allow_paths=True)
+    result = service.run_operation(request["operation"], params)
+    return service.encode_result(result), time.perf_counter() - start_time
+
+def main():
+    """Parse arguments and run the batch"""
+    parser = argparse.ArgumentParser(description="Run a JSONL batch of NexusAI requests")
+    parser.add_argument("input", help="JSONL request file, or - for stdin")
+    parser.add_argument("-o", "--output", default="-", help="JSONL result file, or - for stdout")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="Maximum requests in flight")
+    args = parser.parse_args()
+
+    input_file = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    output_file = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    requests, failures = [], 0
+    try:
+        requests = list(read_requests(input_file))
+        # Provider rate limits are applied per call inside the service layer
+        for request, outcome, error in run_concurrently(run_request, requests, max_workers=args.concurrency):
+            record = {"id": request["id"], "operation": request.get("operation")}
+            if error is None:
+                record.update(status="ok", result=outcome[0], latency=round(outcome[1], 3))
+            else:
+                failures += 1
+                record.update(status="error", error=str(error))
+            output_file.write(json.dumps(record) + "\n")
+            output_file.flush()
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+        if output_file is not sys.stdout:
+            output_file.close()
+
+    print(f"{len(requests) - failures} succeeded, {failures} failed", file=sys.stderr)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,244 @@
+"""
+Concurrency Utilities for NexusAI
+This module provides shared rate limiting and bounded concurrent execution for the batch modes.
+"""
+
+import os
+import threading
+import time
+import contextvars
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+
+# Default request budgets per provider (requests per minute)
+DEFAULT_REQUESTS_PER_MINUTE = {
+    "groq": 30,
+    "openai": 50,
+    "azure": 50,
+}
+
+# Longest a rate-limited wait sleeps before re-checking its cancellation scope
+SCOPE_POLL_SECONDS = 0.25
+
+class RequestCancelled(Exception):
+    """Raised in place of a result when a provider request was cancelled before it finished"""
+
+class CancellationScope:
+    """A group of requests cancelled together, e.g. everything one run of a page started"""
+
+    def __init__(self):
+        """Initialize an open scope with no requests"""
+        self.lock = threading.Lock()
+        self.cancelled = False
+        self.futures = set()
+
+    def add(self, future):
+        """Track a request's future, cancelling it at once if the scope already is"""
+        with self.lock:
+            cancelled = self.cancelled
+            if not cancelled:
+                self.futures.add(future)
+        if cancelled:
+            future.cancel()
+            return
+        future.add_done_callback(self._discard)
+
+    def _discard(self, future):
+        with self.lock:
+            self.futures.discard(future)
+
+    def cancel(self):
+        """Cancel the scope's unfinished requests; anything it starts later is refused"""
+        with self.lock:
+            self.cancelled = True
+            futures = list(self.futures)
+            self.futures.clear()
+        for future in futures:
+            future.cancel()
+
+    def check(self):
+        """Raise RequestCancelled if the scope was cancelled"""
+        if self.cancelled:
+            raise RequestCancelled("Superseded by a newer request")
+
+_current_scope = contextvars.ContextVar("cancellation_scope", default=None)
+
+def current_scope():
+    """Get the cancellation scope of the running code, or None"""
+    return _current_scope.get()
+
+@contextmanager
+def use_scope(scope):
+    """Run the with block, and worker calls it starts through run_concurrently, in a cancellation scope"""
+    token = _current_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _current_scope.reset(token)
+
+class RateLimiter:
+    """Thread-safe token bucket that limits requests per minute"""
+
+    def __init__(self, requests_per_minute):
+        """Initialize the limiter with a full bucket"""
+        self.capacity = max(1, int(requests_per_minute))
+        self.tokens = float(self.capacity)
+        self.refill_rate = self.capacity / 60.0
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, scope=None):
+        """
+        Block until a request token is available
+
+        With a cancellation scope, the scope is checked before every attempt and then once more, so a
+        superseded request stops waiting and never takes a token from the latest one.
+
+        Raises:
+            RequestCancelled: If the scope is cancelled
+        """
+        while True:
+            if scope is not None:
+                scope.check()
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    break
+                wait_time = (1 - self.tokens) / self.refill_rate
+            # Wake up regularly while a scope may be cancelled
+            time.sleep(wait_time if scope is None else min(wait_time, SCOPE_POLL_SECONDS))
+        if scope is not None:
+            scope.check()
+
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+def get_rate_limiter(provider):
+    """Get the process-wide rate limiter for a provider
+
+    The budget is read from <PROVIDER>_REQUESTS_PER_MINUTE (e.g. GROQ_REQUESTS_PER_MINUTE).
+    """
+    with _rate_limiters_lock:
+        if provider not in _rate_limiters:
+            default_rpm = DEFAULT_REQUESTS_PER_MINUTE.get(provider, 60)
+            rpm = int(os.getenv(f"{provider.upper()}_REQUESTS_PER_MINUTE", default_rpm))
+            _rate_limiters[provider] = RateLimiter(rpm)
+        return _rate_limiters[provider]
+
+def run_concurrently(func, items, max_workers=4, rate_limiter=None):
+    """
+    Run func over items with a bounded worker pool
+
+    Workers run in the caller's cancellation scope. Once it is cancelled, items that haven't started
+    fail with RequestCancelled instead of calling func.
+
+    Args:
+        func: Callable applied to each item
+        items: Iterable of work items
+        max_workers: Maximum number of requests in flight
+        rate_limiter: Optional RateLimiter acquired before each call
+
+    Yields:
+        tuple: (item, result, error) in completion order; error is None on success
+    """
+    def call(item):
+        scope = current_scope()
+        if scope:
+            scope.check()
+        if rate_limiter:
+            rate_limiter.acquire(scope)
+        return func(item)
+
+    executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+    try:
+        # Each worker call gets its own copy of the caller's context, and with it the scope
+        futures = {executor.submit(contextvars.copy_context().run, call, item): item for item in items}
+        for future in as_completed(futures):
+            item = futures[future]
+            try:
+                yield item, future.result(), None
+            except Exception as e:
+                yield item, None, e
+    finally:
+        # Don't block a Streamlit rerun on work that hasn't started yet
+        executor.shutdown(wait=False, cancel_futures=True)
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into a single execution"""
+
+    def __init__(self):
+        """Initialize with no calls in flight"""
+        self.calls = {}
+        self.lock = threading.Lock()
+
+    def do(self, key, func):
+        """
+        Run func unless an identical call is already in flight, then share its outcome
+
+        Returns:
+            tuple: (result, shared) where shared is True if another caller did the work
+        """
+        with self.lock:
+            future = self.calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self.calls[key] = future
+
+        if not leader:
+            return future.result(), True
+
+        try:
+            result = func()
+            future.set_result(result)
+            return result, False
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+
+class ReadWriteLock:
+    """Many concurrent readers or one writer; a waiting writer holds back new readers"""
+
+    def __init__(self):
+        """Initialize an unlocked lock"""
+        self.condition = threading.Condition()
+        self.readers = 0
+        self.writer = False
+        self.writers_waiting = 0
+
+    @contextmanager
+    def read(self):
+        """Hold the lock shared for the duration of the with block"""
+        with self.condition:
+            while self.writer or self.writers_waiting:
+                self.condition.wait()
+            self.readers += 1
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.readers -= 1
+                if self.readers == 0:
+                    self.condition.notify_all()
+
+    @contextmanager
+    def write(self):
+        """Hold the lock exclusively for the duration of the with block"""
+        with self.condition:
+            self.writers_waiting += 1
+            while self.writer or self.readers:
+                self.condition.wait()
+            self.writers_waiting -= 1
+            self.writer = True
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.writer = False
+                self.condition.notify_all()
@@ -0,0 +1,96 @@
+"""
+Diagnostics Module for NexusAI
+This module displays provider latency, token usage, payload sizes and errors recorded in this process.
+"""
+
+import os
+import streamlit as st
+from instrumentation import get_metrics_registry
+from warmup import get_warmup_report
+
+def format_bytes(size):
+    """Format a byte count for display"""
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+def display_diagnostics_interface():
+    """Display the diagnostics interface"""
+    st.title("🩺 Diagnostics")
+    st.markdown("Provider calls made by every session since this server process started.")
+
+    report = get_warmup_report()
+    if report:
+        with st.expander(f"Warm-up took {report['total_seconds']:.2f}s at server start"):
+            st.dataframe(
+                [
+                    {'Step': r['step'], 'Status': r['status'], 'Time (s)': r['seconds'], 'Detail': r['detail']}
+                    for r in report['steps']
+                ],
+                use_container_width=True
+            )
+
+    registry = get_metrics_registry()
+    rows, errors = registry.summarize()
+
+    if not rows:
+        st.info("No provider calls recorded yet.")
+        return
+
+    total_calls = sum(row['calls'] for row in rows)
+    total_errors = sum(row['errors'] for row in rows)
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Calls", total_calls)
+    col2.metric("Error rate", f"{total_errors / total_calls:.1%}" if total_calls else "0%")
+    col3.metric("Tokens", sum(row['prompt_tokens'] + row['completion_tokens'] for row in rows))
+    col4.metric("Estimated cost", f"${sum(row['cost_usd'] for row in rows):.4f}")
+
+    st.subheader("Per Operation")
+    st.dataframe(
+        [
+            {
+                'Provider': row['provider'],
+                'Operation': row['operation'],
+                'Calls': row['calls'],
+                'Errors': row['errors'],
+                'p50 latency (s)': row['p50_s'],
+                'p95 latency (s)': row['p95_s'],
+                'p50 TTFB (s)': row['p50_ttfb_s'],
+                'Prompt tokens': row['prompt_tokens'],
+                'Completion tokens': row['completion_tokens'],
+                'Sent': format_bytes(row['bytes_sent']),
+                'Received': format_bytes(row['bytes_received']),
+                'Cost ($)': row['cost_usd'],
+            }
+            for row in rows
+        ],
+        use_container_width=True
+    )
+    st.caption("Latency percentiles are estimated from histogram buckets. Cost needs NEXUSAI_PRICING_FILE.")
+
+    if errors:
+        st.subheader("Errors")
+        st.dataframe(
+            [
+                {'Provider': e['provider'], 'Operation': e['operation'], 'Error': e['error_class'], 'Count': e['count']}
+                for e in sorted(errors, key=lambda e: -e['count'])
+            ],
+            use_container_width=True
+        )
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button(
+            "Download Prometheus metrics",
+            registry.render_prometheus(),
+            file_name="nexusai_metrics.txt",
+            mime="text/plain"
+        )
+    with col2:
+        # Metrics are shared by every session, so any visitor could wipe them unless resets are enabled
+        if os.getenv("NEXUSAI_ALLOW_METRICS_RESET", "false").lower() in ("1", "true", "yes") \
+                and st.button("Reset metrics"):
+            registry.reset()
+            st.rerun()
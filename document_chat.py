@@ -4,55 +4,194 @@ This module provides functionality to chat with documents using ChromaDB and Goo
 """
 
 import os
-import tempfile
+import json
+import hashlib
+import threading
 from typing import List, Dict, Any, Optional
 import google.generativeai as genai
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_community.vectorstores import Chroma
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import PyPDFLoader, TextLoader, CSVLoader
 from langchain.chains import ConversationalRetrievalChain
 from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain.schema import Document
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.embeddings import Embeddings
 import streamlit as st
 from dotenv import load_dotenv
+from scratch_space import get_scratch_space
+from session_utils import get_session_id
+from index_manager import get_index_manager
+from instrumentation import track_call
+from reranker import RerankingRetriever, get_reranker
+from tracing import span, start_span
 
 # Load environment variables
 load_dotenv()
 
+def format_time(seconds: float) -> str:
+    """Format seconds as M:SS, or H:MM:SS for recordings over an hour"""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
+def google_client_kwargs() -> Dict[str, Any]:
+    """Point Gemini clients at GOOGLE_API_BASE_URL over REST when it is set, e.g. for mock_provider.py"""
+    base_url = os.getenv("GOOGLE_API_BASE_URL")
+    if not base_url:
+        return {}
+    return {"client_options": {"api_endpoint": base_url.rstrip("/")}, "transport": "rest"}
+
+class TrackedEmbeddings(Embeddings):
+    """Embeddings wrapper that records each embedding request"""
+
+    def __init__(self, embeddings: Embeddings, model: str):
+        """Wrap an embedding model"""
+        self.embeddings = embeddings
+        self.model = model
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed a batch of chunks"""
+        with track_call("google", "embedding", self.model) as call:
+            call.add_request_bytes(sum(len(text.encode("utf-8")) for text in texts))
+            return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a search query"""
+        with track_call("google", "embedding", self.model) as call:
+            call.add_request_bytes(len(text.encode("utf-8")))
+            return self.embeddings.embed_query(text)
+
+_embeddings = {}
+_embeddings_lock = threading.Lock()
+
+def get_embeddings(api_key: str) -> TrackedEmbeddings:
+    """Get the process-wide embedding model for an API key"""
+    with _embeddings_lock:
+        if api_key not in _embeddings:
+            _embeddings[api_key] = TrackedEmbeddings(
+                GoogleGenerativeAIEmbeddings(
+                    model="models/embedding-001",
+                    google_api_key=api_key,
+                    **google_client_kwargs()
+                ),
+                "models/embedding-001"
+            )
+        return _embeddings[api_key]
+
+class StageTracer(BaseCallbackHandler):
+    """Trace the LLM calls a retrieval chain makes: question condensing before retrieval, generation after"""
+
+    def __init__(self):
+        """Initialize with no open spans"""
+        self.spans = {}
+        self.retrieved = False
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def _start(self, run_id, prompt_chars: int) -> None:
+        name = "generate" if self.retrieved else "condense_question"
+        self.spans[run_id] = start_span(name, prompt_chars=prompt_chars)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs) -> None:
+        self._start(run_id, sum(len(prompt) for prompt in prompts))
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs) -> None:
+        self._start(run_id, sum(len(str(message.content)) for batch in messages for message in batch))
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs) -> None:
+        self.retrieved = True
+
+    def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+        stage = self.spans.pop(run_id, None)
+        if stage is None:
+            return
+        usage = {}
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or usage
+        prompt_tokens, completion_tokens = usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        stage.set(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        stage.end()
+
+    def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+        stage = self.spans.pop(run_id, None)
+        if stage is not None:
+            stage.record_error(error)
+            stage.end()
+
 class DocumentChat:
     """Class for handling document chat functionality"""
     
-    def __init__(self, api_key=None):
-        """Initialize the DocumentChat class"""
+    def __init__(self, api_key=None, workspace=None, access_key=None, session_id=None):
+        """
+        Initialize the DocumentChat class
+
+        Args:
+            api_key: Google API key, defaulting to GOOGLE_API_KEY
+            workspace: Name of a shared workspace to join, or None for a private one
+            access_key: Key of a protected shared workspace
+            session_id: Session attaching to the workspace, defaulting to the current one
+
+        Raises:
+            WorkspaceAccessDenied: If the access key doesn't match the workspace's
+        """
         self.embeddings = None
-        self.vector_store = None
+        self.workspace = None
         self.chat_history = []
-        self.documents = []
-        self.db_path = os.path.join(tempfile.gettempdir(), "chroma_db")
+        # Re-ranking stats and per-stage timings of the latest question
+        self.last_retrieval = {}
+        self.last_trace = []
         self.api_key = api_key or os.getenv("GOOGLE_API_KEY")
+        self.access_key = access_key
+        self.session_id = session_id or get_session_id()
         
         # Configure Google Gemini API
         if self.api_key:
             genai.configure(api_key=self.api_key)
             self.initialize_embeddings()
+
+        if self.embeddings:
+            self.workspace = get_index_manager().open(
+                workspace or self.session_id,
+                self.session_id,
+                self.embeddings,
+                access_key=access_key,
+                private=workspace is None
+            )
+
+    @property
+    def vector_store(self):
+        """The workspace's vector store, or None while it has no documents"""
+        if self.workspace is None or not self.workspace.documents:
+            return None
+        return self.workspace.vector_store
+
+    @property
+    def documents(self) -> List[Dict[str, Any]]:
+        """The documents indexed in the workspace"""
+        return self.workspace.documents if self.workspace else []
         
     def initialize_embeddings(self) -> None:
-        """Initialize the embedding model"""
+        """Initialize the embedding model, shared by every session using the same key"""
         if not self.api_key:
             st.error("Google API Key not found. Please set the GOOGLE_API_KEY environment variable.")
             return
             
         try:
-            self.embeddings = GoogleGenerativeAIEmbeddings(
-                model="models/embedding-001",
-                google_api_key=self.api_key
-            )
+            self.embeddings = get_embeddings(self.api_key)
         except Exception as e:
             st.error(f"Failed to initialize embeddings: {str(e)}")
     
     def load_document(self, file) -> bool:
         """
         Load a document and create embeddings
+
+        Content already indexed in the workspace, e.g. by another session, is not embedded again.
         
         Args:
             file: The uploaded file object
@@ -63,77 +202,141 @@ class DocumentChat:
         if not self.embeddings:
             st.error("Embeddings not initialized. Cannot load document.")
             return False
-            
-        try:
-            # Save the uploaded file to a temporary location
-            with tempfile.NamedTemporaryFile(delete=False, suffix=f".{file.name.split('.')[-1]}") as tmp_file:
-                tmp_file.write(file.getvalue())
-                file_path = tmp_file.name
-            
-            # Load document based on file type
-            if file.name.lower().endswith('.pdf'):
-                loader = PyPDFLoader(file_path)
-            elif file.name.lower().endswith('.csv'):
-                loader = CSVLoader(file_path)
-            else:
-                # Default to text loader for other file types
-                loader = TextLoader(file_path)
-                
-            documents = loader.load()
-            
-            # Split the documents into chunks
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=1000,
-                chunk_overlap=100
-            )
-            split_docs = text_splitter.split_documents(documents)
-            
-            # Store document info
-            self.documents.append({
-                "name": file.name,
-                "path": file_path,
-                "chunks": len(split_docs)
-            })
-            
-            # Create or update vector store
-            if self.vector_store is None:
-                self.vector_store = Chroma.from_documents(
-                    documents=split_docs,
-                    embedding=self.embeddings,
-                    persist_directory=self.db_path
-                )
-            else:
-                self.vector_store.add_documents(split_docs)
-                
-            return True
-            
-        except Exception as e:
-            st.error(f"Error loading document: {str(e)}")
+
+        data = file.getvalue()
+        with span("document_chat.load_document", file=file.name, bytes=len(data)) as trace:
+            digest = hashlib.sha256(data).hexdigest()
+            if self.workspace.has_document(digest):
+                trace.set(cache_hit=True)
+                return True
+            trace.set(cache_hit=False)
+
+            scratch = get_scratch_space()
+            file_path = None
+            try:
+                # Save the uploaded file to session scratch space; it is only needed while loading
+                file_path = scratch.write(self.session_id, data, f".{file.name.split('.')[-1]}")
+
+                # Load document based on file type
+                if file.name.lower().endswith('.pdf'):
+                    loader = PyPDFLoader(file_path)
+                elif file.name.lower().endswith('.csv'):
+                    loader = CSVLoader(file_path)
+                else:
+                    # Default to text loader for other file types
+                    loader = TextLoader(file_path)
+
+                with span("load", loader=type(loader).__name__) as stage:
+                    documents = loader.load()
+                    stage.set(documents=len(documents))
+                # Cite the uploaded file name rather than the scratch file that is about to be deleted
+                for document in documents:
+                    document.metadata["source"] = file.name
+
+                # Split the documents into chunks
+                with span("split", chunk_size=1000, chunk_overlap=100) as stage:
+                    text_splitter = RecursiveCharacterTextSplitter(
+                        chunk_size=1000,
+                        chunk_overlap=100
+                    )
+                    split_docs = text_splitter.split_documents(documents)
+                    stage.set(chunks=len(split_docs))
+
+                get_index_manager().add_documents(self.workspace, digest, file.name, split_docs)
+                return True
+
+            except Exception as e:
+                trace.record_error(e)
+                st.error(f"Error loading document: {str(e)}")
+                return False
+            finally:
+                scratch.release(self.session_id, file_path)
+
+    def add_transcript(self, name: str, segments: List[Dict[str, Any]], chunk_size: int = 1000, batch_size: int = 64) -> bool:
+        """
+        Index transcript segments directly, without writing or re-parsing files
+
+        Consecutive segments are grouped into chunks of about chunk_size characters. Each chunk keeps
+        the start and end time of its segments so answers can cite the time range in the recording.
+
+        Args:
+            name: Display name of the recording
+            segments: Transcription segments with text, start and end
+            chunk_size: Target characters per chunk
+            batch_size: Chunks embedded per vector store call
+
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        if not self.embeddings:
+            st.error("Embeddings not initialized. Cannot load transcript.")
             return False
-    
+
+        chunks = []
+        texts, start, end = [], None, None
+        for segment in segments:
+            text = (segment.get('text') or "").strip()
+            if not text:
+                continue
+            if texts and sum(len(t) + 1 for t in texts) + len(text) > chunk_size:
+                chunks.append(Document(
+                    page_content=" ".join(texts),
+                    metadata={"source": name, "start": start, "end": end}
+                ))
+                texts, start = [], None
+            texts.append(text)
+            start = segment.get('start', 0) if start is None else start
+            end = segment.get('end', start)
+        if texts:
+            chunks.append(Document(page_content=" ".join(texts), metadata={"source": name, "start": start, "end": end}))
+
+        if not chunks:
+            st.error(f"No transcript text to index for {name}")
+            return False
+
+        with span("document_chat.add_transcript", source=name, segments=len(segments), chunks=len(chunks)) as trace:
+            try:
+                digest = hashlib.sha256(json.dumps([name, [chunk.page_content for chunk in chunks]]).encode("utf-8")).hexdigest()
+                get_index_manager().add_documents(self.workspace, digest, name, chunks, batch_size)
+                return True
+
+            except Exception as e:
+                trace.record_error(e)
+                st.error(f"Error indexing transcript: {str(e)}")
+                return False
+
     def get_document_info(self) -> List[Dict[str, Any]]:
         """Get information about loaded documents"""
-        return self.documents
+        return [{"name": document["name"], "chunks": document["chunks"]} for document in self.documents]
     
-    def clear_documents(self) -> None:
-        """Clear all loaded documents and the vector store"""
+    def clear_documents(self) -> bool:
+        """
+        Clear all documents from the workspace, for every session sharing it
+
+        Returns:
+            bool: True if successful, False otherwise
+        """
         try:
-            if self.vector_store:
-                # Delete the persistent storage
-                import shutil
-                if os.path.exists(self.db_path):
-                    shutil.rmtree(self.db_path)
-                
-                self.vector_store = None
-                self.documents = []
+            if self.workspace:
+                get_index_manager().clear(self.workspace, self.access_key)
                 self.chat_history = []
+            return True
                 
         except Exception as e:
             st.error(f"Error clearing documents: {str(e)}")
+            return False
+
+    def close(self) -> None:
+        """Leave the workspace; a private workspace is deleted"""
+        if self.workspace:
+            get_index_manager().close(self.workspace, self.session_id)
+            self.workspace = None
     
     def chat_with_documents(self, query: str, model_name: str = "gemini-2.0-flash") -> Optional[str]:
         """
         Chat with the loaded documents
+
+        The time spent in each stage is kept in last_trace afterwards.
         
         Args:
             query: The user's question
@@ -145,52 +348,105 @@ class DocumentChat:
         if not self.vector_store:
             return "Please load documents before asking questions."
             
+        result = self.query(query, model_name, self.chat_history)
+        self.last_retrieval = result['retrieval']
+        self.last_trace = result['trace']
+        if result['answer'] is not None:
+            self.chat_history.append((query, result['answer']))
+        return result['content']
+
+    def query(self, query: str, model_name: str = "gemini-2.0-flash",
+              chat_history: Optional[List[tuple]] = None) -> Dict[str, Any]:
+        """
+        Answer one question without touching this object's conversation state
+
+        The workspace may be shared, e.g. by the service layer, so the history is passed in and
+        the results are returned rather than stored.
+
+        Args:
+            query: The user's question
+            model_name: The name of the Gemini model to use
+            chat_history: Earlier (question, answer) pairs to condense the question against
+
+        Returns:
+            dict: {"content": answer with sources or an error message, "answer": the bare answer or
+            None on error, "retrieval": re-ranking stats, "trace": per-stage timings}
+        """
+        chat_history = list(chat_history or [])
+        with span("document_chat.query", model=model_name, query_chars=len(query),
+                  history_turns=len(chat_history)) as trace:
+            content, answer, retrieval = self._answer(query, model_name, chat_history, trace)
+        return {'content': content, 'answer': answer, 'retrieval': retrieval, 'trace': trace.breakdown()}
+
+    def _answer(self, query: str, model_name: str, chat_history: List[tuple], trace) -> tuple:
+        """Run the retrieval chain inside the query's trace; returns (content, answer, retrieval stats)"""
         try:
             # Initialize the LLM
             llm = ChatGoogleGenerativeAI(
                 model=model_name,
                 google_api_key=self.api_key,
-                temperature=0.3
+                temperature=0.3,
+                **google_client_kwargs()
             )
             
-            # Create a retrieval chain
+            # Over-fetch candidates cheaply and re-rank them so only the best few reach the LLM
+            retriever = RerankingRetriever(
+                workspace=self.workspace,
+                embeddings=self.embeddings,
+                reranker=get_reranker(),
+                fetch_k=int(os.getenv("NEXUSAI_RERANK_FETCH_K", "50"))
+            )
             retrieval_chain = ConversationalRetrievalChain.from_llm(
                 llm=llm,
-                retriever=self.vector_store.as_retriever(
-                    search_kwargs={"k": 5}
-                ),
+                retriever=retriever,
                 return_source_documents=True
             )
             
             # Get response
-            result = retrieval_chain.invoke({
-                "question": query,
-                "chat_history": self.chat_history
-            })
-            
-            # Update chat history
-            self.chat_history.append((query, result["answer"]))
+            stages = StageTracer()
+            with track_call("google", "document_chat", model_name) as call:
+                call.add_request_bytes(len(query.encode("utf-8")))
+                result = retrieval_chain.invoke(
+                    {"question": query, "chat_history": chat_history},
+                    config={"callbacks": [stages]}
+                )
+                call.add_response_bytes(len(result["answer"].encode("utf-8")))
+                call.add_usage({"prompt_tokens": stages.prompt_tokens, "completion_tokens": stages.completion_tokens})
+            retrieval = dict(retriever.stats)
+            trace.set(
+                prompt_tokens=stages.prompt_tokens,
+                completion_tokens=stages.completion_tokens,
+                sources=len(result.get("source_documents", []))
+            )
             
             # Format response with sources
             response = result["answer"]
             
             # Add source information
             if "source_documents" in result:
-                sources = set()
+                sources = []
                 for doc in result["source_documents"]:
                     if hasattr(doc, "metadata") and "source" in doc.metadata:
-                        sources.add(doc.metadata["source"])
+                        source = os.path.basename(doc.metadata["source"])
+                        # Transcript chunks cite the time range in the recording
+                        if doc.metadata.get("start") is not None:
+                            start = format_time(doc.metadata["start"])
+                            end = format_time(doc.metadata.get("end", doc.metadata["start"]))
+                            source += f" [{start}–{end}]"
+                        if source not in sources:
+                            sources.append(source)
                 
                 if sources:
                     response += "\n\nSources:\n"
                     for i, source in enumerate(sources, 1):
-                        response += f"{i}. {os.path.basename(source)}\n"
+                        response += f"{i}. {source}\n"
             
-            return response
+            return response, result["answer"], retrieval
             
         except Exception as e:
+            trace.record_error(e)
             st.error(f"Error in chat: {str(e)}")
-            return f"An error occurred: {str(e)}"
+            return f"An error occurred: {str(e)}", None, {}
     
     def get_chat_history(self) -> List[tuple]:
         """Get the chat history"""
@@ -5,22 +5,62 @@ This module provides document chat functionality using Google Gemini and ChromaD
 
 import streamlit as st
 import os
-import tempfile
 from document_chat import DocumentChat
+from index_manager import WorkspaceAccessDenied, get_index_manager
 
-def initialize_document_chat():
-    """Initialize the document chat with Google API"""
+def initialize_document_chat(workspace=None, access_key=None):
+    """Initialize the document chat with Google API, in a private or shared workspace"""
     google_api_key = os.getenv("GOOGLE_API_KEY")
     if not google_api_key:
         return None
         
     try:
-        doc_chat = DocumentChat(api_key=google_api_key)
+        doc_chat = DocumentChat(api_key=google_api_key, workspace=workspace, access_key=access_key)
         return doc_chat
+    except WorkspaceAccessDenied as e:
+        st.error(str(e))
+        return None
     except Exception as e:
         st.error(f"Failed to initialize Document Chat: {e}")
         return None
 
+def display_workspace_selector():
+    """Let the session switch between its private workspace and a shared one"""
+    document_chat = st.session_state.document_chat
+    workspace = document_chat.workspace
+    current = "Private" if workspace.private else workspace.name
+
+    with st.expander(f"Workspace: {current} ({len(workspace.sessions)} session(s) attached)"):
+        st.markdown(
+            "Shared workspaces are indexed once and searched by every session that joins them. "
+            "A new workspace is protected by the access key it is created with."
+        )
+        col1, col2 = st.columns(2)
+        with col1:
+            name = st.text_input("Shared workspace name:", key="doc_workspace_name")
+        with col2:
+            access_key = st.text_input("Access key (optional):", type="password", key="doc_workspace_key")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("Join Workspace", disabled=not name.strip()):
+                joined = initialize_document_chat(workspace=name.strip(), access_key=access_key or None)
+                if joined:
+                    document_chat.close()
+                    st.session_state.document_chat = joined
+                    st.rerun()
+        with col2:
+            if not workspace.private and st.button("Back to Private Workspace"):
+                document_chat.close()
+                st.session_state.document_chat = initialize_document_chat()
+                st.rerun()
+
+        shared = get_index_manager().shared_workspaces()
+        if shared:
+            st.caption("Loaded shared workspaces: " + ", ".join(
+                f"{item['name']} ({item['sessions']} sessions, {item['documents']} documents)" for item in shared
+            ))
+
 def display_document_chat_interface():
     """Display the document chat interface"""
     st.title("📚 Document Chat")
@@ -34,6 +74,8 @@ def display_document_chat_interface():
         st.error("Google API key not set. Please enter your Google API key in the API Setup page.")
         return
     
+    display_workspace_selector()
+
     # Document upload section
     st.subheader("Upload Documents")
     uploaded_files = st.file_uploader(
@@ -59,9 +101,7 @@ def display_document_chat_interface():
         for i, doc in enumerate(documents):
             st.markdown(f"**{i+1}. {doc['name']}** ({doc['chunks']} chunks)")
         
-        if st.button("Clear All Documents"):
-            st.session_state.document_chat.clear_documents()
-            st.success("All documents cleared")
+        if st.button("Clear All Documents") and st.session_state.document_chat.clear_documents():
             st.rerun()
     
     # Chat interface
@@ -87,6 +127,28 @@ def display_document_chat_interface():
                     model_name = "gemini-2.0-flash"
                     response = st.session_state.document_chat.chat_with_documents(user_question, model_name)
                     st.markdown(response)
+                    retrieval = st.session_state.document_chat.last_retrieval
+                    if retrieval:
+                        st.caption(
+                            f"Re-ranked {retrieval['candidates']} candidates to {retrieval['returned']} "
+                            f"in {retrieval['rerank_ms']} ms (cross-encoder: {retrieval['cross_encoder']}, "
+                            f"MMR: {retrieval['mmr']})"
+                        )
+                    trace = st.session_state.document_chat.last_trace
+                    if trace:
+                        with st.expander(f"Timing breakdown ({trace[0]['duration_ms']:.0f} ms)"):
+                            st.dataframe(
+                                [
+                                    {
+                                        'Stage': "· " * stage['depth'] + stage['stage'],
+                                        'Start (ms)': stage['start_ms'],
+                                        'Duration (ms)': stage['duration_ms'],
+                                        'Details': ", ".join(f"{k}={v}" for k, v in stage['attributes'].items()),
+                                    }
+                                    for stage in trace
+                                ],
+                                use_container_width=True
+                            )
     else:
         st.info("Please upload and process documents before chatting.")
     
@@ -0,0 +1,261 @@
+"""
+History Store for NexusAI
+This module keeps page histories in SQLite, indexed by history key and page, with paginated reads and full-text search.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import tempfile
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    history_key TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    history_key TEXT NOT NULL REFERENCES sessions (history_key) ON DELETE CASCADE,
+    page TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    search_text TEXT NOT NULL DEFAULT '',
+    data TEXT NOT NULL,
+    thumbnail BLOB
+);
+CREATE INDEX IF NOT EXISTS entries_by_page ON entries (history_key, page, id);
+CREATE INDEX IF NOT EXISTS sessions_by_age ON sessions (updated_at);
+"""
+
+# External-content FTS5 index over search_text, kept in sync by triggers
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5 (search_text, content='entries', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS entries_fts_insert AFTER INSERT ON entries BEGIN
+    INSERT INTO entries_fts (rowid, search_text) VALUES (new.id, new.search_text);
+END;
+CREATE TRIGGER IF NOT EXISTS entries_fts_delete AFTER DELETE ON entries BEGIN
+    INSERT INTO entries_fts (entries_fts, rowid, search_text) VALUES ('delete', old.id, old.search_text);
+END;
+CREATE TRIGGER IF NOT EXISTS entries_fts_update AFTER UPDATE OF search_text ON entries BEGIN
+    INSERT INTO entries_fts (entries_fts, rowid, search_text) VALUES ('delete', old.id, old.search_text);
+    INSERT INTO entries_fts (rowid, search_text) VALUES (new.id, new.search_text);
+END;
+"""
+
+_deleted_callbacks = []
+
+def on_entries_deleted(callback: Callable[[str, List[Dict[str, Any]]], None]) -> None:
+    """Register a callback run with (history_key, entries) whenever entries are cleared or pruned"""
+    _deleted_callbacks.append(callback)
+
+def _notify_deleted(history_key: str, entries: List[Dict[str, Any]]) -> None:
+    """Run the deletion callbacks; a failing callback must not undo the deletion"""
+    for callback in list(_deleted_callbacks):
+        try:
+            callback(history_key, entries)
+        except Exception:
+            pass
+
+class HistoryStore:
+    """Persistent page histories shared by every session in the process"""
+
+    def __init__(self, path: str, retention_days: float = 0):
+        """
+        Open or create the database and drop histories past their retention
+
+        Args:
+            path: SQLite database file
+            retention_days: Delete histories unused for this many days; 0 keeps them forever
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("PRAGMA foreign_keys=ON")
+        self.connection.executescript(SCHEMA)
+        try:
+            self.connection.executescript(FTS_SCHEMA)
+            self.full_text = True
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5; search falls back to substring matching
+            self.full_text = False
+        if retention_days:
+            self.prune(time.time() - retention_days * 86400)
+
+    def _execute(self, sql: str, params: tuple = ()) -> List[sqlite3.Row]:
+        """Run one statement under the lock and return its rows"""
+        with self.lock:
+            return self.connection.execute(sql, params).fetchall()
+
+    @staticmethod
+    def _match_expression(query: str) -> str:
+        """Turn free text into an FTS5 query matching every word as a prefix"""
+        return " ".join('"' + word.replace('"', '""') + '"*' for word in query.split())
+
+    def _filter(self, history_key: str, page: str, query: Optional[str]) -> tuple:
+        """Build the WHERE clause selecting a page's entries, optionally matching a search"""
+        if not query or not query.strip():
+            return "history_key = ? AND page = ?", (history_key, page)
+        if self.full_text:
+            return (
+                "history_key = ? AND page = ? AND id IN (SELECT rowid FROM entries_fts WHERE entries_fts MATCH ?)",
+                (history_key, page, self._match_expression(query))
+            )
+        return "history_key = ? AND page = ? AND search_text LIKE ?", (history_key, page, f"%{query.strip()}%")
+
+    def add(self, history_key: str, page: str, data: Dict[str, Any], search_text: str = "",
+            thumbnail: Optional[bytes] = None) -> int:
+        """
+        Append an entry to a page's history
+
+        Args:
+            history_key: Stable id of the browser's history
+            page: History the entry belongs to (e.g. "chat")
+            data: JSON-serializable entry
+            search_text: Text indexed for full-text search
+            thumbnail: Optional small image kept outside the JSON
+
+        Returns:
+            int: The entry id
+        """
+        now = time.time()
+        with self.lock:
+            self.connection.execute("BEGIN")
+            try:
+                self.connection.execute(
+                    "INSERT INTO sessions (history_key, created_at, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT (history_key) DO UPDATE SET updated_at = excluded.updated_at",
+                    (history_key, now, now)
+                )
+                cursor = self.connection.execute(
+                    "INSERT INTO entries (history_key, page, created_at, search_text, data, thumbnail) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (history_key, page, now, search_text, json.dumps(data, separators=(",", ":")), thumbnail)
+                )
+                self.connection.execute("COMMIT")
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+        return cursor.lastrowid
+
+    def update(self, entry_id: int, fields: Dict[str, Any], thumbnail: Optional[bytes] = None) -> bool:
+        """
+        Merge fields into an entry's data, and replace its thumbnail when one is given
+
+        Returns:
+            bool: False if the entry no longer exists, e.g. because its history was cleared
+        """
+        with self.lock:
+            row = self.connection.execute("SELECT data FROM entries WHERE id = ?", (entry_id,)).fetchone()
+            if row is None:
+                return False
+            data = json.dumps({**json.loads(row[0]), **fields}, separators=(",", ":"))
+            if thumbnail is None:
+                self.connection.execute("UPDATE entries SET data = ? WHERE id = ?", (data, entry_id))
+            else:
+                self.connection.execute("UPDATE entries SET data = ?, thumbnail = ? WHERE id = ?", (data, thumbnail, entry_id))
+        return True
+
+    def count(self, history_key: str, page: str, query: Optional[str] = None) -> int:
+        """Count a page's entries, or those matching a search"""
+        where, params = self._filter(history_key, page, query)
+        return self._execute(f"SELECT COUNT(*) FROM entries WHERE {where}", params)[0][0]
+
+    def entries(self, history_key: str, page: str, offset: int = 0, limit: int = 10,
+                query: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Read one page of a history, newest first
+
+        Only the requested rows are read, so the cost doesn't grow with the size of the history.
+
+        Returns:
+            list: Entry dicts with their "id" and "thumbnail" added
+        """
+        where, params = self._filter(history_key, page, query)
+        rows = self._execute(
+            f"SELECT id, data, thumbnail FROM entries WHERE {where} ORDER BY id DESC LIMIT ? OFFSET ?",
+            params + (limit, offset)
+        )
+        return [{**json.loads(data), 'id': entry_id, 'thumbnail': thumbnail} for entry_id, data, thumbnail in rows]
+
+    def media_references(self, fields: tuple) -> List[tuple]:
+        """
+        List the blobs referenced by every stored entry, oldest first
+
+        Args:
+            fields: Entry fields holding blob digests
+
+        Returns:
+            list: (history_key, digest) pairs
+        """
+        references = []
+        for history_key, data in self._execute("SELECT history_key, data FROM entries ORDER BY id"):
+            entry = json.loads(data)
+            references.extend((history_key, entry[field]) for field in fields if entry.get(field))
+        return references
+
+    def clear(self, history_key: str, page: str) -> List[Dict[str, Any]]:
+        """
+        Delete a page's history
+
+        The on_entries_deleted callbacks are run with the deleted entries, which release the media they reference.
+
+        Returns:
+            list: The deleted entries
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT data FROM entries WHERE history_key = ? AND page = ?", (history_key, page)
+            ).fetchall()
+            self.connection.execute("DELETE FROM entries WHERE history_key = ? AND page = ?", (history_key, page))
+        entries = [json.loads(data) for (data,) in rows]
+        _notify_deleted(history_key, entries)
+        return entries
+
+    def prune(self, cutoff: float) -> int:
+        """
+        Delete every history not written to since cutoff (a Unix time)
+
+        The on_entries_deleted callbacks are run once per deleted history.
+
+        Returns:
+            int: Number of histories deleted
+        """
+        with self.lock:
+            self.connection.execute("BEGIN")
+            try:
+                rows = self.connection.execute(
+                    "SELECT sessions.history_key, entries.data FROM sessions "
+                    "LEFT JOIN entries ON entries.history_key = sessions.history_key WHERE sessions.updated_at < ?",
+                    (cutoff,)
+                ).fetchall()
+                self.connection.execute("DELETE FROM sessions WHERE updated_at < ?", (cutoff,))
+                self.connection.execute("COMMIT")
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+        deleted = {}
+        for history_key, data in rows:
+            entries = deleted.setdefault(history_key, [])
+            if data is not None:
+                entries.append(json.loads(data))
+        for history_key, entries in deleted.items():
+            _notify_deleted(history_key, entries)
+        return len(deleted)
+
+_history_store = None
+_history_store_lock = threading.Lock()
+
+def get_history_store() -> HistoryStore:
+    """Get the process-wide history store configured from the environment"""
+    global _history_store
+    with _history_store_lock:
+        if _history_store is None:
+            path = os.getenv("NEXUSAI_HISTORY_DB", os.path.join(tempfile.gettempdir(), "nexusai_history.db"))
+            retention_days = float(os.getenv("NEXUSAI_HISTORY_RETENTION_DAYS", "30"))
+            _history_store = HistoryStore(path, retention_days)
+        return _history_store
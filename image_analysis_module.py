@@ -5,9 +5,24 @@ This module provides image analysis functionality using Groq's multimodal API.
 
 import streamlit as st
 import os
+import io
+import csv
+import json
 import time
 import base64
+import hashlib
+import zipfile
 from openai import OpenAI
+from concurrency import current_scope, get_rate_limiter, run_concurrently
+from blob_store import get_blob_store, make_thumbnail
+from session_utils import get_history_key
+from image_cache import content_hash, get_image_result_cache, perceptual_hash
+from instrumentation import track_call
+from async_providers import get_async_client, resolve
+from media_utils import clear_history, load_history_page, save_history_entry
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+MAX_BATCH_IMAGE_BYTES = 20 * 1024 * 1024
 
 def initialize_image_client():
     """Initialize the client for image analysis with Groq API"""
@@ -18,7 +33,7 @@ def initialize_image_client():
     try:
         client = OpenAI(
             api_key=groq_api_key,
-            base_url="https://api.groq.com/openai/v1"
+            base_url=os.getenv("GROQ_BASE_URL", "https://api.groq.com").rstrip("/") + "/openai/v1"
         )
         return client
     except Exception as e:
@@ -33,42 +48,209 @@ def analyze_image(client, image_bytes, prompt, model):
     try:
         base64_image = base64.b64encode(image_bytes).decode('utf-8')
 
-        response = client.chat.completions.create(
-            model=model,
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": prompt},
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{base64_image}"
+        with track_call("groq", "image_analysis", model) as call:
+            call.add_request_bytes(len(base64_image) + len(prompt.encode('utf-8')))
+            response = resolve(client.chat.completions.create(
+                model=model,
+                messages=[
+                    {
+                        "role": "user",
+                        "content": [
+                            {"type": "text", "text": prompt},
+                            {
+                                "type": "image_url",
+                                "image_url": {
+                                    "url": f"data:image/jpeg;base64,{base64_image}"
+                                }
                             }
-                        }
-                    ]
-                }
-            ],
-            max_tokens=1024
-        )
-        return response.choices[0].message.content
+                        ]
+                    }
+                ],
+                max_tokens=1024
+            ))
+            content = response.choices[0].message.content
+            call.add_usage(response.usage)
+            call.add_response_bytes(len((content or "").encode('utf-8')))
+        return content
     except Exception as e:
         return f"Error: {str(e)}"
 
+def analyze_image_cached(client, image_bytes, prompt, model, use_cache=True, rate_limiter=None, history_key=None):
+    """
+    Analyze an image, reusing an earlier result for the same image
+
+    Results of near-identical images are only reused when IMAGE_CACHE_MAX_DISTANCE is set, and
+    only within history_key's own results. Only cache misses wait for rate_limiter, so cached
+    images don't use up the request budget.
+
+    Returns:
+        tuple: (result, cache_distance) where cache_distance is None when the model was called
+    """
+    cache = get_image_result_cache()
+    digest = content_hash(image_bytes) if use_cache else None
+    image_hash = perceptual_hash(image_bytes) if use_cache and cache.max_distance and history_key else None
+    if digest is not None:
+        cached = cache.lookup(digest, prompt, model, image_hash, history_key)
+        if cached:
+            return cached
+
+    if rate_limiter:
+        rate_limiter.acquire(current_scope())
+    result = analyze_image(client, image_bytes, prompt, model)
+    if digest is not None and not result.startswith("Error:"):
+        cache.store(digest, prompt, model, result, image_hash, history_key)
+    return result, None
+
+def collect_batch_images(uploaded_files):
+    """Collect (item_id, name, image_bytes) tuples from uploaded images and zip archives"""
+    items = []
+    seen = set()
+
+    def add_item(name, image_bytes):
+        if not image_bytes or len(image_bytes) > MAX_BATCH_IMAGE_BYTES:
+            return
+        item_id = hashlib.sha256(image_bytes).hexdigest()[:16]
+        if item_id not in seen:
+            seen.add(item_id)
+            items.append((item_id, name, image_bytes))
+
+    for uploaded_file in uploaded_files:
+        if uploaded_file.name.lower().endswith(".zip"):
+            try:
+                with zipfile.ZipFile(io.BytesIO(uploaded_file.getvalue())) as archive:
+                    for info in archive.infolist():
+                        if info.is_dir() or info.filename.startswith("__MACOSX/"):
+                            continue
+                        if not info.filename.lower().endswith(IMAGE_EXTENSIONS):
+                            continue
+                        if info.file_size > MAX_BATCH_IMAGE_BYTES:
+                            continue
+                        add_item(info.filename, archive.read(info))
+            except zipfile.BadZipFile:
+                st.error(f"{uploaded_file.name} is not a valid zip archive")
+        else:
+            add_item(uploaded_file.name, uploaded_file.getvalue())
+    return items
+
+def export_batch_results(rows, export_format):
+    """Serialize batch results as CSV or JSONL"""
+    if export_format == "jsonl":
+        return "\n".join(json.dumps(row, ensure_ascii=False) for row in rows).encode("utf-8")
+
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=["file", "status", "cached", "result", "latency_s"])
+    writer.writeheader()
+    for row in rows:
+        writer.writerow({key: row.get(key) for key in writer.fieldnames})
+    return buffer.getvalue().encode("utf-8")
+
+def display_batch_analysis(client, analysis_prompt, analysis_model, use_cache=True):
+    """Display the batch analysis mode: one prompt across many images"""
+    uploaded_files = st.file_uploader(
+        "Upload images or zip archives:",
+        type=["jpg", "jpeg", "png", "webp", "zip"],
+        accept_multiple_files=True
+    )
+    max_workers = st.slider("Concurrent requests:", 1, 8, 4)
+
+    items = collect_batch_images(uploaded_files or [])
+    if not items:
+        st.info("Upload one or more images (or a zip of images) to start a batch.")
+        return
+
+    # A batch is identified by its prompt, model and image set so it can resume after reruns
+    job_key = hashlib.sha256(
+        json.dumps([analysis_prompt, analysis_model, sorted(item[0] for item in items)]).encode("utf-8")
+    ).hexdigest()
+    batch = st.session_state.get('image_analysis_batch')
+    if not batch or batch['key'] != job_key:
+        batch = {'key': job_key, 'prompt': analysis_prompt, 'model': analysis_model, 'results': {}, 'running': False}
+        st.session_state.image_analysis_batch = batch
+
+    results = batch['results']
+    pending = [item for item in items if item[0] not in results]
+
+    st.markdown(f"**{len(items)} images** - {len(items) - len(pending)} done, {len(pending)} pending")
+    progress = st.progress((len(items) - len(pending)) / len(items))
+    table = st.empty()
+
+    def ordered_rows():
+        return [results[item[0]] for item in items if item[0] in results]
+
+    if results:
+        table.dataframe(ordered_rows(), use_container_width=True)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        label = "Resume Batch" if results and pending else "Run Batch"
+        start = st.button(label, disabled=not pending)
+    # Mark the batch running before Stop is rendered, so Stop is enabled while it runs
+    if pending and start:
+        batch['running'] = True
+    with col2:
+        if st.button("Stop Batch", disabled=not batch['running']):
+            batch['running'] = False
+            st.rerun()
+
+    # Keep going automatically if a rerun interrupted a running batch
+    if pending and batch['running']:
+
+        rate_limiter = get_rate_limiter("groq")
+        # Read on the script thread; the workers have no Streamlit context
+        history_key = get_history_key()
+
+        def analyze(item):
+            started = time.perf_counter()
+            result, cache_distance = analyze_image_cached(
+                client, item[2], analysis_prompt, analysis_model, use_cache, rate_limiter, history_key
+            )
+            return result, cache_distance, time.perf_counter() - started
+
+        for item, output, error in run_concurrently(analyze, pending, max_workers):
+            if error:
+                result, cache_distance, latency = f"Error: {error}", None, None
+            else:
+                result, cache_distance, latency = output
+            results[item[0]] = {
+                'file': item[1],
+                'status': "error" if result.startswith("Error:") else "ok",
+                'cached': cache_distance is not None,
+                'result': result,
+                'latency_s': round(latency, 2) if latency is not None else None
+            }
+            progress.progress(len(results) / len(items))
+            table.dataframe(ordered_rows(), use_container_width=True)
+
+        batch['running'] = False
+        st.success("Batch complete")
+
+    if results:
+        rows = ordered_rows()
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button(
+                label="Export CSV",
+                data=export_batch_results(rows, "csv"),
+                file_name="image_analysis_batch.csv",
+                mime="text/csv"
+            )
+        with col2:
+            st.download_button(
+                label="Export JSONL",
+                data=export_batch_results(rows, "jsonl"),
+                file_name="image_analysis_batch.jsonl",
+                mime="application/jsonl"
+            )
+
 def display_image_analysis_interface():
     """Display the image analysis interface"""
     st.title("🖼️ Image Analysis")
     
-    # Initialize history
-    if 'image_analysis_history' not in st.session_state:
-        st.session_state.image_analysis_history = []
-    
-    # Initialize client
-    client = initialize_image_client()
-    
-    # Upload image
-    uploaded_file = st.file_uploader("Upload an image for analysis:", type=["jpg", "jpeg", "png", "webp"])
+    # Shared async client; requests run on the provider loop
+    client = get_async_client("groq")
     
+    mode = st.radio("Mode:", ["Single Image", "Batch"], horizontal=True)
+
     # Analysis options
     analysis_prompt = st.text_input("Analysis Prompt:", "What's in this image?")
     analysis_model = st.selectbox(
@@ -76,6 +258,14 @@ def display_image_analysis_interface():
         ["meta-llama/llama-4-maverick-17b-128e-instruct", "meta-llama/llama-4-scout-17b-16e-instruct"], 
         index=0
     )
+    use_cache = st.checkbox("Reuse cached results for identical images", value=True)
+
+    if mode == "Batch":
+        display_batch_analysis(client, analysis_prompt, analysis_model, use_cache)
+        return
+
+    # Upload image
+    uploaded_file = st.file_uploader("Upload an image for analysis:", type=["jpg", "jpeg", "png", "webp"])
 
     # Analyze button
     if uploaded_file is not None and st.button("Analyze Image"):
@@ -83,38 +273,62 @@ def display_image_analysis_interface():
         st.image(image_bytes, caption="Uploaded Image", use_container_width=True)
 
         with st.spinner("Analyzing image..."):
-            analysis_result = analyze_image(
+            analysis_result, cache_distance = analyze_image_cached(
                 client=client,
                 image_bytes=image_bytes,
                 prompt=analysis_prompt,
-                model=analysis_model
+                model=analysis_model,
+                use_cache=use_cache,
+                history_key=get_history_key()
             )
 
             st.markdown("### Analysis Result")
+            if cache_distance is not None:
+                st.caption(f"⚡ Served from cache (image hash distance {cache_distance})")
             st.markdown(analysis_result)
 
-            # Save to history
-            st.session_state.image_analysis_history.append({
-                'image_bytes': image_bytes,
-                'prompt': analysis_prompt,
-                'model': analysis_model,
-                'result': analysis_result,
-                'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
-            })
+            # Save to history; the full image lives in the blob store, the history keeps a thumbnail
+            image_hash = get_blob_store().put(image_bytes, get_history_key())
+            save_history_entry(
+                "image_analysis",
+                {
+                    'image_hash': image_hash,
+                    'prompt': analysis_prompt,
+                    'model': analysis_model,
+                    'result': analysis_result,
+                    'cached': cache_distance is not None
+                },
+                f"{analysis_prompt}\n{analysis_result}",
+                thumbnail=make_thumbnail(image_bytes)
+            )
 
     # Display history
-    if st.session_state.image_analysis_history:
+    history = load_history_page("image_analysis", "analyses")
+    if history:
         st.markdown("---")
         st.subheader("Analysis History")
 
-        for idx, item in enumerate(reversed(st.session_state.image_analysis_history)):
-            with st.expander(f"Analysis {len(st.session_state.image_analysis_history)-idx} - {item['timestamp']}"):
-                st.image(item['image_bytes'], use_container_width=True)
+        blob_store = get_blob_store()
+        history_key = get_history_key()
+        for item in history:
+            with st.expander(f"Analysis {item['number']} - {item['timestamp']}"):
+                if item.get('thumbnail'):
+                    st.image(item['thumbnail'])
+
+                # Load the full image from disk only when asked for
+                if st.toggle("Show full image", key=f"full_image_{item['id']}"):
+                    image_bytes = blob_store.get(item['image_hash'], history_key)
+                    if image_bytes:
+                        st.image(image_bytes, use_container_width=True)
+                    else:
+                        st.info("The full image is no longer stored; it was evicted to stay within the storage quota.")
                 st.markdown(f"**Prompt:** {item['prompt']}")
                 st.markdown(f"**Model:** {item['model']}")
                 st.markdown(f"**Result:** {item['result']}")
+                if item.get('cached'):
+                    st.caption("⚡ Served from cache")
 
         # Clear history button
         if st.button("Clear Analysis History"):
-            st.session_state.image_analysis_history = []
+            clear_history("image_analysis")
             st.rerun()
@@ -0,0 +1,120 @@
+"""
+Image Cache Module for NexusAI
+This module provides a content-hash keyed cache of image analysis results, with opt-in near-duplicate matching.
+
+A 64-bit grayscale dHash can't tell apart solid colors or similar-looking documents, so near-duplicate
+matches are off by default and, when enabled, only return results cached for the same history.
+"""
+
+import io
+import os
+import hashlib
+import threading
+from typing import Optional, Tuple
+from cache_utils import LRUCache
+
+def perceptual_hash(image_bytes: bytes) -> Optional[int]:
+    """
+    Compute a 64-bit difference hash (dHash) of an image
+
+    Re-encoded, resized or re-saved copies of an image land within a few bits of each other.
+
+    Returns:
+        int: The hash, or None if the image can't be decoded
+    """
+    try:
+        from PIL import Image
+
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            pixels = list(image.convert("L").resize((9, 8), Image.LANCZOS).getdata())
+    except Exception:
+        return None
+
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (1 if left > right else 0)
+    return value
+
+def content_hash(image_bytes: bytes) -> str:
+    """Get the sha256 digest of an image's bytes"""
+    return hashlib.sha256(image_bytes).hexdigest()
+
+def hamming_distance(a: int, b: int) -> int:
+    """Count the differing bits between two hashes"""
+    return bin(a ^ b).count("1")
+
+class ImageResultCache:
+    """Cache of analysis results keyed by (content hash, prompt, model)"""
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: Optional[int] = None, max_distance: int = 0):
+        """
+        Initialize the cache
+
+        Args:
+            max_entries: Maximum number of cached results
+            ttl_seconds: Seconds a result stays valid, or None to never expire
+            max_distance: Largest perceptual hash distance still treated as the same image; 0 only
+                reuses results for byte-identical images
+        """
+        self.max_distance = max_distance
+        # (model, prompt, content hash) -> (result, perceptual hash, history key)
+        self.entries = LRUCache(max_entries, ttl_seconds)
+
+    def lookup(self, digest: str, prompt: str, model: str, image_hash: Optional[int] = None,
+               history_key: Optional[str] = None) -> Optional[Tuple[str, int]]:
+        """
+        Find a cached result for the same image, or a near-identical one of the same history
+
+        Args:
+            digest: Content hash of the image
+            prompt: The analysis prompt
+            model: The vision model
+            image_hash: Perceptual hash, needed for near-duplicate matches
+            history_key: History the lookup is made for; near-duplicate matches are limited to it
+
+        Returns:
+            tuple: (result, hash distance) or None on a miss
+        """
+        prompt = prompt.strip()
+        cached = self.entries.get((model, prompt, digest))
+        if cached is not None:
+            return cached[0], 0
+        if not self.max_distance or image_hash is None or history_key is None:
+            return None
+
+        best = None
+        for (cached_model, cached_prompt, cached_digest), (result, cached_hash, owner) in self.entries.items():
+            if cached_model != model or cached_prompt != prompt or owner != history_key or cached_hash is None:
+                continue
+            distance = hamming_distance(image_hash, cached_hash)
+            if distance <= self.max_distance and (best is None or distance < best[2]):
+                best = (cached_digest, result, distance)
+
+        if best is None:
+            return None
+        self.entries.touch((model, prompt, best[0]))
+        return best[1], best[2]
+
+    def store(self, digest: str, prompt: str, model: str, result: str, image_hash: Optional[int] = None,
+              history_key: Optional[str] = None) -> None:
+        """Cache a successful analysis result"""
+        self.entries.set((model, prompt.strip(), digest), (result, image_hash, history_key))
+
+_image_result_cache = None
+_image_result_cache_lock = threading.Lock()
+
+def get_image_result_cache() -> ImageResultCache:
+    """Get the process-wide image result cache configured from the environment"""
+    global _image_result_cache
+    with _image_result_cache_lock:
+        if _image_result_cache is None:
+            ttl_seconds = int(os.getenv("IMAGE_CACHE_TTL_SECONDS", "86400"))
+            _image_result_cache = ImageResultCache(
+                max_entries=int(os.getenv("IMAGE_CACHE_MAX_ENTRIES", "1000")),
+                ttl_seconds=ttl_seconds if ttl_seconds > 0 else None,
+                max_distance=int(os.getenv("IMAGE_CACHE_MAX_DISTANCE", "0"))
+            )
+        return _image_result_cache
@@ -7,8 +7,37 @@ import streamlit as st
 import os
 import time
 import json
+import requests
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from openai import OpenAI
 from openai import AzureOpenAI
+from concurrency import RequestCancelled, SingleFlight, current_scope, get_rate_limiter, run_concurrently
+from cache_utils import LRUCache
+from blob_store import get_blob_store, make_thumbnail
+from session_utils import get_history_key
+from instrumentation import track_call
+from async_providers import get_async_client, resolve
+from history_store import get_history_store
+from media_utils import clear_history, load_history_page, save_history_entry
+
+PROVIDER_LABELS = {
+    "openai": "OpenAI DALL-E 3",
+    "azure": "Azure OpenAI DALL-E 3",
+}
+
+# Background pool that copies generated images from the provider CDN into the blob store
+_download_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="image-download")
+# history key -> unfinished downloads, so clearing a history can cancel those still queued
+_pending_downloads = {}
+_pending_downloads_lock = threading.Lock()
+
+# Recent generations shared by all sessions; keep the TTL below the ~1 hour provider URL expiry
+_generation_cache = LRUCache(
+    max_entries=int(os.getenv("IMAGE_GENERATION_CACHE_MAX_ENTRIES", "500")),
+    ttl_seconds=int(os.getenv("IMAGE_GENERATION_CACHE_TTL_SECONDS", "3000"))
+)
+_generation_flights = SingleFlight()
 
 def initialize_openai_client():
     """Initialize the OpenAI client for image generation"""
@@ -45,49 +74,215 @@ def initialize_azure_openai_client():
         st.error(f"Failed to initialize Azure OpenAI client: {e}")
         return None
 
-def generate_image(client, prompt, size, provider="openai"):
+def generate_image(client, prompt, size, provider="openai", style="vivid", quality="standard"):
     """Generate image using selected provider"""
     if not client:
         return f"Error: {provider.capitalize()} API key not set. Please enter your API key in the API Setup page."
 
     try:
         if provider == "openai":
-            response = client.images.generate(
-                model="dall-e-3",
-                prompt=prompt,
-                n=1,
-                size=size,
-                style="vivid",
-                quality="standard"
-            )
+            with track_call("openai", "image_generation", "dall-e-3") as call:
+                call.add_request_bytes(len(prompt.encode('utf-8')))
+                response = resolve(client.images.generate(
+                    model="dall-e-3",
+                    prompt=prompt,
+                    n=1,
+                    size=size,
+                    style=style,
+                    quality=quality
+                ))
             return response.data[0].url
         elif provider == "azure":
             deployment = os.getenv("DEPLOYMENT_NAME", "dall-e-3")
-            response = client.images.generate(
-                model=deployment,
-                prompt=prompt,
-                n=1,
-                size=size,
-                style="vivid",
-                quality="standard"
-            )
+            with track_call("azure", "image_generation", deployment) as call:
+                call.add_request_bytes(len(prompt.encode('utf-8')))
+                response = resolve(client.images.generate(
+                    model=deployment,
+                    prompt=prompt,
+                    n=1,
+                    size=size,
+                    style=style,
+                    quality=quality
+                ))
             # Extract URL from response
             image_url = json.loads(response.model_dump_json())['data'][0]['url']
             return image_url
+    except RequestCancelled:
+        # Not a failure of the generation; callers sharing it must be able to tell
+        raise
     except Exception as e:
         return f"Error: {str(e)}"
 
+def generate_image_cached(client, prompt, size, provider="openai", style="vivid", quality="standard"):
+    """
+    Generate an image, reusing a recent identical generation and joining identical in-flight requests
+
+    If the session leading a shared generation cancels it, e.g. by switching pages, the sessions
+    that joined it start over instead of failing.
+
+    Returns:
+        tuple: (result, source) where source is "new", "cache" or "shared"
+
+    Raises:
+        RequestCancelled: If this caller's own request was cancelled
+    """
+    deployment = os.getenv("DEPLOYMENT_NAME", "dall-e-3") if provider == "azure" else "dall-e-3"
+    key = (provider, deployment, prompt.strip(), size, style, quality)
+
+    while True:
+        cached = _generation_cache.get(key)
+        if cached is not None:
+            return cached, "cache"
+
+        led = []
+
+        def generate():
+            led.append(True)
+            result = generate_image(client, prompt, size, provider, style, quality)
+            if not result.startswith("Error:"):
+                _generation_cache.set(key, result)
+            return result
+
+        try:
+            result, shared = _generation_flights.do(key, generate)
+            return result, "shared" if shared else "new"
+        except RequestCancelled:
+            scope = current_scope()
+            if led or (scope is not None and scope.cancelled):
+                raise
+            # Another session's cancelled request; retry, leading the next flight if nobody else does
+
+def generate_image_variants(clients, prompt, jobs, max_workers=4, style="vivid", quality="standard"):
+    """
+    Generate several images in parallel through a bounded worker pool
+
+    Args:
+        clients: Mapping of provider name to initialized client
+        prompt: The image prompt shared by every job
+        jobs: List of (provider, size) tuples, one per image
+        max_workers: Maximum number of generations in flight
+
+    Yields:
+        dict: provider, size, result and latency_s for each image as soon as it finishes
+    """
+    def generate(job):
+        provider, size = job
+        get_rate_limiter(provider).acquire(current_scope())
+        started = time.perf_counter()
+        result = generate_image(clients.get(provider), prompt, size, provider, style, quality)
+        return result, time.perf_counter() - started
+
+    for (provider, size), output, error in run_concurrently(generate, jobs, max_workers):
+        if error:
+            result, latency = f"Error: {str(error)}", None
+        else:
+            result, latency = output
+        yield {
+            'provider': provider,
+            'size': size,
+            'result': result,
+            'latency_s': round(latency, 2) if latency is not None else None
+        }
+
+def _download_image(url, entry_id, history_key):
+    """Copy a generated image into the blob store and attach it to its history entry"""
+    try:
+        with track_call("image_cdn", "image_download") as call:
+            response = requests.get(url, timeout=60)
+            response.raise_for_status()
+            image_bytes = response.content
+            call.add_response_bytes(len(image_bytes))
+    except Exception as e:
+        get_history_store().update(entry_id, {'download_error': str(e)})
+        return
+    image_hash = get_blob_store().put(image_bytes, history_key)
+    if not get_history_store().update(entry_id, {'image_hash': image_hash}, make_thumbnail(image_bytes)):
+        # The history was cleared while the image downloaded, so nothing will ever release this reference
+        get_blob_store().release(image_hash, history_key)
+
+def save_generated_image(prompt, size, provider, url, latency):
+    """Add a generated image to history and start copying it to local storage"""
+    entry_id = save_history_entry(
+        "image_generation",
+        {'prompt': prompt, 'size': size, 'provider': provider, 'url': url, 'latency_s': latency, 'image_hash': None},
+        prompt
+    )
+    # The download updates the stored entry itself, so a reload before it finishes doesn't lose the copy
+    history_key = get_history_key()
+    future = _download_executor.submit(_download_image, url, entry_id, history_key)
+    with _pending_downloads_lock:
+        _pending_downloads.setdefault(history_key, set()).add(future)
+    future.add_done_callback(lambda done: _forget_download(history_key, done))
+
+def _forget_download(history_key, future):
+    """Drop a finished or cancelled download from the pending set"""
+    with _pending_downloads_lock:
+        futures = _pending_downloads.get(history_key)
+        if futures is not None:
+            futures.discard(future)
+            if not futures:
+                del _pending_downloads[history_key]
+
+def cancel_pending_downloads(history_key):
+    """Cancel a history's queued downloads; running ones release their image once they find the entry gone"""
+    with _pending_downloads_lock:
+        futures = list(_pending_downloads.get(history_key, ()))
+    for future in futures:
+        future.cancel()
+
+def display_variants_generation(clients, prompt, provider_name, size, style, quality):
+    """Display the variants mode: several generations in parallel, shown as they finish"""
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        num_variants = st.slider("Variants per size/provider:", 1, 4, 2)
+    with col2:
+        sizes = st.multiselect("Sizes:", ["1024x1024", "1792x1024", "1024x1792"], default=[size])
+    with col3:
+        providers = st.multiselect(
+            "Providers:",
+            list(PROVIDER_LABELS),
+            default=[provider_name],
+            format_func=PROVIDER_LABELS.get
+        )
+    max_workers = st.slider("Concurrent requests:", 1, 8, 4)
+
+    jobs = [(provider, job_size) for provider in providers for job_size in sizes for _ in range(num_variants)]
+
+    if st.button(f"Generate {len(jobs)} Images", disabled=not jobs):
+        if not prompt:
+            st.warning("Please enter a prompt")
+            return
+
+        status = st.empty()
+        columns = st.columns(min(3, len(jobs)))
+        finished = 0
+        for variant in generate_image_variants(clients, prompt, jobs, max_workers, style, quality):
+            # Fill grid slots in completion order so each image appears as soon as it is ready
+            with columns[finished % len(columns)]:
+                label = f"{PROVIDER_LABELS[variant['provider']]} · {variant['size']}"
+                if variant['result'].startswith("Error:"):
+                    st.error(f"{label}: {variant['result']}")
+                else:
+                    st.image(variant['result'], caption=f"{label} · {variant['latency_s']}s", use_container_width=True)
+                    st.markdown(f"[Download Image]({variant['result']})")
+
+                    save_generated_image(
+                        prompt,
+                        variant['size'],
+                        PROVIDER_LABELS[variant['provider']],
+                        variant['result'],
+                        variant['latency_s']
+                    )
+            finished += 1
+            status.markdown(f"**{finished}/{len(jobs)}** images finished")
+
 def display_image_generation_interface():
     """Display the image generation interface"""
     st.title("🎨 Image Generation")
     
-    # Initialize history
-    if 'image_generation_history' not in st.session_state:
-        st.session_state.image_generation_history = []
-    
-    # Initialize clients
-    openai_client = initialize_openai_client()
-    azure_openai_client = initialize_azure_openai_client()
+    # Shared async clients; requests run on the provider loop
+    openai_client = get_async_client("openai")
+    azure_openai_client = get_async_client("azure")
     
     # Image generation options
     prompt = st.text_area("Image prompt:", height=100)
@@ -98,8 +293,22 @@ def display_image_generation_interface():
     with col2:
         size = st.selectbox("Image size:", ["1024x1024", "1792x1024", "1024x1792"], index=0)
 
+    col1, col2 = st.columns(2)
+    with col1:
+        style = st.selectbox("Style:", ["vivid", "natural"], index=0)
+    with col2:
+        quality = st.selectbox("Quality:", ["standard", "hd"], index=0)
+
+    mode = st.radio("Mode:", ["Single Image", "Variants"], horizontal=True)
+    if mode == "Variants":
+        clients = {"openai": openai_client, "azure": azure_openai_client}
+        provider_name = "openai" if provider == "OpenAI DALL-E 3" else "azure"
+        display_variants_generation(clients, prompt, provider_name, size, style, quality)
+    else:
+        reuse_recent = st.checkbox("Reuse a recent identical generation", value=True)
+
     # Generate button
-    if st.button("Generate Image"):
+    if mode == "Single Image" and st.button("Generate Image"):
         if not prompt:
             st.warning("Please enter a prompt")
         else:
@@ -110,36 +319,65 @@ def display_image_generation_interface():
                 # Select appropriate client
                 client = openai_client if provider_name == "openai" else azure_openai_client
                 
-                image_result = generate_image(client, prompt, size, provider_name)
+                started = time.perf_counter()
+                try:
+                    if reuse_recent:
+                        image_result, source = generate_image_cached(client, prompt, size, provider_name, style, quality)
+                    else:
+                        image_result, source = generate_image(client, prompt, size, provider_name, style, quality), "new"
+                except RequestCancelled:
+                    # Superseded by a rerun or page switch, which takes over once this run stops
+                    st.stop()
+                latency = round(time.perf_counter() - started, 2)
                 
                 if image_result.startswith("Error:"):
                     st.error(image_result)
                 else:
+                    if source == "cache":
+                        st.caption("⚡ Reused a recent identical generation")
+                    elif source == "shared":
+                        st.caption("⚡ Joined an identical request that was already in progress")
                     # Both OpenAI and Azure OpenAI return URLs
                     st.image(image_result, caption=prompt, use_container_width=True)
                     st.markdown(f"[Download Image]({image_result})")
                     
                     # Save to history
-                    st.session_state.image_generation_history.append({
-                        'prompt': prompt,
-                        'size': size,
-                        'provider': provider,
-                        'url': image_result,
-                        'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
-                    })
+                    save_generated_image(prompt, size, provider, image_result, latency)
 
     # Display history
-    if st.session_state.image_generation_history:
+    history = load_history_page("image_generation", "images")
+    if history:
         st.markdown("---")
         st.subheader("Generation History")
 
-        for idx, item in enumerate(reversed(st.session_state.image_generation_history)):
-            with st.expander(f"Image {len(st.session_state.image_generation_history)-idx} - {item['timestamp']}"):
+        blob_store = get_blob_store()
+        history_key = get_history_key()
+        for item in history:
+            with st.expander(f"Image {item['number']} - {item['timestamp']}"):
                 st.markdown(f"**Prompt:** {item['prompt']}")
                 st.markdown(f"**Provider:** {item.get('provider', 'OpenAI DALL-E 3')}")
-                
-                # Handle different URL types
-                if isinstance(item['url'], str) and item['url'].startswith('http'):
+                if item.get('latency_s') is not None:
+                    st.markdown(f"**Size:** {item['size']} · **Latency:** {item['latency_s']}s")
+
+                # Prefer the local copy; the provider URL expires after about an hour
+                image_path = blob_store.path(item['image_hash']) if item.get('image_hash') else None
+                if image_path:
+                    if item.get('thumbnail'):
+                        st.image(item['thumbnail'])
+                    if st.toggle("Show full image", key=f"full_generated_{item['id']}"):
+                        image_bytes = blob_store.get(item['image_hash'], history_key)
+                        if image_bytes:
+                            st.image(image_bytes, use_container_width=True)
+                            st.download_button(
+                                label="Download",
+                                data=image_bytes,
+                                file_name=f"image_{item['image_hash'][:12]}.png",
+                                mime="image/png",
+                                key=f"download_generated_{item['id']}"
+                            )
+                elif isinstance(item['url'], str) and item['url'].startswith('http'):
+                    if item.get('download_error'):
+                        st.caption(f"Local copy failed: {item['download_error']}")
                     st.image(item['url'], use_container_width=True)
                     st.markdown(f"[Download]({item['url']})")
                 else:
@@ -147,5 +385,6 @@ def display_image_generation_interface():
 
         # Clear history button
         if st.button("Clear Generation History"):
-            st.session_state.image_generation_history = []
+            cancel_pending_downloads(history_key)
+            clear_history("image_generation")
             st.rerun()
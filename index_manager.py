@@ -0,0 +1,320 @@
+"""
+Index Manager for NexusAI
+This module shares Document Chat indexes across sessions as reference-counted, access-controlled workspaces.
+"""
+
+import os
+import hmac
+import json
+import hashlib
+import tempfile
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+import chromadb
+from langchain_community.vectorstores import Chroma
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from concurrency import ReadWriteLock, SingleFlight
+from session_utils import on_session_end
+from tracing import span
+
+# Collections of private workspaces start with this prefix and never outlive their session
+PRIVATE_PREFIX = "p-"
+SHARED_PREFIX = "s-"
+
+class WorkspaceAccessDenied(Exception):
+    """Raised when a shared workspace is opened without its access key"""
+
+class Workspace:
+    """One shared collection: its vector store, document manifest and attached sessions"""
+
+    def __init__(self, name: str, collection_name: str, vector_store: Chroma, manifest: Dict[str, Any]):
+        """
+        Initialize a loaded workspace
+
+        Args:
+            name: Workspace name shown to users
+            collection_name: Chroma collection holding the workspace's chunks
+            vector_store: LangChain wrapper around the collection
+            manifest: Persisted {"key_hash", "documents"} for the workspace
+        """
+        self.name = name
+        self.collection_name = collection_name
+        self.vector_store = vector_store
+        self.key_hash = manifest.get("key_hash")
+        self.documents = manifest.get("documents", [])
+        self.lock = ReadWriteLock()
+        self.sessions = set()
+
+    @property
+    def private(self) -> bool:
+        """Whether the workspace belongs to a single session"""
+        return self.collection_name.startswith(PRIVATE_PREFIX)
+
+    def has_document(self, digest: str) -> bool:
+        """Check whether content with this hash is already indexed"""
+        return any(document["hash"] == digest for document in self.documents)
+
+    def as_retriever(self, k: int = 5) -> "WorkspaceRetriever":
+        """Get a retriever that searches under the workspace's read lock"""
+        return WorkspaceRetriever(workspace=self, search_kwargs={"k": k})
+
+class WorkspaceRetriever(BaseRetriever):
+    """Similarity search that runs concurrently with other readers but never during ingestion"""
+
+    workspace: Any
+    search_kwargs: Dict[str, Any] = {}
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        with self.workspace.lock.read():
+            return self.workspace.vector_store.similarity_search(query, **self.search_kwargs)
+
+class IndexManager:
+    """Process-wide owner of every workspace's collection, shared by all sessions"""
+
+    def __init__(self, root: str):
+        """
+        Initialize the manager and remove private collections left by an earlier process
+
+        Args:
+            root: Directory holding the Chroma database and workspace manifests
+        """
+        self.root = root
+        self.manifest_dir = os.path.join(root, "manifests")
+        os.makedirs(self.manifest_dir, exist_ok=True)
+        self.client = chromadb.PersistentClient(path=os.path.join(root, "chroma"))
+        self.lock = threading.Lock()
+        # collection name -> Workspace, only while at least one session is attached
+        self.workspaces = {}
+        self.ingest_flights = SingleFlight()
+
+        for collection in self.client.list_collections():
+            collection_name = getattr(collection, "name", collection)
+            if collection_name.startswith(PRIVATE_PREFIX):
+                self.client.delete_collection(collection_name)
+
+    @staticmethod
+    def collection_name(name: str, private: bool) -> str:
+        """Map a workspace name to a valid Chroma collection name"""
+        prefix = PRIVATE_PREFIX if private else SHARED_PREFIX
+        return prefix + hashlib.sha256(name.encode("utf-8")).hexdigest()[:32]
+
+    @staticmethod
+    def _hash_key(access_key: str) -> str:
+        """Hash an access key for storage"""
+        return hashlib.sha256(access_key.encode("utf-8")).hexdigest()
+
+    def _manifest_path(self, collection_name: str) -> str:
+        """Get the manifest file of a shared workspace"""
+        return os.path.join(self.manifest_dir, f"{collection_name}.json")
+
+    def _save_manifest(self, workspace: Workspace) -> None:
+        """Persist a shared workspace's manifest (write lock held)"""
+        if workspace.private:
+            return
+        path = self._manifest_path(workspace.collection_name)
+        fd, tmp_path = tempfile.mkstemp(dir=self.manifest_dir)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"name": workspace.name, "key_hash": workspace.key_hash, "documents": workspace.documents}, f)
+        os.replace(tmp_path, path)
+
+    def open(self, name: str, session_id: str, embeddings, access_key: Optional[str] = None,
+             private: bool = False) -> Workspace:
+        """
+        Attach a session to a workspace, loading or creating it
+
+        A new shared workspace is protected by the access key it is created with, if any.
+
+        Args:
+            name: Workspace name
+            session_id: The session attaching
+            embeddings: Embedding model used if the workspace has to be loaded
+            access_key: Key required by a protected shared workspace
+            private: Whether this is a session's own unshared workspace
+
+        Returns:
+            Workspace: The attached workspace; call close() when the session leaves it
+        """
+        collection_name = self.collection_name(name, private)
+        with self.lock:
+            workspace = self.workspaces.get(collection_name)
+            if workspace is None:
+                manifest = {}
+                if not private and os.path.exists(self._manifest_path(collection_name)):
+                    with open(self._manifest_path(collection_name), encoding="utf-8") as f:
+                        manifest = json.load(f)
+                elif not private and access_key:
+                    manifest = {"key_hash": self._hash_key(access_key)}
+                vector_store = Chroma(client=self.client, collection_name=collection_name, embedding_function=embeddings)
+                workspace = Workspace(name, collection_name, vector_store, manifest)
+
+            self.authorize(workspace, access_key)
+            self.workspaces[collection_name] = workspace
+            if not workspace.private and not os.path.exists(self._manifest_path(collection_name)):
+                self._save_manifest(workspace)
+            workspace.sessions.add(session_id)
+            return workspace
+
+    def authorize(self, workspace: Workspace, access_key: Optional[str]) -> None:
+        """Raise WorkspaceAccessDenied unless the key opens the workspace"""
+        if workspace.key_hash and not hmac.compare_digest(workspace.key_hash, self._hash_key(access_key or "")):
+            raise WorkspaceAccessDenied(f"Wrong access key for workspace {workspace.name}")
+
+    def close(self, workspace: Workspace, session_id: str) -> None:
+        """Detach a session, unloading the workspace once no session uses it"""
+        with self.lock:
+            workspace.sessions.discard(session_id)
+            if workspace.sessions:
+                return
+            self.workspaces.pop(workspace.collection_name, None)
+            # Delete under the manager lock so a concurrent open() can't get the collection being deleted
+            if workspace.private:
+                with workspace.lock.write():
+                    self.client.delete_collection(workspace.collection_name)
+
+    def release_session(self, session_id: str) -> None:
+        """Detach an ended session from every workspace"""
+        with self.lock:
+            attached = [workspace for workspace in self.workspaces.values() if session_id in workspace.sessions]
+        for workspace in attached:
+            self.close(workspace, session_id)
+
+    def add_documents(self, workspace: Workspace, digest: str, name: str, documents: List[Document],
+                      batch_size: int = 64) -> bool:
+        """
+        Embed and index documents once per workspace and content hash
+
+        Embedding runs outside the write lock so searches continue meanwhile, and concurrent
+        uploads of the same content share one ingestion.
+
+        Returns:
+            bool: True if the content was indexed, False if it already was
+        """
+        def ingest():
+            with workspace.lock.read():
+                if workspace.has_document(digest):
+                    return False
+
+            texts = [document.page_content for document in documents]
+            vectors = []
+            with span("embed", chunks=len(texts), batch_size=batch_size, batches=-(-len(texts) // batch_size)):
+                for offset in range(0, len(texts), batch_size):
+                    vectors.extend(workspace.vector_store.embeddings.embed_documents(texts[offset:offset + batch_size]))
+            metadatas = [
+                # Chroma only stores scalar metadata
+                {key: value for key, value in document.metadata.items() if isinstance(value, (str, int, float, bool))}
+                for document in documents
+            ]
+
+            with span("index_write", chunks=len(texts)) as stage, workspace.lock.write():
+                if workspace.has_document(digest):
+                    stage.set(cache_hit=True)
+                    return False
+                collection = self.client.get_or_create_collection(workspace.collection_name)
+                for offset in range(0, len(texts), batch_size):
+                    collection.upsert(
+                        ids=[f"{digest[:16]}-{index}" for index in range(offset, min(offset + batch_size, len(texts)))],
+                        embeddings=vectors[offset:offset + batch_size],
+                        documents=texts[offset:offset + batch_size],
+                        metadatas=metadatas[offset:offset + batch_size]
+                    )
+                workspace.documents.append({"name": name, "chunks": len(documents), "hash": digest})
+                self._save_manifest(workspace)
+            return True
+
+        with span("ingest", workspace=workspace.name, chunks=len(documents)) as stage:
+            result, shared = self.ingest_flights.do((workspace.collection_name, digest), ingest)
+            # shared: another session's identical upload did the work
+            stage.set(indexed=result, shared=shared)
+        return result
+
+    def search(self, workspace: Workspace, query_embedding: List[float], k: int) -> List[Tuple[Document, Any]]:
+        """
+        Fetch the k nearest chunks together with their stored embeddings
+
+        Returns:
+            list: (document, embedding) pairs, nearest first
+        """
+        with workspace.lock.read():
+            collection = self.client.get_or_create_collection(workspace.collection_name)
+            count = collection.count()
+            if not count:
+                return []
+            result = collection.query(
+                query_embeddings=[query_embedding],
+                n_results=min(k, count),
+                include=["documents", "metadatas", "embeddings"]
+            )
+        return [
+            (Document(page_content=text, metadata=metadata or {}), embedding)
+            for text, metadata, embedding in zip(result["documents"][0], result["metadatas"][0], result["embeddings"][0])
+        ]
+
+    def preload(self) -> int:
+        """
+        Load the vector index of every persisted shared workspace into memory
+
+        Chroma reads a collection's index on its first query, which otherwise lands on the first
+        question asked after a restart.
+
+        Returns:
+            int: Number of collections loaded
+        """
+        existing = {getattr(collection, "name", collection) for collection in self.client.list_collections()}
+        loaded = 0
+        for file_name in sorted(os.listdir(self.manifest_dir)):
+            collection_name, extension = os.path.splitext(file_name)
+            if extension != ".json" or collection_name not in existing:
+                continue
+            collection = self.client.get_collection(collection_name)
+            sample = collection.peek(1)
+            if len(sample["embeddings"]):
+                collection.query(query_embeddings=[sample["embeddings"][0]], n_results=1, include=[])
+            loaded += 1
+        return loaded
+
+    def clear(self, workspace: Workspace, access_key: Optional[str] = None) -> None:
+        """
+        Remove every document from a workspace
+
+        A shared workspace can only be cleared with the key it was created with, so one without a key
+        can't be cleared at all.
+
+        Raises:
+            WorkspaceAccessDenied: If the workspace is shared and the key doesn't match
+        """
+        if not workspace.private:
+            if not workspace.key_hash:
+                raise WorkspaceAccessDenied(f"Workspace {workspace.name} has no access key, so it can't be cleared")
+            self.authorize(workspace, access_key)
+        with workspace.lock.write():
+            self.client.delete_collection(workspace.collection_name)
+            workspace.vector_store = Chroma(
+                client=self.client,
+                collection_name=workspace.collection_name,
+                embedding_function=workspace.vector_store.embeddings
+            )
+            workspace.documents = []
+            self._save_manifest(workspace)
+
+    def shared_workspaces(self) -> List[Dict[str, Any]]:
+        """List the loaded shared workspaces with their attached session counts"""
+        with self.lock:
+            return [
+                {"name": workspace.name, "sessions": len(workspace.sessions), "documents": len(workspace.documents)}
+                for workspace in self.workspaces.values() if not workspace.private
+            ]
+
+_index_manager = None
+_index_manager_lock = threading.Lock()
+
+def get_index_manager() -> IndexManager:
+    """Get the process-wide index manager configured from the environment"""
+    global _index_manager
+    with _index_manager_lock:
+        if _index_manager is None:
+            root = os.getenv("NEXUSAI_INDEX_DIR", os.path.join(tempfile.gettempdir(), "nexusai_index"))
+            _index_manager = IndexManager(root)
+            on_session_end(_index_manager.release_session)
+        return _index_manager
@@ -0,0 +1,331 @@
+"""
+Instrumentation Module for NexusAI
+This module records latency, time to first byte, token usage, payload sizes, errors and cost for provider calls.
+"""
+
+import os
+import json
+import asyncio
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from concurrency import RequestCancelled
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+BYTES_BUCKETS = (1024, 10 * 1024, 100 * 1024, 1024 ** 2, 5 * 1024 ** 2, 25 * 1024 ** 2, 100 * 1024 ** 2)
+
+# name -> (type, help text, histogram buckets)
+METRICS = {
+    "nexusai_provider_requests_total": ("counter", "Provider calls by outcome", None),
+    "nexusai_provider_errors_total": ("counter", "Failed provider calls by exception class", None),
+    "nexusai_provider_latency_seconds": ("histogram", "Provider call latency", LATENCY_BUCKETS),
+    "nexusai_provider_ttfb_seconds": ("histogram", "Time to the first streamed byte of a response", LATENCY_BUCKETS),
+    "nexusai_provider_tokens_total": ("counter", "Tokens reported by the provider", None),
+    "nexusai_provider_request_bytes": ("histogram", "Request payload size", BYTES_BUCKETS),
+    "nexusai_provider_response_bytes": ("histogram", "Response payload size", BYTES_BUCKETS),
+    "nexusai_provider_cost_usd_total": ("counter", "Estimated spend from NEXUSAI_PRICING_FILE", None),
+}
+
+class Histogram:
+    """Fixed-bucket histogram in the Prometheus style"""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        """Initialize empty buckets with the given upper bounds"""
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        """Record one observation"""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate a quantile by interpolating within its bucket, like histogram_quantile()"""
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            if cumulative + count >= rank and count:
+                if index == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index else 0.0
+                return lower + (self.buckets[index] - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+class MetricsRegistry:
+    """Process-wide store of labelled counters and histograms"""
+
+    def __init__(self):
+        """Initialize an empty registry"""
+        self.lock = threading.Lock()
+        # (name, sorted label items) -> float or Histogram
+        self.series = {}
+
+    def inc(self, name: str, labels: Dict[str, str], value: float = 1.0) -> None:
+        """Add to a counter"""
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.series[key] = self.series.get(key, 0.0) + value
+
+    def observe(self, name: str, labels: Dict[str, str], value: float) -> None:
+        """Record a histogram observation"""
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            if key not in self.series:
+                self.series[key] = Histogram(METRICS[name][2])
+            self.series[key].observe(value)
+
+    def reset(self) -> None:
+        """Drop every recorded series"""
+        with self.lock:
+            self.series.clear()
+
+    def render_prometheus(self) -> str:
+        """Render all series in the Prometheus text exposition format"""
+        with self.lock:
+            series = sorted(self.series.items(), key=lambda item: item[0])
+            lines = []
+            current = None
+            for (name, labels), value in series:
+                if name != current:
+                    metric_type, help_text, _ = METRICS[name]
+                    lines.append(f"# HELP {name} {help_text}")
+                    lines.append(f"# TYPE {name} {metric_type}")
+                    current = name
+                if isinstance(value, Histogram):
+                    cumulative = 0
+                    for bound, count in zip(value.buckets + (float("inf"),), value.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else repr(float(bound))
+                        lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {value.sum}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {value.count}")
+                else:
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def summarize(self) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Summarize the recorded calls for display
+
+        Returns:
+            tuple: (one row per provider and operation, one row per error class)
+        """
+        rows = {}
+        errors = []
+        with self.lock:
+            for (name, labels), value in self.series.items():
+                labels = dict(labels)
+                if name == "nexusai_provider_errors_total":
+                    errors.append({**labels, 'count': int(value)})
+                    continue
+                row = rows.setdefault((labels['provider'], labels['operation']), {
+                    'provider': labels['provider'], 'operation': labels['operation'], 'calls': 0, 'errors': 0,
+                    'p50_s': None, 'p95_s': None, 'p50_ttfb_s': None, 'prompt_tokens': 0, 'completion_tokens': 0,
+                    'bytes_sent': 0, 'bytes_received': 0, 'cost_usd': 0.0
+                })
+                if name == "nexusai_provider_requests_total":
+                    row['calls'] += int(value)
+                    if labels.get('status') == "error":
+                        row['errors'] += int(value)
+                elif name == "nexusai_provider_latency_seconds":
+                    row['p50_s'], row['p95_s'] = _round(value.quantile(0.5)), _round(value.quantile(0.95))
+                elif name == "nexusai_provider_ttfb_seconds":
+                    row['p50_ttfb_s'] = _round(value.quantile(0.5))
+                elif name == "nexusai_provider_tokens_total":
+                    row[f"{labels['kind']}_tokens"] += int(value)
+                elif name == "nexusai_provider_request_bytes":
+                    row['bytes_sent'] += int(value.sum)
+                elif name == "nexusai_provider_response_bytes":
+                    row['bytes_received'] += int(value.sum)
+                elif name == "nexusai_provider_cost_usd_total":
+                    row['cost_usd'] = round(row['cost_usd'] + value, 6)
+        return sorted(rows.values(), key=lambda row: (row['provider'], row['operation'])), errors
+
+def _format_labels(labels) -> str:
+    """Format label pairs as {name="value",...}"""
+    if not labels:
+        return ""
+    pairs = []
+    for name, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+def _round(value: Optional[float]) -> Optional[float]:
+    """Round a seconds value for display"""
+    return None if value is None else round(value, 3)
+
+_registry = MetricsRegistry()
+_pricing = None
+_pricing_lock = threading.Lock()
+
+def get_metrics_registry() -> MetricsRegistry:
+    """Get the process-wide metrics registry"""
+    return _registry
+
+def get_pricing() -> Dict[str, Dict[str, float]]:
+    """
+    Load model prices from the JSON file named by NEXUSAI_PRICING_FILE
+
+    The file maps model names to {"input_per_million", "output_per_million", "per_request"} in USD.
+    Without it no cost is recorded.
+    """
+    global _pricing
+    with _pricing_lock:
+        if _pricing is None:
+            path = os.getenv("NEXUSAI_PRICING_FILE")
+            _pricing = {}
+            if path:
+                try:
+                    with open(path, encoding="utf-8") as f:
+                        _pricing = json.load(f)
+                except (OSError, ValueError):
+                    _pricing = {}
+        return _pricing
+
+class ProviderCall:
+    """Measurements for one provider call, filled in while the call runs"""
+
+    def __init__(self, provider: str, operation: str, model: Optional[str]):
+        """Start timing a call"""
+        self.provider = provider
+        self.operation = operation
+        self.model = model or ""
+        self.started_at = time.perf_counter()
+        self.ttfb = None
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.request_bytes = None
+        self.response_bytes = None
+
+    def first_byte(self) -> None:
+        """Mark the arrival of the first streamed byte; later calls are ignored"""
+        if self.ttfb is None:
+            self.ttfb = time.perf_counter() - self.started_at
+
+    def add_usage(self, usage: Any) -> None:
+        """Record token usage from a response's usage object or dict"""
+        if usage is None:
+            return
+        if not isinstance(usage, dict):
+            usage = usage.model_dump() if hasattr(usage, "model_dump") else vars(usage)
+        self.prompt_tokens += usage.get("prompt_tokens") or 0
+        self.completion_tokens += usage.get("completion_tokens") or 0
+
+    def add_request_bytes(self, size: int) -> None:
+        """Record bytes sent to the provider"""
+        self.request_bytes = (self.request_bytes or 0) + size
+
+    def add_response_bytes(self, size: int) -> None:
+        """Record bytes received from the provider"""
+        self.response_bytes = (self.response_bytes or 0) + size
+
+@contextmanager
+def track_call(provider: str, operation: str, model: Optional[str] = None):
+    """
+    Measure a provider call made inside the with block
+
+    Exceptions are recorded by class and re-raised, so this goes inside the caller's error handling.
+
+    Args:
+        provider: Provider name (e.g. "groq")
+        operation: What the call does (e.g. "chat", "transcription")
+        model: Model or deployment name
+
+    Yields:
+        ProviderCall: Record usage, payload sizes and first byte on it
+    """
+    call = ProviderCall(provider, operation, model)
+    status = "ok"
+    try:
+        yield call
+    except (GeneratorExit, RequestCancelled, asyncio.CancelledError):
+        # A streaming consumer stopped reading or the request was abandoned; that isn't a provider failure
+        status = "cancelled"
+        raise
+    except BaseException as e:
+        status = "error"
+        _registry.inc("nexusai_provider_errors_total", {
+            'provider': provider, 'operation': operation, 'error_class': type(e).__name__
+        })
+        raise
+    finally:
+        _record(call, status)
+
+def _record(call: ProviderCall, status: str) -> None:
+    """Write a finished call's measurements to the registry"""
+    labels = {'provider': call.provider, 'operation': call.operation}
+    _registry.inc("nexusai_provider_requests_total", {**labels, 'model': call.model, 'status': status})
+    _registry.observe("nexusai_provider_latency_seconds", labels, time.perf_counter() - call.started_at)
+    if call.ttfb is not None:
+        _registry.observe("nexusai_provider_ttfb_seconds", labels, call.ttfb)
+    if call.request_bytes is not None:
+        _registry.observe("nexusai_provider_request_bytes", labels, call.request_bytes)
+    if call.response_bytes is not None:
+        _registry.observe("nexusai_provider_response_bytes", labels, call.response_bytes)
+    for kind, tokens in (("prompt", call.prompt_tokens), ("completion", call.completion_tokens)):
+        if tokens:
+            _registry.inc("nexusai_provider_tokens_total", {**labels, 'model': call.model, 'kind': kind}, tokens)
+
+    price = get_pricing().get(call.model)
+    if price and status == "ok":
+        cost = (
+            call.prompt_tokens * price.get("input_per_million", 0) / 1_000_000
+            + call.completion_tokens * price.get("output_per_million", 0) / 1_000_000
+            + price.get("per_request", 0)
+        )
+        if cost:
+            _registry.inc("nexusai_provider_cost_usd_total", {**labels, 'model': call.model}, cost)
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """Serve the registry at /metrics"""
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = _registry.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Keep scrapes out of the application log"""
+
+_metrics_server = None
+_metrics_server_lock = threading.Lock()
+
+def start_metrics_server(port: Optional[int] = None, host: Optional[str] = None) -> bool:
+    """
+    Serve /metrics on NEXUSAI_METRICS_HOST:NEXUSAI_METRICS_PORT from a background thread, once per process
+
+    The host defaults to 127.0.0.1; set it to 0.0.0.0 for a scraper on another machine.
+
+    Returns:
+        bool: True if the server is running
+    """
+    global _metrics_server
+    with _metrics_server_lock:
+        if _metrics_server is not None:
+            return True
+        port = port or int(os.getenv("NEXUSAI_METRICS_PORT", "0"))
+        if not port:
+            return False
+        host = host or os.getenv("NEXUSAI_METRICS_HOST", "127.0.0.1")
+        try:
+            _metrics_server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        except OSError:
+            return False
+        threading.Thread(target=_metrics_server.serve_forever, name="metrics-server", daemon=True).start()
+        return True
@@ -0,0 +1,291 @@
+"""
+Load Test for NexusAI
+This module drives many simulated Streamlit sessions against the mock provider and reports
+page rerun latency, provider concurrency and memory per session.
+
+Sessions are streamlit.testing AppTest instances running main.py in this process, so every
+rerun executes the real page code. Memory is measured in a separate pass under tracemalloc,
+which would otherwise slow the timed reruns.
+
+Run with: python load_test.py --users 20 --scenario chat --turns 5
+"""
+
+import os
+import gc
+import sys
+import json
+import time
+import atexit
+import shutil
+import tempfile
+import argparse
+import threading
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+
+def chat_scenario(session, user, turns):
+    """Open the Chat page and send a message per turn"""
+    session.session_state.page = "Chat"
+    yield session.run
+    for turn in range(turns):
+        session.chat_input[0].set_value(f"Load test question {turn} from user {user}: what should I measure?")
+        yield session.run
+
+def tts_scenario(session, user, turns):
+    """Open the Text-to-Speech page and synthesize a different sentence per turn"""
+    session.session_state.page = "Text-to-Speech"
+    yield session.run
+    for turn in range(turns):
+        session.text_area[0].input(f"This is sentence {turn} from load test user {user}. It is long enough to matter.")
+        next(button for button in session.button if button.label == "Generate Speech").click()
+        yield session.run
+
+def image_generation_scenario(session, user, turns):
+    """Open the Image Generation page and generate an image per turn"""
+    session.session_state.page = "Image Generation"
+    yield session.run
+    for turn in range(turns):
+        session.text_area[0].input(f"A lighthouse at dusk, user {user}, variation {turn}")
+        next(button for button in session.button if button.label == "Generate Image").click()
+        yield session.run
+
+def navigation_scenario(session, user, turns):
+    """Move between pages without calling any provider"""
+    pages = ["Home", "Chat", "Image Analysis", "Text-to-Speech", "Speech-to-Text", "Diagnostics"]
+    for turn in range(turns + 1):
+        session.session_state.page = pages[turn % len(pages)]
+        yield session.run
+
+# Inputs differ per user and turn so the app's result caches don't hide provider load
+SCENARIOS = {
+    "chat": chat_scenario,
+    "tts": tts_scenario,
+    "image_generation": image_generation_scenario,
+    "navigation": navigation_scenario,
+}
+
+def percentile(values, q):
+    """Get the q-th percentile (0-100) of values by nearest rank"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered) + 0.5)) - 1))]
+
+# The first rerun of a session compiles main.py, and concurrent ast.parse calls are not thread-safe
+_compile_lock = threading.Lock()
+
+def use_distinct_session_ids():
+    """
+    Give every simulated user its own Streamlit session id, as a real server does
+
+    AppTest runs every session as "test session id", which would make users share per-session
+    state such as scratch space, blob quotas and request cancellation scopes.
+    """
+    from streamlit.runtime.scriptrunner.script_runner import ScriptRunner
+
+    original_init = ScriptRunner.__init__
+
+    def init(self, *args, **kwargs):
+        # Each user's reruns happen on that user's worker thread
+        kwargs["session_id"] = f"load-test-{threading.get_ident()}"
+        original_init(self, *args, **kwargs)
+
+    ScriptRunner.__init__ = init
+
+def run_session(scenario, user, turns, timeout):
+    """
+    Run one simulated user through a scenario
+
+    Returns:
+        tuple: (the AppTest session, list of rerun seconds, number of reruns that raised)
+    """
+    from streamlit.testing.v1 import AppTest
+
+    session = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    rerun_times, failures = [], 0
+    for index, rerun in enumerate(SCENARIOS[scenario](session, user, turns)):
+        start_time = time.perf_counter()
+        try:
+            if index == 0:
+                with _compile_lock:
+                    rerun()
+            else:
+                rerun()
+            if session.exception:
+                failures += 1
+        except Exception:
+            failures += 1
+        rerun_times.append(time.perf_counter() - start_time)
+    return session, rerun_times, failures
+
+class ConcurrencySampler:
+    """Poll the mock's in-flight request count in the background"""
+
+    def __init__(self, mock_url, interval=0.05):
+        """Prepare to sample mock_url every interval seconds"""
+        self.mock_url = mock_url
+        self.interval = interval
+        self.samples = []
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._sample, name="concurrency-sampler", daemon=True)
+
+    def _sample(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.samples.append(requests.get(f"{self.mock_url}/_mock/stats", timeout=1).json()['in_flight'])
+            except requests.RequestException:
+                pass
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop_event.set()
+        self.thread.join()
+        return False
+
+def measure_memory(scenario, turns, timeout, sessions):
+    """Run sessions one at a time under tracemalloc and return the retained bytes per session"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        kept = [run_session(scenario, f"memory-{user}", turns, timeout)[0] for user in range(sessions)]
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0] - baseline
+    finally:
+        tracemalloc.stop()
+    del kept
+    return retained / sessions
+
+def configure_environment(mock_url):
+    """
+    Point every provider client at the mock, and every cache and store at a fresh directory
+
+    Persistent caches would otherwise answer repeat runs without any provider requests, and the
+    run would fill the caches real users rely on.
+
+    Returns:
+        str: The run's data directory
+    """
+    data_dir = tempfile.mkdtemp(prefix="nexusai-load-test-")
+    os.environ.update({
+        "NEXUSAI_BLOB_DIR": os.path.join(data_dir, "blobs"),
+        "NEXUSAI_SCRATCH_DIR": os.path.join(data_dir, "scratch"),
+        "NEXUSAI_TTS_CACHE_DIR": os.path.join(data_dir, "tts_cache"),
+        "NEXUSAI_TRANSCRIPT_CACHE_DIR": os.path.join(data_dir, "transcript_cache"),
+        "NEXUSAI_INDEX_DIR": os.path.join(data_dir, "index"),
+        "NEXUSAI_HISTORY_DB": os.path.join(data_dir, "history.db"),
+    })
+    os.environ.update({
+        "GROQ_API_KEY": "mock",
+        "GROQ_BASE_URL": mock_url,
+        "OPENAI_API_KEY": "mock",
+        "OPENAI_BASE_URL": f"{mock_url}/v1",
+        "AZURE_OPENAI_API_KEY": "mock",
+        "AZURE_OPENAI_ENDPOINT": mock_url,
+        "OPENAI_API_VERSION": "2024-02-01",
+        "GOOGLE_API_KEY": "mock",
+        "GOOGLE_API_BASE_URL": mock_url,
+    })
+    # Measure the app rather than its own client-side throttling
+    for provider in ("GROQ", "OPENAI", "AZURE"):
+        os.environ.setdefault(f"{provider}_REQUESTS_PER_MINUTE", "100000")
+    return data_dir
+
+def main():
+    """Parse arguments, run the load test and print the report"""
+    parser = argparse.ArgumentParser(description="Load test NexusAI against the mock provider")
+    parser.add_argument("--users", type=int, default=10, help="Concurrent simulated sessions")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="chat", help="What each user does")
+    parser.add_argument("--turns", type=int, default=5, help="Actions per user after opening the page")
+    parser.add_argument("--mock-url", help="Use an already running mock_provider.py instead of starting one")
+    parser.add_argument("--port", type=int, default=8010, help="Port for the in-process mock")
+    parser.add_argument("--latency-ms", type=float, help="Override the mock's mean latency")
+    parser.add_argument("--error-rate", type=float, help="Override the mock's injected error rate")
+    parser.add_argument("--memory-sessions", type=int, default=5, help="Sessions measured under tracemalloc (0 to skip)")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds before a single rerun is abandoned")
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    mock_url = args.mock_url
+    if not mock_url:
+        import mock_provider
+
+        mock_provider.run_in_thread(port=args.port)
+        mock_url = f"http://127.0.0.1:{args.port}"
+    mock_url = mock_url.rstrip("/")
+    data_dir = configure_environment(mock_url)
+    atexit.register(shutil.rmtree, data_dir, ignore_errors=True)
+    use_distinct_session_ids()
+
+    overrides = {key: value for key, value in (("latency_ms", args.latency_ms), ("error_rate", args.error_rate)) if value is not None}
+    if overrides:
+        requests.post(f"{mock_url}/_mock/config", json=overrides, timeout=5)
+    requests.post(f"{mock_url}/_mock/reset", timeout=5)
+
+    # Import the app once up front so the first sessions don't pay for module loading
+    run_session("navigation", "warmup", 0, args.timeout)
+    from instrumentation import get_metrics_registry
+
+    get_metrics_registry().reset()
+    requests.post(f"{mock_url}/_mock/reset", timeout=5)
+
+    print(f"Running {args.users} users through '{args.scenario}' ({args.turns} turns each) against {mock_url}", file=sys.stderr)
+    start_time = time.perf_counter()
+    with ConcurrencySampler(mock_url) as sampler, ThreadPoolExecutor(max_workers=args.users) as executor:
+        outcomes = list(executor.map(lambda user: run_session(args.scenario, user, args.turns, args.timeout), range(args.users)))
+    duration = time.perf_counter() - start_time
+
+    rerun_times = [seconds for _, times, _ in outcomes for seconds in times]
+    failures = sum(failed for _, _, failed in outcomes)
+    del outcomes
+    mock_stats = requests.get(f"{mock_url}/_mock/stats", timeout=5).json()
+    provider_rows, provider_errors = get_metrics_registry().summarize()
+
+    report = {
+        'scenario': args.scenario,
+        'users': args.users,
+        'turns': args.turns,
+        'duration_s': round(duration, 3),
+        'reruns': len(rerun_times),
+        'failed_reruns': failures,
+        'rerun_p50_s': round(percentile(rerun_times, 50) or 0, 4),
+        'rerun_p99_s': round(percentile(rerun_times, 99) or 0, 4),
+        'rerun_max_s': round(max(rerun_times, default=0), 4),
+        'provider_requests': mock_stats['requests'],
+        'provider_injected_errors': mock_stats['errors'],
+        'provider_max_in_flight': mock_stats['max_in_flight'],
+        'provider_mean_in_flight': round(sum(sampler.samples) / len(sampler.samples), 2) if sampler.samples else 0,
+        'provider_calls': provider_rows,
+        'provider_errors': provider_errors,
+    }
+    if args.memory_sessions > 0:
+        report['memory_per_session_bytes'] = int(
+            measure_memory(args.scenario, args.turns, args.timeout, args.memory_sessions)
+        )
+
+    print(f"\nScenario: {report['scenario']}  users: {report['users']}  turns: {report['turns']}  duration: {report['duration_s']}s")
+    print(f"Page reruns: {report['reruns']} ({report['failed_reruns']} failed)  "
+          f"p50 {report['rerun_p50_s']}s  p99 {report['rerun_p99_s']}s  max {report['rerun_max_s']}s")
+    print(f"Provider concurrency: max {report['provider_max_in_flight']}  mean {report['provider_mean_in_flight']}")
+    print(f"Provider requests: {report['provider_requests']}  injected errors: {report['provider_injected_errors']}")
+    for row in provider_rows:
+        print(f"  {row['provider']}/{row['operation']}: {row['calls']} calls, {row['errors']} errors, "
+              f"p50 {row['p50_s']}s, p95 {row['p95_s']}s")
+    if 'memory_per_session_bytes' in report:
+        print(f"Memory per session: {report['memory_per_session_bytes'] / 1024 / 1024:.2f} MB "
+              f"(tracemalloc, {args.memory_sessions} sessions)")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -16,10 +16,17 @@ from image_generation_module import display_image_generation_interface
 from tts_module import display_tts_interface
 from stt_module import display_stt_interface
 from document_chat_module import display_document_chat_interface
+from diagnostics_module import display_diagnostics_interface
+from instrumentation import start_metrics_server
+from async_providers import get_request_tracker, page_request
+from session_utils import get_session_id
 
 # Load environment variables
 load_dotenv()
 
+# Serve Prometheus metrics when NEXUSAI_METRICS_PORT is set (started once per process)
+start_metrics_server()
+
 # Configuration
 st.set_page_config(
     page_title="NexusAI Dashboard", 
@@ -61,6 +68,8 @@ if 'page' not in st.session_state:
 
 # Function to change page
 def change_page(page):
+    # Abandon provider requests of the page being left instead of letting them run to completion
+    get_request_tracker().cancel(get_session_id(), st.session_state.page)
     st.session_state.page = page
 
 # Main application
@@ -126,6 +135,11 @@ def main():
             
         st.markdown("---")
         
+        # Diagnostics button
+        button_type = "primary" if current_page == "Diagnostics" else "secondary"
+        if st.button("🩺 Diagnostics", key="diagnostics_btn", use_container_width=True, type=button_type):
+            change_page("Diagnostics")
+        
         # Thank You button
         button_type = "primary" if current_page == "Thank You" else "secondary"
         if st.button("🙏 Thank You", key="thanks_btn", use_container_width=True, type=button_type):
@@ -163,24 +177,28 @@ def main():
         st.markdown("<div style='text-align: center; color: #888888;'>v2.0.0</div>", unsafe_allow_html=True)
     
     # Main content based on selected page
-    if st.session_state.page == "Home":
-        display_home_page()
-    elif st.session_state.page == "API Setup":
-        display_api_setup()
-    elif st.session_state.page == "Chat":
-        display_chat_interface()
-    elif st.session_state.page == "Image Analysis":
-        display_image_analysis_interface()
-    elif st.session_state.page == "Image Generation":
-        display_image_generation_interface()
-    elif st.session_state.page == "Text-to-Speech":
-        display_tts_interface()
-    elif st.session_state.page == "Speech-to-Text":
-        display_stt_interface()
-    elif st.session_state.page == "Document Chat":
-        display_document_chat_interface()
-    elif st.session_state.page == "Thank You":
-        display_thank_you()
+    # Each run of a page is its own request; what an earlier run left in flight is cancelled
+    with page_request(st.session_state.page):
+        if st.session_state.page == "Home":
+            display_home_page()
+        elif st.session_state.page == "API Setup":
+            display_api_setup()
+        elif st.session_state.page == "Chat":
+            display_chat_interface()
+        elif st.session_state.page == "Image Analysis":
+            display_image_analysis_interface()
+        elif st.session_state.page == "Image Generation":
+            display_image_generation_interface()
+        elif st.session_state.page == "Text-to-Speech":
+            display_tts_interface()
+        elif st.session_state.page == "Speech-to-Text":
+            display_stt_interface()
+        elif st.session_state.page == "Document Chat":
+            display_document_chat_interface()
+        elif st.session_state.page == "Diagnostics":
+            display_diagnostics_interface()
+        elif st.session_state.page == "Thank You":
+            display_thank_you()
 
 # Page functions
 def display_home_page():
@@ -0,0 +1,92 @@
+"""
+Media Utilities for NexusAI
+This module provides paginated, searchable history rendering and lazy audio so reruns don't read every entry or file.
+"""
+
+import os
+import math
+import time
+import streamlit as st
+from history_store import get_history_store
+from session_utils import get_history_key
+
+# History entries rendered per page
+HISTORY_PAGE_SIZE = int(os.getenv("NEXUSAI_HISTORY_PAGE_SIZE", "10"))
+
+def load_history_page(page, label):
+    """
+    Render search and page controls for a history and load only the entries to show
+
+    Args:
+        page: History name in the store (e.g. "chat")
+        label: Noun shown in the controls (e.g. "analyses")
+
+    Returns:
+        list: Entries of the selected page, newest first, each with its "number" in the history
+    """
+    store = get_history_store()
+    history_key = get_history_key()
+    total = store.count(history_key, page)
+    if not total:
+        return []
+
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        query = st.text_input(f"Search {label}:", key=f"history_search_{page}")
+    matches = store.count(history_key, page, query) if query else total
+    pages = max(1, math.ceil(matches / HISTORY_PAGE_SIZE))
+    with col2:
+        page_number = st.number_input("Page:", min_value=1, max_value=pages, value=1, key=f"history_page_{page}_{pages}")
+
+    offset = (page_number - 1) * HISTORY_PAGE_SIZE
+    entries = store.entries(history_key, page, offset, HISTORY_PAGE_SIZE, query)
+    if query:
+        st.caption(f"{matches} of {total} {label} match")
+    elif pages > 1:
+        st.caption(f"Showing {offset + 1}-{offset + len(entries)} of {total} {label}")
+    for index, entry in enumerate(entries):
+        entry['number'] = matches - offset - index
+    return entries
+
+def save_history_entry(page, data, search_text="", thumbnail=None):
+    """Append an entry to this browser's history of a page and return its id"""
+    data = {**data, 'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')}
+    return get_history_store().add(get_history_key(), page, data, search_text, thumbnail)
+
+def clear_history(page):
+    """Delete this browser's history of a page; the media its entries reference is released"""
+    return get_history_store().clear(get_history_key(), page)
+
+def render_lazy_audio(path, audio_format, download_name, key):
+    """
+    Render a player and download button for an audio file, reading it only when requested
+
+    Args:
+        path: Path of the audio file on disk
+        audio_format: Audio format used for the MIME type (e.g. "wav")
+        download_name: File name offered to the browser
+        key: Unique widget key for this entry
+    """
+    if not path or not os.path.exists(path):
+        st.info("This audio file is no longer available.")
+        return
+
+    size_kb = os.path.getsize(path) / 1024
+    if not st.toggle(f"Load audio ({size_kb:,.0f} KB)", key=f"load_audio_{key}"):
+        return
+
+    # Read once; the player and the download button share the bytes
+    try:
+        with open(path, "rb") as audio_file:
+            audio_bytes = audio_file.read()
+    except FileNotFoundError:
+        st.info("This audio file is no longer available.")
+        return
+    st.audio(audio_bytes, format=f"audio/{audio_format}")
+    st.download_button(
+        label="Download Audio",
+        data=audio_bytes,
+        file_name=download_name,
+        mime=f"audio/{audio_format}",
+        key=f"download_audio_{key}"
+    )
@@ -0,0 +1,385 @@
+"""
+Mock Provider for NexusAI
+This module serves an offline stand-in for the Groq, OpenAI, Azure OpenAI and Gemini endpoints the app uses.
+
+Point the app at it with:
+    GROQ_BASE_URL=http://127.0.0.1:8010
+    OPENAI_BASE_URL=http://127.0.0.1:8010/v1
+    AZURE_OPENAI_ENDPOINT=http://127.0.0.1:8010
+    GOOGLE_API_BASE_URL=http://127.0.0.1:8010
+
+Run with: python mock_provider.py --port 8010 --latency-ms 300 --error-rate 0.02
+"""
+
+import io
+import json
+import time
+import wave
+import random
+import asyncio
+import hashlib
+import argparse
+import threading
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+EMBEDDING_DIMENSIONS = 768
+# Transcription durations are estimated assuming 16 kHz mono 16-bit audio
+ASSUMED_AUDIO_BYTES_PER_SECOND = 32000
+
+@dataclass
+class MockConfig:
+    """Latency, throughput and failure behaviour of the mock"""
+    latency_ms: float = 200.0
+    jitter_ms: float = 50.0
+    tokens_per_second: float = 200.0
+    reply_tokens: int = 60
+    error_rate: float = 0.0
+    error_status: int = 500
+    max_concurrency: int = 0
+
+class MockStats:
+    """Request counts and concurrency observed by the mock"""
+
+    def __init__(self):
+        """Initialize empty counters"""
+        self.lock = threading.Lock()
+        self.requests = {}
+        self.errors = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def reset(self) -> None:
+        """Clear the counters, keeping requests that are still in flight"""
+        with self.lock:
+            self.requests = {}
+            self.errors = {}
+            self.max_in_flight = self.in_flight
+
+    def start(self, endpoint: str) -> int:
+        """Count a request starting, returning the number now in flight"""
+        with self.lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            return self.in_flight
+
+    def finish(self) -> None:
+        """Count a request finishing"""
+        with self.lock:
+            self.in_flight -= 1
+
+    def error(self, endpoint: str) -> None:
+        """Count an injected error"""
+        with self.lock:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Get a copy of the counters"""
+        with self.lock:
+            return {
+                'requests': dict(self.requests),
+                'errors': dict(self.errors),
+                'in_flight': self.in_flight,
+                'max_in_flight': self.max_in_flight
+            }
+
+config = MockConfig()
+stats = MockStats()
+app = FastAPI(title="NexusAI Mock Provider")
+
+class InjectedError(Exception):
+    """Raised to turn a request into an error response"""
+
+    def __init__(self, status: int, message: str):
+        self.status = status
+        self.message = message
+
+@app.exception_handler(InjectedError)
+async def injected_error_handler(request: Request, error: InjectedError):
+    """Return errors in the OpenAI error format"""
+    return JSONResponse(status_code=error.status, content={"error": {"message": error.message, "type": "mock_error"}})
+
+async def simulate(endpoint: str) -> None:
+    """Apply the configured latency, concurrency limit and error injection to one request"""
+    in_flight = stats.start(endpoint)
+    try:
+        if config.max_concurrency and in_flight > config.max_concurrency:
+            stats.error(endpoint)
+            raise InjectedError(429, "Mock concurrency limit exceeded")
+        await asyncio.sleep(max(0.0, random.gauss(config.latency_ms, config.jitter_ms)) / 1000)
+        if random.random() < config.error_rate:
+            stats.error(endpoint)
+            raise InjectedError(config.error_status, "Injected mock failure")
+    except BaseException:
+        stats.finish()
+        raise
+
+def reply_text(prompt: str) -> List[str]:
+    """Build a deterministic reply of config.reply_tokens words"""
+    words = prompt.split()[:8] or ["nothing"]
+    filler = "lorem ipsum dolor sit amet consectetur adipiscing elit".split()
+    reply = ["Mock", "reply", "to:"] + words
+    while len(reply) < config.reply_tokens:
+        reply.append(filler[len(reply) % len(filler)])
+    return [word + " " for word in reply[:config.reply_tokens]]
+
+def last_user_text(messages: List[Dict[str, Any]]) -> str:
+    """Get the text of the last user message, including multimodal content parts"""
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            content = message.get("content")
+            if isinstance(content, list):
+                return " ".join(part.get("text", "") for part in content if part.get("type") == "text")
+            return content or ""
+    return ""
+
+def embed(text: str) -> List[float]:
+    """Embed text as a normalized hashed bag of words, so similar texts get similar vectors"""
+    vector = [0.0] * EMBEDDING_DIMENSIONS
+    for word in text.lower().split():
+        bucket = int(hashlib.md5(word.encode("utf-8")).hexdigest(), 16) % EMBEDDING_DIMENSIONS
+        vector[bucket] += 1.0
+    norm = sum(value * value for value in vector) ** 0.5 or 1.0
+    return [value / norm for value in vector]
+
+def sine_wav(seconds: float, sample_rate: int = 16000) -> bytes:
+    """Generate a quiet tone as WAV audio"""
+    import math
+
+    frames = int(seconds * sample_rate)
+    output = io.BytesIO()
+    with wave.open(output, "wb") as writer:
+        writer.setnchannels(1)
+        writer.setsampwidth(2)
+        writer.setframerate(sample_rate)
+        writer.writeframes(b"".join(
+            int(3000 * math.sin(2 * math.pi * 440 * i / sample_rate)).to_bytes(2, "little", signed=True)
+            for i in range(frames)
+        ))
+    return output.getvalue()
+
+async def chat_completions(request: Request):
+    """OpenAI-compatible chat completions, streamed when requested"""
+    body = await request.json()
+    await simulate("chat")
+    model = body.get("model", "mock")
+    prompt = last_user_text(body.get("messages", []))
+    words = reply_text(prompt)
+    usage = {
+        'prompt_tokens': len(json.dumps(body.get("messages", [])).split()),
+        'completion_tokens': len(words),
+    }
+    usage['total_tokens'] = usage['prompt_tokens'] + usage['completion_tokens']
+    completion_id = f"chatcmpl-mock-{random.getrandbits(32):08x}"
+
+    if not body.get("stream"):
+        try:
+            await asyncio.sleep(len(words) / config.tokens_per_second)
+        finally:
+            stats.finish()
+        return {
+            'id': completion_id,
+            'object': "chat.completion",
+            'created': int(time.time()),
+            'model': model,
+            'choices': [{
+                'index': 0,
+                'message': {'role': "assistant", 'content': "".join(words).strip()},
+                'finish_reason': "stop"
+            }],
+            'usage': usage
+        }
+
+    async def events():
+        try:
+            for word in words:
+                chunk = {
+                    'id': completion_id, 'object': "chat.completion.chunk", 'created': int(time.time()), 'model': model,
+                    'choices': [{'index': 0, 'delta': {'content': word}, 'finish_reason': None}]
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(1 / config.tokens_per_second)
+            final = {
+                'id': completion_id, 'object': "chat.completion.chunk", 'created': int(time.time()), 'model': model,
+                'choices': [{'index': 0, 'delta': {}, 'finish_reason': "stop"}], 'x_groq': {'usage': usage}
+            }
+            yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+        finally:
+            stats.finish()
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+async def speech(request: Request):
+    """Text-to-speech returning a tone whose length follows the text; always WAV-encoded"""
+    body = await request.json()
+    await simulate("speech")
+    try:
+        seconds = min(60.0, max(0.5, len(body.get("input", "")) / 15))
+        # Synthesis time follows the token rate, at about four characters per token
+        await asyncio.sleep(len(body.get("input", "")) / (config.tokens_per_second * 4))
+        return Response(content=sine_wav(seconds), media_type="audio/wav")
+    finally:
+        stats.finish()
+
+async def transcriptions(request: Request):
+    """Whisper-style verbose_json transcription; the multipart body is only measured, not parsed"""
+    size = len(await request.body())
+    await simulate("transcription")
+    try:
+        duration = max(1.0, size / ASSUMED_AUDIO_BYTES_PER_SECOND)
+        segments, words = [], []
+        start = 0.0
+        while start < duration:
+            end = min(duration, start + 5.0)
+            text = f"Mock segment {len(segments) + 1}."
+            segments.append({'id': len(segments), 'start': start, 'end': end, 'text': text})
+            for offset, word in enumerate(text.split()):
+                words.append({'word': word, 'start': start + offset, 'end': start + offset + 1})
+            start = end
+        return {
+            'text': " ".join(segment['text'] for segment in segments),
+            'language': "english",
+            'duration': duration,
+            'segments': segments,
+            'words': words
+        }
+    finally:
+        stats.finish()
+
+async def image_generations(request: Request):
+    """DALL-E style image generation returning a URL served by this mock"""
+    body = await request.json()
+    await simulate("image_generation")
+    try:
+        seed = hashlib.sha256(json.dumps(body, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+        base_url = str(request.base_url).rstrip("/")
+        return {
+            'created': int(time.time()),
+            'data': [{'url': f"{base_url}/_mock/images/{seed}.png", 'revised_prompt': body.get("prompt", "")}]
+        }
+    finally:
+        stats.finish()
+
+@app.get("/_mock/images/{seed}.png")
+async def image_file(seed: str):
+    """Serve a small solid-colour PNG for a generated image"""
+    from PIL import Image
+
+    colour = tuple(int(seed[i:i + 2], 16) for i in (0, 2, 4)) if len(seed) >= 6 else (128, 128, 128)
+    buffer = io.BytesIO()
+    Image.new("RGB", (256, 256), colour).save(buffer, format="PNG")
+    return Response(content=buffer.getvalue(), media_type="image/png")
+
+@app.post("/v1beta/models/{model_action}")
+async def gemini(model_action: str, request: Request):
+    """Gemini embedContent, batchEmbedContents and generateContent"""
+    body = await request.json()
+    action = model_action.split(":")[-1]
+    await simulate(f"gemini_{action}")
+    try:
+        if action == "embedContent":
+            text = " ".join(part.get("text", "") for part in body.get("content", {}).get("parts", []))
+            return {'embedding': {'values': embed(text)}}
+        if action == "batchEmbedContents":
+            return {'embeddings': [
+                {'values': embed(" ".join(part.get("text", "") for part in item.get("content", {}).get("parts", [])))}
+                for item in body.get("requests", [])
+            ]}
+        if action == "generateContent":
+            prompt = " ".join(
+                part.get("text", "") for content in body.get("contents", []) for part in content.get("parts", [])
+            )
+            words = reply_text(prompt[-200:])
+            await asyncio.sleep(len(words) / config.tokens_per_second)
+            return {
+                'candidates': [{
+                    'content': {'parts': [{'text': "".join(words).strip()}], 'role': "model"},
+                    'finishReason': "STOP",
+                    'index': 0
+                }],
+                'usageMetadata': {
+                    'promptTokenCount': len(prompt.split()),
+                    'candidatesTokenCount': len(words),
+                    'totalTokenCount': len(prompt.split()) + len(words)
+                }
+            }
+        raise InjectedError(404, f"Unsupported Gemini action {action}")
+    finally:
+        stats.finish()
+
+# Groq serves the OpenAI API under /openai/v1, OpenAI under /v1 and Azure under /openai/deployments/<name>
+for prefix in ("/openai/v1", "/v1"):
+    app.add_api_route(f"{prefix}/chat/completions", chat_completions, methods=["POST"])
+    app.add_api_route(f"{prefix}/audio/speech", speech, methods=["POST"])
+    app.add_api_route(f"{prefix}/audio/transcriptions", transcriptions, methods=["POST"])
+    app.add_api_route(f"{prefix}/images/generations", image_generations, methods=["POST"])
+app.add_api_route("/openai/deployments/{deployment}/images/generations", image_generations, methods=["POST"])
+
+@app.get("/_mock/stats")
+async def get_stats():
+    """Report request counts, injected errors and observed concurrency"""
+    return stats.snapshot()
+
+@app.post("/_mock/reset")
+async def reset_stats():
+    """Clear the counters"""
+    stats.reset()
+    return stats.snapshot()
+
+@app.get("/_mock/config")
+async def get_config():
+    """Report the current behaviour"""
+    return asdict(config)
+
+@app.post("/_mock/config")
+async def update_config(request: Request):
+    """Change latency, throughput or error injection without a restart"""
+    for key, value in (await request.json()).items():
+        if hasattr(config, key):
+            setattr(config, key, type(getattr(config, key))(value))
+    return asdict(config)
+
+def run_in_thread(host: str = "127.0.0.1", port: int = 8010):
+    """
+    Serve the mock from a daemon thread, returning once it accepts connections
+
+    Returns:
+        uvicorn.Server: Set should_exit on it to stop serving
+    """
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning", access_log=False))
+    threading.Thread(target=server.run, name="mock-provider", daemon=True).start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"Mock provider failed to start on {host}:{port}")
+        time.sleep(0.05)
+    return server
+
+def main():
+    """Parse arguments and serve the mock with uvicorn"""
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve an offline mock of the NexusAI providers")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind")
+    parser.add_argument("--port", type=int, default=8010, help="Port to listen on")
+    parser.add_argument("--latency-ms", type=float, default=config.latency_ms, help="Mean time before a response starts")
+    parser.add_argument("--jitter-ms", type=float, default=config.jitter_ms, help="Standard deviation of the latency")
+    parser.add_argument("--tokens-per-second", type=float, default=config.tokens_per_second, help="Generation throughput")
+    parser.add_argument("--reply-tokens", type=int, default=config.reply_tokens, help="Words per chat reply")
+    parser.add_argument("--error-rate", type=float, default=config.error_rate, help="Fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=config.error_status, help="HTTP status of injected failures")
+    parser.add_argument("--max-concurrency", type=int, default=0, help="Reject requests over this many in flight with 429")
+    args = parser.parse_args()
+
+    for key in asdict(config):
+        setattr(config, key, getattr(args, key))
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
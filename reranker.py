@@ -0,0 +1,242 @@
+"""
+Reranker for NexusAI
+This module re-ranks over-fetched Document Chat candidates on CPU within a time budget, so only the best few chunks reach the LLM.
+
+Candidates are scored by embedding similarity blended with IDF-weighted lexical overlap and,
+when sentence-transformers is installed and NEXUSAI_RERANK_MODEL names a model, a cross-encoder.
+The final chunks are picked with maximal marginal relevance so near-duplicates don't crowd out
+other evidence.
+"""
+
+import os
+import re
+import math
+import time
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from pydantic import Field
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from index_manager import get_index_manager
+from instrumentation import track_call
+from tracing import span
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+# Only the strongest candidates are worth a cross-encoder pass
+CROSS_ENCODER_CANDIDATES = 20
+CROSS_ENCODER_BATCH = 8
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase word tokens, dropping single characters"""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if len(token) > 1]
+
+def lexical_scores(query: str, texts: List[str]) -> np.ndarray:
+    """
+    Score each text by the share of the query's IDF weight it contains
+
+    Document frequencies come from the candidates themselves, so terms every candidate shares
+    count for little.
+    """
+    query_terms = set(tokenize(query))
+    if not query_terms or not texts:
+        return np.zeros(len(texts))
+    token_sets = [set(tokenize(text)) for text in texts]
+    weights = {}
+    for term in query_terms:
+        frequency = sum(1 for tokens in token_sets if term in tokens)
+        weights[term] = math.log(1 + (len(texts) - frequency + 0.5) / (frequency + 0.5))
+    total = sum(weights.values()) or 1.0
+    return np.array([sum(weights[term] for term in query_terms & tokens) / total for tokens in token_sets])
+
+def normalize(scores: np.ndarray) -> np.ndarray:
+    """Min-max scale scores to [0, 1]; constant scores become all ones"""
+    if not len(scores):
+        return scores
+    low, high = float(scores.min()), float(scores.max())
+    if high - low < 1e-12:
+        return np.ones_like(scores, dtype=float)
+    return (scores - low) / (high - low)
+
+def mmr_select(relevance: np.ndarray, embeddings: np.ndarray, k: int, diversity_lambda: float,
+               deadline: float) -> Tuple[List[int], bool]:
+    """
+    Pick k candidates by maximal marginal relevance
+
+    Past the deadline the remaining picks fall back to plain relevance order.
+
+    Args:
+        relevance: Relevance of each candidate in [0, 1]
+        embeddings: Unit-length candidate embeddings, one row per candidate
+        k: Number of candidates to pick
+        diversity_lambda: 1.0 ranks by relevance only, lower values favor diversity
+        deadline: time.perf_counter() value after which to stop diversifying
+
+    Returns:
+        tuple: (picked indices in order, whether the deadline cut MMR short)
+    """
+    remaining = list(np.argsort(-relevance))
+    picked = []
+    max_similarity = np.zeros(len(relevance))
+    while remaining and len(picked) < k:
+        if time.perf_counter() > deadline:
+            picked.extend(remaining[:k - len(picked)])
+            return picked, True
+        scores = diversity_lambda * relevance[remaining] - (1 - diversity_lambda) * max_similarity[remaining]
+        best = remaining.pop(int(np.argmax(scores)))
+        picked.append(best)
+        max_similarity = np.maximum(max_similarity, embeddings @ embeddings[best])
+    return picked, False
+
+_cross_encoder = None
+_cross_encoder_lock = threading.Lock()
+
+def get_cross_encoder() -> Optional[Any]:
+    """
+    Load the cross-encoder named by NEXUSAI_RERANK_MODEL once per process
+
+    Returns:
+        The model, or None when no model is configured or sentence-transformers isn't installed
+    """
+    global _cross_encoder
+    model_name = os.getenv("NEXUSAI_RERANK_MODEL")
+    if not model_name:
+        return None
+    with _cross_encoder_lock:
+        if _cross_encoder is None:
+            try:
+                from sentence_transformers import CrossEncoder
+            except ImportError:
+                _cross_encoder = False
+            else:
+                _cross_encoder = CrossEncoder(model_name, device="cpu")
+        return _cross_encoder or None
+
+class Reranker:
+    """Blend dense, lexical and optional cross-encoder scores, then diversify with MMR"""
+
+    def __init__(self, k: int = 5, lexical_weight: float = 0.3, diversity_lambda: float = 0.7,
+                 budget_seconds: float = 0.15, cross_encoder: Optional[Any] = None):
+        """
+        Initialize the reranker
+
+        Args:
+            k: Chunks passed on to the LLM
+            lexical_weight: Share of the lexical score in the first-stage relevance
+            diversity_lambda: MMR trade-off; 1.0 disables diversification
+            budget_seconds: Time allowed for re-ranking; optional stages are skipped when it runs out
+            cross_encoder: Optional sentence-transformers CrossEncoder
+        """
+        self.k = k
+        self.lexical_weight = lexical_weight
+        self.diversity_lambda = diversity_lambda
+        self.budget_seconds = budget_seconds
+        self.cross_encoder = cross_encoder
+
+    @property
+    def name(self) -> str:
+        """Scorer name used in metrics"""
+        return "cross-encoder+mmr" if self.cross_encoder is not None else "lexical+mmr"
+
+    def _cross_encoder_scores(self, query: str, texts: List[str], deadline: float) -> Optional[np.ndarray]:
+        """Score texts with the cross-encoder batch by batch, or None if the deadline would pass first"""
+        scores = []
+        batch_seconds = 0.0
+        for offset in range(0, len(texts), CROSS_ENCODER_BATCH):
+            # A batch can't be interrupted, so don't start one that the last batch says won't fit
+            if time.perf_counter() + batch_seconds > deadline:
+                return None
+            batch_started = time.perf_counter()
+            batch = texts[offset:offset + CROSS_ENCODER_BATCH]
+            scores.extend(self.cross_encoder.predict([(query, text) for text in batch]))
+            batch_seconds = time.perf_counter() - batch_started
+        return np.array(scores, dtype=float)
+
+    def rerank(self, query: str, query_embedding: List[float],
+               candidates: List[Tuple[Document, Any]]) -> Tuple[List[Document], Dict[str, Any]]:
+        """
+        Choose the best k candidates for a query
+
+        Args:
+            query: The search query
+            query_embedding: The query's embedding
+            candidates: (document, embedding) pairs from the vector search, nearest first
+
+        Returns:
+            tuple: (chosen documents, stats with the candidate count, stages run and elapsed time)
+        """
+        started = time.perf_counter()
+        deadline = started + self.budget_seconds
+        stats = {'candidates': len(candidates), 'returned': 0, 'cross_encoder': "off", 'mmr': "off"}
+        if not candidates:
+            stats['rerank_ms'] = 0.0
+            return [], stats
+
+        documents = [document for document, _ in candidates]
+        texts = [document.page_content for document in documents]
+        embeddings = np.array([embedding for _, embedding in candidates], dtype=float)
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True).clip(min=1e-12)
+        query_vector = np.asarray(query_embedding, dtype=float)
+        query_vector /= max(float(np.linalg.norm(query_vector)), 1e-12)
+
+        dense = normalize(embeddings @ query_vector)
+        relevance = (1 - self.lexical_weight) * dense + self.lexical_weight * normalize(lexical_scores(query, texts))
+
+        if self.cross_encoder is not None:
+            top = np.argsort(-relevance)[:CROSS_ENCODER_CANDIDATES]
+            scores = self._cross_encoder_scores(query, [texts[index] for index in top], deadline)
+            if scores is None:
+                stats['cross_encoder'] = "skipped (budget)"
+            else:
+                # Cross-encoded candidates outrank the rest, ordered by the cross-encoder
+                relevance[top] = 1 + normalize(scores)
+                relevance = normalize(relevance)
+                stats['cross_encoder'] = "on"
+
+        if self.diversity_lambda < 1.0:
+            picked, cut_short = mmr_select(relevance, embeddings, self.k, self.diversity_lambda, deadline)
+            stats['mmr'] = "cut short (budget)" if cut_short else "on"
+        else:
+            picked = list(np.argsort(-relevance)[:self.k])
+
+        chosen = [documents[index] for index in picked]
+        stats['returned'] = len(chosen)
+        stats['rerank_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        return chosen, stats
+
+def get_reranker() -> Reranker:
+    """Build a reranker configured from the environment"""
+    return Reranker(
+        k=int(os.getenv("NEXUSAI_RERANK_TOP_K", "5")),
+        lexical_weight=float(os.getenv("NEXUSAI_RERANK_LEXICAL_WEIGHT", "0.3")),
+        diversity_lambda=float(os.getenv("NEXUSAI_RERANK_MMR_LAMBDA", "0.7")),
+        budget_seconds=float(os.getenv("NEXUSAI_RERANK_BUDGET_MS", "150")) / 1000,
+        cross_encoder=get_cross_encoder()
+    )
+
+class RerankingRetriever(BaseRetriever):
+    """Over-fetch from a workspace by vector search, then re-rank down to the best few chunks"""
+
+    workspace: Any
+    embeddings: Any
+    reranker: Any
+    fetch_k: int = 50
+    # Stats of the latest query, read back by the caller after the chain runs
+    stats: Dict[str, Any] = Field(default_factory=dict)
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        with span("retrieve", fetch_k=self.fetch_k, k=self.reranker.k):
+            with span("embed_query"):
+                query_embedding = self.embeddings.embed_query(query)
+            with span("vector_search", fetch_k=self.fetch_k) as stage:
+                candidates = get_index_manager().search(self.workspace, query_embedding, self.fetch_k)
+                stage.set(candidates=len(candidates))
+            # Recorded as its own operation so re-rank latency is reported apart from the LLM call
+            with span("rerank", scorer=self.reranker.name, k=self.reranker.k) as stage, \
+                    track_call("local", "rerank", self.reranker.name):
+                documents, stats = self.reranker.rerank(query, query_embedding, candidates)
+                stage.set(returned=stats['returned'], cross_encoder=stats['cross_encoder'], mmr=stats['mmr'])
+        self.stats.clear()
+        self.stats.update(stats)
+        return documents
@@ -41,7 +41,7 @@ if (-not $?) {
 # Run the application
 Write-Host "🚀 Launching NexusAI..." -ForegroundColor Green
 Write-Host "------------------------------" -ForegroundColor Cyan
-streamlit run main.py
+python serve.py
 
 # Deactivate virtual environment when done
 deactivate
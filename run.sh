@@ -39,7 +39,7 @@ fi
 # Run the application
 echo "🚀 Launching NexusAI..."
 echo "------------------------------"
-streamlit run main.py
+python serve.py
 
 # Deactivate virtual environment when done
 deactivate
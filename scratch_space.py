@@ -0,0 +1,132 @@
+"""
+Scratch Space Module for NexusAI
+This module manages per-session temporary files for audio and document uploads.
+"""
+
+import os
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+from typing import Optional
+from session_utils import on_session_end
+
+class ScratchQuotaExceeded(Exception):
+    """Raised when a write would take a session over its scratch quota"""
+
+class ScratchSpace:
+    """Reference-counted temporary files in one directory per session"""
+
+    def __init__(self, root: str, session_quota_bytes: int, orphan_age_seconds: int = 6 * 3600):
+        """
+        Initialize the scratch space
+
+        Args:
+            root: Directory holding the per-session directories
+            session_quota_bytes: Maximum bytes a single session may hold
+            orphan_age_seconds: Age after which directories left by earlier processes are removed
+        """
+        self.root = root
+        self.session_quota_bytes = session_quota_bytes
+        self.orphan_age_seconds = orphan_age_seconds
+        self.lock = threading.Lock()
+        # session_id -> {digest+suffix: [path, size, refs]}
+        self.sessions = {}
+        os.makedirs(self.root, exist_ok=True)
+
+    def _session_dir(self, session_id: str) -> str:
+        """Get the directory of a session"""
+        return os.path.join(self.root, hashlib.sha256(session_id.encode("utf-8")).hexdigest()[:16])
+
+    def write(self, session_id: str, data: bytes, suffix: str = "") -> str:
+        """
+        Write data once per content hash and take a reference to it
+
+        Args:
+            session_id: The session that owns the file
+            data: The file contents
+            suffix: File extension including the dot (e.g. ".wav")
+
+        Returns:
+            str: Path of the file; pass it to release() when done
+        """
+        key = hashlib.sha256(data).hexdigest() + suffix
+        with self.lock:
+            files = self.sessions.setdefault(session_id, {})
+            if key in files and os.path.exists(files[key][0]):
+                files[key][2] += 1
+                return files[key][0]
+
+            usage = sum(size for _, size, _ in files.values())
+            if usage + len(data) > self.session_quota_bytes:
+                raise ScratchQuotaExceeded(
+                    f"Scratch space quota of {self.session_quota_bytes // (1024 * 1024)} MB exceeded for this session"
+                )
+
+            session_dir = self._session_dir(session_id)
+            os.makedirs(session_dir, exist_ok=True)
+            path = os.path.join(session_dir, key)
+            with open(path, "wb") as f:
+                f.write(data)
+            files[key] = [path, len(data), 1]
+            return path
+
+    def release(self, session_id: str, path: Optional[str]) -> None:
+        """Drop a reference to a file, deleting it when no references remain"""
+        if not path:
+            return
+        with self.lock:
+            files = self.sessions.get(session_id, {})
+            key = os.path.basename(path)
+            if key not in files:
+                return
+            files[key][2] -= 1
+            if files[key][2] > 0:
+                return
+            del files[key]
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def release_session(self, session_id: str) -> None:
+        """Delete every file held by a session"""
+        with self.lock:
+            self.sessions.pop(session_id, None)
+        shutil.rmtree(self._session_dir(session_id), ignore_errors=True)
+
+    def session_usage(self, session_id: str) -> int:
+        """Get the number of bytes held by a session"""
+        with self.lock:
+            return sum(size for _, size, _ in self.sessions.get(session_id, {}).values())
+
+    def remove_orphans(self) -> None:
+        """Remove old session directories that no live session owns, e.g. after a restart"""
+        with self.lock:
+            owned = {os.path.basename(self._session_dir(session_id)) for session_id in self.sessions}
+        cutoff = time.time() - self.orphan_age_seconds
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name not in owned and os.path.isdir(path) and os.path.getmtime(path) < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+
+_scratch_space = None
+_scratch_space_lock = threading.Lock()
+
+def get_scratch_space() -> ScratchSpace:
+    """Get the process-wide scratch space configured from the environment"""
+    global _scratch_space
+    with _scratch_space_lock:
+        if _scratch_space is None:
+            root = os.getenv("NEXUSAI_SCRATCH_DIR", os.path.join(tempfile.gettempdir(), "nexusai_scratch"))
+            quota_mb = int(os.getenv("NEXUSAI_SESSION_SCRATCH_QUOTA_MB", "500"))
+            _scratch_space = ScratchSpace(root, quota_mb * 1024 * 1024)
+            _scratch_space.remove_orphans()
+
+            def cleanup(session_id):
+                _scratch_space.release_session(session_id)
+                _scratch_space.remove_orphans()
+
+            on_session_end(cleanup)
+        return _scratch_space
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""
+Server Launcher for NexusAI
+This module warms up the process and then runs the Streamlit app in it, so the server only answers once warm.
+
+Run with: python serve.py --server.port 8501 --server.address 0.0.0.0
+Any arguments are passed on to `streamlit run main.py`.
+"""
+
+import os
+import sys
+from dotenv import load_dotenv
+from warmup import format_report, run_warmup
+
+def main():
+    """Warm up, then hand the process to Streamlit"""
+    load_dotenv()
+    report = run_warmup()
+    print(format_report(report), flush=True)
+
+    from streamlit.web import cli as streamlit_cli
+
+    main_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+    sys.argv = ["streamlit", "run", main_script, *sys.argv[1:]]
+    sys.exit(streamlit_cli.main())
+
+if __name__ == "__main__":
+    main()
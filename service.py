@@ -0,0 +1,289 @@
+"""
+Service Layer for NexusAI
+This module exposes each capability as a plain function for the HTTP API and the batch CLI.
+"""
+
+import os
+import base64
+import inspect
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+from concurrency import get_rate_limiter
+from chat_module import initialize_chat_client, chat_completion, chat_completion_stream
+from image_analysis_module import initialize_image_client, analyze_image
+from image_generation_module import initialize_openai_client, initialize_azure_openai_client, generate_image
+from tts_module import initialize_tts_client, synthesize_speech_cached
+from stt_module import initialize_whisper_client, transcribe_file
+from scratch_space import get_scratch_space
+
+DEFAULT_CHAT_MODEL = "llama3-70b-8192"
+DEFAULT_VISION_MODEL = "meta-llama/llama-4-scout-17b-16e-instruct"
+DEFAULT_TTS_MODEL = "playai-tts"
+DEFAULT_TTS_VOICE = "Aaliyah-PlayAI"
+IMAGE_PROVIDERS = ("openai", "azure")
+
+AUDIO_MEDIA_TYPES = {
+    "wav": "audio/wav",
+    "mp3": "audio/mpeg",
+    "aac": "audio/aac",
+    "flac": "audio/flac",
+    "pcm": "application/octet-stream",
+}
+
+# Scratch files written on behalf of API and CLI callers are owned by this pseudo-session
+SERVICE_SESSION_ID = "service"
+
+class ServiceError(Exception):
+    """Raised when a request can't be served, e.g. because it is invalid"""
+
+class ProviderError(ServiceError):
+    """Raised when an upstream provider call fails"""
+
+class ProviderUnavailable(ServiceError):
+    """Raised when the provider a request needs isn't configured"""
+
+class NamedBytes:
+    """Minimal stand-in for a Streamlit UploadedFile"""
+
+    def __init__(self, name: str, data: bytes):
+        """Wrap raw bytes under a file name"""
+        self.name = name
+        self.data = data
+
+    def getvalue(self) -> bytes:
+        """Get the file contents"""
+        return self.data
+
+_document_chats = {}
+_document_chats_lock = threading.Lock()
+
+def _require(client: Any, provider: str) -> Any:
+    """Raise ProviderUnavailable when a provider's client couldn't be built"""
+    if not client:
+        raise ProviderUnavailable(f"{provider} API key not set")
+    return client
+
+def _check(result: Any) -> Any:
+    """Turn the UI modules' "Error: ..." results into exceptions"""
+    if result is None:
+        raise ProviderError("The provider returned no result")
+    if isinstance(result, str) and result.startswith("Error:"):
+        raise ProviderError(result[len("Error:"):].strip())
+    return result
+
+def chat(messages: List[Dict[str, str]], model: str = DEFAULT_CHAT_MODEL, temperature: float = 0.7,
+         max_tokens: int = 1024, top_p: float = 1.0) -> Dict[str, Any]:
+    """
+    Run a chat completion
+
+    Args:
+        messages: OpenAI-style list of {"role", "content"} messages
+        model: Groq chat model
+        temperature: Sampling temperature
+        max_tokens: Maximum tokens in the reply
+        top_p: Nucleus sampling cutoff
+
+    Returns:
+        dict: {"content": reply text}
+    """
+    content = chat_completion(_require(initialize_chat_client(), "Groq"), messages, model, temperature, max_tokens, top_p)
+    return {"content": _check(content)}
+
+def chat_stream(messages: List[Dict[str, str]], model: str = DEFAULT_CHAT_MODEL, temperature: float = 0.7,
+                max_tokens: int = 1024, top_p: float = 1.0) -> Iterator[str]:
+    """Run a chat completion, yielding text as the model generates it"""
+    client = _require(initialize_chat_client(), "Groq")
+    get_rate_limiter("groq").acquire()
+    yield from chat_completion_stream(client, messages, model, temperature, max_tokens, top_p)
+
+def image_analysis(image: bytes, prompt: str = "Describe this image in detail.",
+                   model: str = DEFAULT_VISION_MODEL) -> Dict[str, Any]:
+    """
+    Analyze an image with a multimodal model
+
+    Returns:
+        dict: {"content": analysis text}
+    """
+    client = _require(initialize_image_client(), "Groq")
+    return {"content": _check(analyze_image(client, image, prompt, model))}
+
+def image_generation(prompt: str, size: str = "1024x1024", provider: str = "openai", style: str = "vivid",
+                     quality: str = "standard") -> Dict[str, Any]:
+    """
+    Generate an image with DALL-E 3
+
+    Returns:
+        dict: {"url": provider URL of the generated image}
+    """
+    if provider not in IMAGE_PROVIDERS:
+        raise ServiceError(f"Unknown image provider: {provider}")
+    if provider == "openai":
+        client = _require(initialize_openai_client(), "OpenAI")
+    else:
+        client = _require(initialize_azure_openai_client(), "Azure OpenAI")
+    return {"url": _check(generate_image(client, prompt, size, provider, style, quality))}
+
+def speech(text: str, voice: str = DEFAULT_TTS_VOICE, model: str = DEFAULT_TTS_MODEL,
+           output_format: str = "wav") -> Dict[str, Any]:
+    """
+    Synthesize speech, reusing the shared TTS cache
+
+    Returns:
+        dict: {"audio": encoded audio bytes, "format": output format}
+    """
+    client = _require(initialize_tts_client(), "Groq")
+    audio = synthesize_speech_cached(client, text, voice, model, output_format, rate_limiter=get_rate_limiter("groq"))
+    return {"audio": audio, "format": output_format}
+
+def transcription(audio: bytes, filename: str = "audio.wav", model: str = "whisper-large-v3-turbo",
+                  language: str = "en", temperature: float = 0.0, compress: bool = True) -> Dict[str, Any]:
+    """
+    Transcribe audio, chunking long recordings
+
+    Returns:
+        dict: The normalized transcription with text, segments and words
+    """
+    client = _require(initialize_whisper_client(), "Groq")
+    scratch = get_scratch_space()
+    suffix = os.path.splitext(filename)[1] or ".wav"
+    path = scratch.write(SERVICE_SESSION_ID, audio, suffix)
+    try:
+        return transcribe_file(client, path, model, language, temperature, compress)
+    finally:
+        scratch.release(SERVICE_SESSION_ID, path)
+
+def get_document_chat(collection: str, access_key: Optional[str] = None):
+    """
+    Get the document chat for a collection, backed by the shared workspace of the same name
+
+    Raises:
+        WorkspaceAccessDenied: If the access key doesn't match the workspace's
+    """
+    from document_chat import DocumentChat
+    from index_manager import get_index_manager
+
+    with _document_chats_lock:
+        document_chat = _document_chats.get(collection)
+        if document_chat is None:
+            document_chat = DocumentChat(workspace=collection, access_key=access_key, session_id=SERVICE_SESSION_ID)
+            if not document_chat.embeddings:
+                raise ProviderUnavailable("Google API key not set")
+            _document_chats[collection] = document_chat
+        else:
+            get_index_manager().authorize(document_chat.workspace, access_key)
+        return document_chat
+
+def document_ingest(collection: str, name: str, content: bytes, access_key: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Add a PDF, CSV or text file to a document collection
+
+    Content already indexed in the collection's workspace is not embedded again.
+
+    Returns:
+        dict: {"documents": the collection's document list}
+    """
+    document_chat = get_document_chat(collection, access_key)
+    if not document_chat.load_document(NamedBytes(name, content)):
+        raise ServiceError(f"Failed to load {name}")
+    return {"documents": document_chat.get_document_info()}
+
+def document_query(collection: str, query: str, model: str = "gemini-2.0-flash",
+                   access_key: Optional[str] = None, chat_history: Optional[List[List[str]]] = None) -> Dict[str, Any]:
+    """
+    Ask a question about a document collection
+
+    Each request is independent: the shared document chat only provides the workspace, and the
+    question is condensed against chat_history alone.
+
+    Args:
+        chat_history: Earlier [question, answer] pairs of the caller's conversation
+
+    Returns:
+        dict: {"content": the answer with its sources}
+    """
+    document_chat = get_document_chat(collection, access_key)
+    if not document_chat.vector_store:
+        raise ServiceError(f"No documents loaded in collection {collection}")
+    result = document_chat.query(query, model, [tuple(turn) for turn in chat_history or []])
+    if result['answer'] is None:
+        raise ProviderError(result['content'] or "Document chat failed")
+    return {"content": result['content']}
+
+# Operation name -> (function, provider whose rate limit applies, parameters holding binary data)
+OPERATIONS = {
+    "chat": (chat, "groq", ()),
+    "image_analysis": (image_analysis, "groq", ("image",)),
+    "image_generation": (image_generation, None, ()),
+    "speech": (speech, None, ()),
+    "transcription": (transcription, None, ("audio",)),
+    "document_ingest": (document_ingest, None, ("content",)),
+    "document_query": (document_query, None, ()),
+}
+
+def decode_params(operation: str, params: Dict[str, Any], allow_paths: bool = False) -> Dict[str, Any]:
+    """
+    Decode the binary parameters of a request
+
+    Binary parameters are sent base64-encoded as "<name>_base64". With allow_paths they may
+    instead name a local file as "<name>_path"; the HTTP API never allows this.
+
+    Returns:
+        dict: The parameters with binary values decoded to bytes
+    """
+    if operation not in OPERATIONS:
+        raise ServiceError(f"Unknown operation: {operation}")
+    params = dict(params)
+    for name in OPERATIONS[operation][2]:
+        if f"{name}_base64" in params:
+            try:
+                params[name] = base64.b64decode(params.pop(f"{name}_base64"), validate=True)
+            except ValueError:
+                raise ServiceError(f"{name}_base64 is not valid base64")
+        elif allow_paths and f"{name}_path" in params:
+            path = params.pop(f"{name}_path")
+            with open(path, "rb") as f:
+                params[name] = f.read()
+            if name == "audio":
+                params.setdefault("filename", os.path.basename(path))
+            elif name == "content":
+                params.setdefault("name", os.path.basename(path))
+        elif name not in params:
+            raise ServiceError(f"Missing parameter {name}_base64")
+    return params
+
+def run_operation(operation: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run one operation under its provider's shared rate limit
+
+    Args:
+        operation: A key of OPERATIONS
+        params: Keyword arguments for the operation, with binary values already decoded
+
+    Returns:
+        dict: The operation's result
+    """
+    if operation not in OPERATIONS:
+        raise ServiceError(f"Unknown operation: {operation}")
+    func, provider, _ = OPERATIONS[operation]
+    if operation == "image_generation":
+        provider = params.get("provider", "openai")
+        # Checked before the limiter lookup, which would otherwise register a limiter per client-supplied name
+        if provider not in IMAGE_PROVIDERS:
+            raise ServiceError(f"Unknown image provider: {provider}")
+    try:
+        inspect.signature(func).bind(**params)
+    except TypeError as e:
+        raise ServiceError(f"Invalid parameters for {operation}: {e}")
+    if provider:
+        get_rate_limiter(provider).acquire()
+    return func(**params)
+
+def encode_result(result: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Base64-encode the binary values of a result for JSON output"""
+    if result is None:
+        return None
+    return {
+        (f"{key}_base64" if isinstance(value, bytes) else key):
+        (base64.b64encode(value).decode("ascii") if isinstance(value, bytes) else value)
+        for key, value in result.items()
+    }
@@ -0,0 +1,85 @@
+"""
+Session Utilities for NexusAI
+This module provides helpers for identifying Streamlit sessions and cleaning up after them.
+"""
+
+import os
+import re
+import uuid
+import threading
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+_known_sessions = set()
+_session_end_callbacks = []
+_sessions_lock = threading.Lock()
+_sweeper = None
+
+def get_session_id():
+    """Get the id of the current Streamlit session, or "default" outside a script run"""
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return "default"
+    with _sessions_lock:
+        _known_sessions.add(ctx.session_id)
+    return ctx.session_id
+
+def get_history_key():
+    """
+    Get a stable id for this browser's saved history
+
+    The id is kept in the "sid" query parameter, so it survives page reloads and server restarts
+    where the Streamlit session id does not. Anyone with the URL can see the history.
+    """
+    if get_script_run_ctx() is None:
+        return "default"
+    key = st.query_params.get("sid")
+    if not key or not re.fullmatch(r"[A-Za-z0-9_-]{16,64}", key):
+        key = uuid.uuid4().hex
+        st.query_params["sid"] = key
+    return key
+
+def is_active_session(session_id):
+    """Check whether a session is still connected; assumes it is when there is no runtime"""
+    try:
+        from streamlit import runtime
+
+        if not runtime.exists():
+            return True
+        return runtime.get_instance().is_active_session(session_id)
+    except Exception:
+        return True
+
+def on_session_end(callback):
+    """
+    Register a callback run with the session id once a session has disconnected
+
+    Registering the first callback starts the background sweeper.
+    """
+    global _sweeper
+    with _sessions_lock:
+        _session_end_callbacks.append(callback)
+        if _sweeper is None:
+            interval = int(os.getenv("NEXUSAI_SESSION_SWEEP_SECONDS", "60"))
+            _sweeper = threading.Thread(target=_sweep_forever, args=(interval,), name="session-sweeper", daemon=True)
+            _sweeper.start()
+
+def sweep_ended_sessions():
+    """Run the session-end callbacks for every known session that is no longer active"""
+    with _sessions_lock:
+        ended = [session_id for session_id in _known_sessions if not is_active_session(session_id)]
+        _known_sessions.difference_update(ended)
+        callbacks = list(_session_end_callbacks)
+
+    for session_id in ended:
+        for callback in callbacks:
+            try:
+                callback(session_id)
+            except Exception:
+                pass
+
+def _sweep_forever(interval):
+    """Background loop that periodically sweeps ended sessions"""
+    stop = threading.Event()
+    while not stop.wait(interval):
+        sweep_ended_sessions()
@@ -5,9 +5,33 @@ This module provides speech-to-text functionality using Groq's Whisper API.
 
 import streamlit as st
 import os
+import io
+import json
 import time
+import hashlib
+import zipfile
 import tempfile
+import threading
 from groq import Groq
+from concurrency import current_scope, get_rate_limiter, run_concurrently
+from audio_utils import compress_for_transcription, decode_audio, encode_for_upload, find_silence_cuts
+from cache_utils import DiskCache
+from media_utils import clear_history, load_history_page, render_lazy_audio, save_history_entry
+from scratch_space import ScratchQuotaExceeded, get_scratch_space
+from blob_store import get_blob_store
+from session_utils import get_history_key, get_session_id
+from instrumentation import track_call
+from async_providers import get_async_client, resolve
+
+# Long-audio mode: chunks stay under the upload limit and overlap slightly so no word is lost at a cut
+STT_MAX_CHUNK_MB = float(os.getenv("STT_MAX_CHUNK_MB", "20"))
+STT_CHUNK_SECONDS = float(os.getenv("STT_CHUNK_SECONDS", "600"))
+STT_CHUNK_OVERLAP_SECONDS = float(os.getenv("STT_CHUNK_OVERLAP_SECONDS", "2"))
+# Assumed upload bandwidth used to estimate the time saved by compressing before upload
+STT_UPLINK_MBPS = float(os.getenv("STT_UPLINK_MBPS", "10"))
+
+_transcript_cache = None
+_transcript_cache_lock = threading.Lock()
 
 def initialize_whisper_client():
     """Initialize the Whisper client with Groq API"""
@@ -22,133 +46,634 @@ def initialize_whisper_client():
         st.error(f"Failed to initialize Whisper client: {e}")
         return None
 
+def create_transcription(client, file, model, language, temperature):
+    """Request a verbose_json transcription with word and segment timestamps"""
+    with track_call("groq", "transcription", model) as call:
+        call.add_request_bytes(len(file[1]) if isinstance(file, tuple) else os.fstat(file.fileno()).st_size)
+        transcription = resolve(client.audio.transcriptions.create(
+            file=file,
+            model=model,
+            language=language,
+            temperature=temperature,
+            response_format="verbose_json",
+            timestamp_granularities=["word", "segment"]
+        ))
+        call.add_response_bytes(len(transcription.model_dump_json()))
+    return transcription
+
 def transcribe_audio(client, audio_file, model="whisper-large-v3-turbo", language="en", temperature=0.0):
     """Transcribe audio using Groq's Whisper model"""
     if not client:
         return "Error: Groq API key not set. Please enter your Groq API key in the API Setup page."
 
     try:
+        # audio_file is either a path or an in-memory (filename, bytes) pair
+        if isinstance(audio_file, tuple):
+            return create_transcription(client, audio_file, model, language, temperature)
         with open(audio_file, "rb") as file:
-            transcription = client.audio.transcriptions.create(
-                file=file,
-                model=model,
-                language=language,
-                temperature=temperature,
-                response_format="verbose_json",
-                timestamp_granularities=["word", "segment"]
+            return create_transcription(client, file, model, language, temperature)
+    except Exception as e:
+        st.error(f"Transcription failed: {str(e)}")
+        return None
+
+def get_transcript_cache():
+    """Get the process-wide persistent transcript cache configured from the environment"""
+    global _transcript_cache
+    with _transcript_cache_lock:
+        if _transcript_cache is None:
+            root = os.getenv("NEXUSAI_TRANSCRIPT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "nexusai_transcript_cache"))
+            max_mb = int(os.getenv("TRANSCRIPT_CACHE_MAX_MB", "200"))
+            _transcript_cache = DiskCache(root, max_mb * 1024 * 1024)
+        return _transcript_cache
+
+def transcript_cache_key(audio_bytes, model, language, temperature):
+    """Build the transcript cache key from the audio content hash and transcription settings"""
+    audio_hash = hashlib.sha256(audio_bytes).hexdigest()
+    return DiskCache.make_key(audio_hash, model, language, round(float(temperature), 2), suffix=".json")
+
+def get_cached_transcript(key):
+    """Load a cached transcription dict, or None on a miss"""
+    data = get_transcript_cache().get(key)
+    return json.loads(data) if data is not None else None
+
+def cache_transcript(key, transcription):
+    """Store a normalized transcription, including segments and words"""
+    get_transcript_cache().set(key, json.dumps(transcription, ensure_ascii=False).encode("utf-8"))
+
+def transcription_to_dict(transcription):
+    """Normalize a verbose_json transcription into a dict with text, segments and words"""
+    data = transcription if isinstance(transcription, dict) else transcription.model_dump()
+    return {
+        'text': data.get('text') or "",
+        'language': data.get('language'),
+        'duration': data.get('duration'),
+        'segments': data.get('segments') or [],
+        'words': data.get('words') or []
+    }
+
+def prepare_audio_for_upload(audio_file):
+    """
+    Compress audio to 16 kHz mono FLAC (or WAV without ffmpeg) before upload
+
+    Low-bitrate MP3, M4A or OGG can come out larger, in which case the original is uploaded.
+
+    Returns:
+        tuple: ((filename, bytes) ready for upload, stats dict with sizes, whether the compressed
+        version is used and estimated seconds saved)
+    """
+    audio_bytes, extension = compress_for_transcription(audio_file)
+    original_bytes = os.path.getsize(audio_file)
+    compressed = len(audio_bytes) < original_bytes
+    if not compressed:
+        with open(audio_file, "rb") as f:
+            audio_bytes = f.read()
+        extension = os.path.splitext(audio_file)[1].lstrip(".").lower() or "wav"
+    stats = {
+        'original_bytes': original_bytes,
+        'compressed_bytes': len(audio_bytes),
+        'compressed': compressed,
+        'format': extension,
+        'seconds_saved': (original_bytes - len(audio_bytes)) * 8 / (STT_UPLINK_MBPS * 1_000_000)
+    }
+    return (f"audio.{extension}", audio_bytes), stats
+
+def plan_audio_chunks(samples, sample_rate):
+    """
+    Split decoded audio at silences into overlapping, size-bounded chunks
+
+    Returns:
+        list: Dicts with the chunk's sample bounds (including overlap), its time offset,
+        and the [own_start, own_end) time range it is responsible for in the merged timeline
+    """
+    overlap = int(STT_CHUNK_OVERLAP_SECONDS * sample_rate)
+    # 16-bit mono WAV uses 2 bytes per sample; leave room for the overlap on both sides
+    max_seconds = min(STT_CHUNK_SECONDS, STT_MAX_CHUNK_MB * 1024 * 1024 / (2 * sample_rate))
+    max_seconds -= 2 * STT_CHUNK_OVERLAP_SECONDS
+    if max_seconds <= 0:
+        raise ValueError("STT_CHUNK_SECONDS must be more than twice STT_CHUNK_OVERLAP_SECONDS")
+
+    cuts = find_silence_cuts(samples, sample_rate, max_seconds)
+    chunks = []
+    for index, (start, end) in enumerate(zip(cuts, cuts[1:])):
+        padded_start = max(0, start - overlap)
+        chunks.append({
+            'index': index,
+            'sample_start': padded_start,
+            'sample_end': min(len(samples), end + overlap),
+            'offset': padded_start / sample_rate,
+            'own_start': start / sample_rate,
+            'own_end': end / sample_rate
+        })
+    return chunks
+
+def transcribe_audio_chunked(client, audio_file, model="whisper-large-v3-turbo", language="en", temperature=0.0, max_workers=4):
+    """
+    Transcribe long audio as silence-split chunks through a bounded worker pool
+
+    Yields:
+        tuple: (chunks, index, chunk_result) for each chunk as soon as it finishes, where
+        chunks is the full chunk plan and chunk_result is a normalized transcription dict
+    """
+    samples, sample_rate = decode_audio(audio_file)
+    chunks = plan_audio_chunks(samples, sample_rate)
+
+    def transcribe(chunk):
+        audio_bytes, extension = encode_for_upload(samples[chunk['sample_start']:chunk['sample_end']], sample_rate)
+        transcription = create_transcription(
+            client, (f"chunk_{chunk['index']}.{extension}", audio_bytes), model, language, temperature
+        )
+        return transcription_to_dict(transcription)
+
+    for chunk, result, error in run_concurrently(transcribe, chunks, max_workers, get_rate_limiter("groq")):
+        if error:
+            raise error
+        yield chunks, chunk['index'], result
+
+def merge_chunk_transcriptions(chunks, chunk_results):
+    """
+    Merge per-chunk transcriptions into one continuous timeline
+
+    Timestamps are shifted by each chunk's offset. Segments and words from the overlaps are kept
+    only by the chunk whose own range contains their midpoint, so nothing is duplicated.
+    """
+    segments = []
+    words = []
+    for chunk in chunks:
+        result = chunk_results.get(chunk['index'])
+        if not result:
+            continue
+        is_last = chunk is chunks[-1]
+
+        def owned(start, end):
+            midpoint = (start + end) / 2
+            return chunk['own_start'] <= midpoint and (midpoint < chunk['own_end'] or is_last)
+
+        for segment in result['segments']:
+            start = segment.get('start', 0) + chunk['offset']
+            end = segment.get('end', 0) + chunk['offset']
+            if owned(start, end):
+                segments.append({**segment, 'id': len(segments), 'start': start, 'end': end})
+        for word in result['words']:
+            start = word.get('start', 0) + chunk['offset']
+            end = word.get('end', 0) + chunk['offset']
+            if owned(start, end):
+                words.append({**word, 'start': start, 'end': end})
+
+    return {
+        'text': " ".join(segment.get('text', "").strip() for segment in segments),
+        'language': next((r.get('language') for r in chunk_results.values() if r.get('language')), None),
+        'duration': chunks[-1]['own_end'] if chunks else 0,
+        'segments': segments,
+        'words': words
+    }
+
+def transcribe_file(client, audio_file, model="whisper-large-v3-turbo", language="en", temperature=0.0, compress=True):
+    """
+    Transcribe one file for batch use, raising on failure instead of reporting to the page
+
+    Files over the upload limit go through the chunked pipeline.
+
+    Returns:
+        dict: The normalized transcription
+    """
+    if not client:
+        raise ValueError("Groq API key not set. Please enter your Groq API key in the API Setup page.")
+
+    if os.path.getsize(audio_file) > STT_MAX_CHUNK_MB * 1024 * 1024:
+        chunks, chunk_results = [], {}
+        for chunks, index, result in transcribe_audio_chunked(client, audio_file, model, language, temperature):
+            chunk_results[index] = result
+        return merge_chunk_transcriptions(chunks, chunk_results)
+
+    upload = None
+    if compress:
+        try:
+            upload = prepare_audio_for_upload(audio_file)[0]
+        except Exception:
+            # e.g. no ffmpeg for a non-WAV file; upload the original, as the single-file page does
+            upload = None
+    if upload is None:
+        upload = open(audio_file, "rb")
+    try:
+        get_rate_limiter("groq").acquire(current_scope())
+        transcription = create_transcription(client, upload, model, language, temperature)
+    finally:
+        if not isinstance(upload, tuple):
+            upload.close()
+    return transcription_to_dict(transcription)
+
+def format_timestamp(seconds, separator):
+    """Format seconds as HH:MM:SS<separator>mmm for subtitle files"""
+    milliseconds = int(round(seconds * 1000))
+    hours, milliseconds = divmod(milliseconds, 3_600_000)
+    minutes, milliseconds = divmod(milliseconds, 60_000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}{separator}{milliseconds:03d}"
+
+def segments_to_srt(segments):
+    """Render transcription segments as SRT subtitles"""
+    blocks = []
+    for number, segment in enumerate(segments, 1):
+        start = format_timestamp(segment['start'], ",")
+        end = format_timestamp(segment['end'], ",")
+        blocks.append(f"{number}\n{start} --> {end}\n{segment.get('text', '').strip()}\n")
+    return "\n".join(blocks)
+
+def segments_to_vtt(segments):
+    """Render transcription segments as WebVTT subtitles"""
+    blocks = ["WEBVTT\n"]
+    for segment in segments:
+        start = format_timestamp(segment['start'], ".")
+        end = format_timestamp(segment['end'], ".")
+        blocks.append(f"{start} --> {end}\n{segment.get('text', '').strip()}\n")
+    return "\n".join(blocks)
+
+def export_batch_transcriptions(results, export_format):
+    """Bundle batch results as a zip of SRT/VTT files or a single JSONL file"""
+    if export_format == "jsonl":
+        return "\n".join(json.dumps(result, ensure_ascii=False) for result in results).encode("utf-8")
+
+    render = segments_to_srt if export_format == "srt" else segments_to_vtt
+    buffer = io.BytesIO()
+    used = set()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for result in results:
+            if result['status'] == "ok":
+                # Keep the audio extension so talk.mp3 and talk.wav don't collide, and number repeated names
+                name, copy = result['file'], 1
+                while name in used:
+                    copy += 1
+                    name = f"{result['file']} ({copy})"
+                used.add(name)
+                archive.writestr(f"{name}.{export_format}", render(result['segments']))
+    return buffer.getvalue()
+
+def display_batch_transcription(client):
+    """Display the batch mode: transcribe many files concurrently, resuming across reruns"""
+    uploaded_files = st.file_uploader(
+        "Upload audio files:",
+        type=["wav", "mp3", "m4a", "ogg"],
+        accept_multiple_files=True
+    )
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        model = st.selectbox("Model:", ["whisper-large-v3-turbo", "whisper-large-v3"], index=0)
+    with col2:
+        language = st.selectbox(
+            "Language:",
+            ["en", "es", "fr", "de", "it", "pt", "nl", "ru", "zh", "ja", "ko"],
+            index=0
+        )
+    with col3:
+        temperature = st.slider("Temperature:", 0.0, 1.0, 0.0, 0.1)
+    col1, col2 = st.columns(2)
+    with col1:
+        max_workers = st.slider("Concurrent files:", 1, 8, 4)
+    with col2:
+        compress_audio = st.checkbox("Compress to 16 kHz mono before upload", value=True)
+
+    # Hash the uploads once per set of files rather than on every rerun
+    items = []
+    for uploaded_file in uploaded_files or []:
+        digest_key = f"stt_batch_digest_{uploaded_file.file_id}"
+        if digest_key not in st.session_state:
+            st.session_state[digest_key] = hashlib.sha256(uploaded_file.getvalue()).hexdigest()[:16]
+        items.append((st.session_state[digest_key], uploaded_file))
+    if not items:
+        st.info("Upload one or more audio files to start a batch.")
+        return
+
+    # A batch is identified by its settings and file set so it can resume after reruns
+    job_key = hashlib.sha256(
+        json.dumps([model, language, temperature, sorted(item[0] for item in items)]).encode("utf-8")
+    ).hexdigest()
+    batch = st.session_state.get('transcription_batch')
+    if not batch or batch['key'] != job_key:
+        batch = {'key': job_key, 'results': {}, 'running': False}
+        st.session_state.transcription_batch = batch
+
+    results = batch['results']
+    pending = [item for item in items if item[0] not in results]
+
+    st.markdown(f"**{len(items)} files** - {len(items) - len(pending)} done, {len(pending)} pending")
+    progress = st.progress((len(items) - len(pending)) / len(items))
+    table = st.empty()
+
+    def ordered_results():
+        return [results[item[0]] for item in items if item[0] in results]
+
+    def summary_rows():
+        return [
+            {
+                'file': result['file'],
+                'status': result['status'],
+                'duration_s': round(result['duration'] or 0, 1),
+                'segments': len(result['segments']),
+                'latency_s': result['latency_s'],
+                'text': result['text'][:120] if result['status'] == "ok" else result['error']
+            }
+            for result in ordered_results()
+        ]
+
+    if results:
+        table.dataframe(summary_rows(), use_container_width=True)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        label = "Resume Batch" if results and pending else "Transcribe Batch"
+        start = st.button(label, disabled=not pending)
+    # Mark the batch running before Stop is rendered, so Stop is enabled while it runs
+    if pending and start:
+        batch['running'] = True
+    with col2:
+        if st.button("Stop Batch", disabled=not batch['running']):
+            batch['running'] = False
+            st.rerun()
+
+    # Keep going automatically if a rerun interrupted a running batch
+    if pending and batch['running']:
+        scratch = get_scratch_space()
+        session_id = get_session_id()
+
+        def transcribe(item):
+            started = time.perf_counter()
+            audio_bytes = item[1].getvalue()
+            cache_key = transcript_cache_key(audio_bytes, model, language, temperature)
+            result = get_cached_transcript(cache_key)
+            if result is not None:
+                return result, time.perf_counter() - started
+
+            extension = os.path.splitext(item[1].name)[1] or ".wav"
+            audio_file = scratch.write(session_id, audio_bytes, extension)
+            try:
+                result = transcribe_file(client, audio_file, model, language, temperature, compress_audio)
+            finally:
+                scratch.release(session_id, audio_file)
+            cache_transcript(cache_key, result)
+            return result, time.perf_counter() - started
+
+        for item, output, error in run_concurrently(transcribe, pending, max_workers):
+            if error:
+                transcription, latency = {'text': "", 'duration': None, 'segments': [], 'words': []}, None
+            else:
+                transcription, latency = output
+            results[item[0]] = {
+                'file': item[1].name,
+                'status': "error" if error else "ok",
+                'error': str(error) if error else None,
+                'text': transcription['text'],
+                'duration': transcription['duration'],
+                'segments': transcription['segments'],
+                'words': transcription['words'],
+                'model': model,
+                'language': language,
+                'latency_s': round(latency, 2) if latency is not None else None
+            }
+            progress.progress(len(results) / len(items))
+            table.dataframe(summary_rows(), use_container_width=True)
+
+        batch['running'] = False
+        st.success("Batch complete")
+
+    if results:
+        exported = ordered_results()
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.download_button(
+                label="Export SRT (zip)",
+                data=export_batch_transcriptions(exported, "srt"),
+                file_name="transcriptions_srt.zip",
+                mime="application/zip"
+            )
+        with col2:
+            st.download_button(
+                label="Export VTT (zip)",
+                data=export_batch_transcriptions(exported, "vtt"),
+                file_name="transcriptions_vtt.zip",
+                mime="application/zip"
             )
-            return transcription
+        with col3:
+            st.download_button(
+                label="Export JSONL",
+                data=export_batch_transcriptions(exported, "jsonl"),
+                file_name="transcriptions.jsonl",
+                mime="application/jsonl"
+            )
+
+        if st.button("Send All to Document Chat"):
+            indexed = 0
+            with st.spinner("Indexing transcripts..."):
+                for result in exported:
+                    if result['status'] == "ok" and result['segments']:
+                        if not send_to_document_chat(result['file'], result['segments']):
+                            break
+                        indexed += 1
+            if indexed:
+                st.success(f"Indexed {indexed} transcripts in Document Chat")
+
+def send_to_document_chat(name, segments):
+    """Index transcript segments in this session's Document Chat, keeping their timestamps"""
+    # Imported lazily so the STT page doesn't load langchain until it is needed
+    from document_chat_module import initialize_document_chat
+
+    if not st.session_state.get('document_chat'):
+        document_chat = initialize_document_chat()
+        if not document_chat:
+            st.error("Google API key not set. Please enter your Google API key in the API Setup page.")
+            return False
+        st.session_state.document_chat = document_chat
+    return st.session_state.document_chat.add_transcript(name, segments)
+
+def display_long_audio_transcription(client, audio_file, model, language, temperature):
+    """
+    Transcribe long audio chunk by chunk, showing the merged transcript as chunks finish
+
+    Returns:
+        dict: The merged transcription, or None on failure
+    """
+    progress = st.progress(0.0, text="Splitting audio on silence...")
+    preview = st.empty()
+    chunks = []
+    chunk_results = {}
+    try:
+        for chunks, index, result in transcribe_audio_chunked(client, audio_file, model, language, temperature):
+            chunk_results[index] = result
+            progress.progress(len(chunk_results) / len(chunks), text=f"Transcribed {len(chunk_results)}/{len(chunks)} chunks")
+            preview.markdown(merge_chunk_transcriptions(chunks, chunk_results)['text'])
     except Exception as e:
         st.error(f"Transcription failed: {str(e)}")
         return None
 
+    preview.empty()
+    progress.empty()
+    return merge_chunk_transcriptions(chunks, chunk_results) if chunks else None
+
 def display_stt_interface():
     """Display the speech-to-text interface"""
     st.title("🎤 Speech-to-Text")
     
-    # Initialize history
-    if 'transcription_history' not in st.session_state:
-        st.session_state.transcription_history = []
-    
-    # Initialize client
-    client = initialize_whisper_client()
+    # Shared async client; requests run on the provider loop
+    client = get_async_client("whisper")
+
+    mode = st.radio("Mode:", ["Single File", "Batch"], horizontal=True)
+    if mode == "Batch":
+        display_batch_transcription(client)
+        return
     
     # Audio upload
     uploaded_audio = st.file_uploader("Upload audio file:", type=["wav", "mp3", "m4a", "ogg"])
     
     if uploaded_audio is not None:
-        # Save uploaded audio to temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp_audio:
-            tmp_audio.write(uploaded_audio.getvalue())
-            tmp_audio.flush()
-            audio_file = tmp_audio.name
-
-            # Display audio player
-            st.audio(uploaded_audio)
-
-            # Transcription options
-            col1, col2, col3 = st.columns(3)
-
-            with col1:
-                model = st.selectbox("Model:", ["whisper-large-v3-turbo", "whisper-large-v3"], index=0)
-            with col2:
-                language = st.selectbox(
-                    "Language:", 
-                    ["en", "es", "fr", "de", "it", "pt", "nl", "ru", "zh", "ja", "ko"], 
-                    index=0
-                )
-            with col3:
-                temperature = st.slider("Temperature:", 0.0, 1.0, 0.0, 0.1)
+        # Display audio player
+        st.audio(uploaded_audio)
+
+        # Transcription options
+        col1, col2, col3 = st.columns(3)
 
-            # Transcribe button
-            if st.button("Transcribe"):
+        with col1:
+            model = st.selectbox("Model:", ["whisper-large-v3-turbo", "whisper-large-v3"], index=0)
+        with col2:
+            language = st.selectbox(
+                "Language:", 
+                ["en", "es", "fr", "de", "it", "pt", "nl", "ru", "zh", "ja", "ko"], 
+                index=0
+            )
+        with col3:
+            temperature = st.slider("Temperature:", 0.0, 1.0, 0.0, 0.1)
+
+        # Files over the upload limit can only be transcribed in chunks
+        too_large = uploaded_audio.size > STT_MAX_CHUNK_MB * 1024 * 1024
+        long_audio = st.checkbox(
+            "Long audio mode (split on silence, transcribe chunks in parallel)",
+            value=too_large,
+            disabled=too_large
+        )
+        compress_audio = st.checkbox("Compress to 16 kHz mono before upload", value=True)
+
+        # Transcribe button
+        if st.button("Transcribe"):
+            # Write the upload to scratch space only now, once per content hash
+            scratch = get_scratch_space()
+            session_id = get_session_id()
+            audio_format = os.path.splitext(uploaded_audio.name)[1].lstrip(".").lower() or "wav"
+            try:
+                audio_file = scratch.write(session_id, uploaded_audio.getvalue(), f".{audio_format}")
+            except ScratchQuotaExceeded as e:
+                st.error(str(e))
+                audio_file = None
+
+            # Identical uploads with the same settings are served from the transcript cache
+            cache_key = transcript_cache_key(uploaded_audio.getvalue(), model, language, temperature)
+            transcription = get_cached_transcript(cache_key) if audio_file else None
+            from_cache = transcription is not None
+            if from_cache:
+                st.caption("⚡ Served from the transcript cache")
+            elif not client:
+                st.error("Groq API key not set. Please enter your Groq API key in the API Setup page.")
+            elif audio_file and long_audio:
+                transcription = display_long_audio_transcription(client, audio_file, model, language, temperature)
+            elif audio_file:
                 with st.spinner("Transcribing audio..."):
-                    transcription = transcribe_audio(client, audio_file, model, language, temperature)
-
-                    if transcription:
-                        # Display transcription
-                        st.markdown("### Transcription Result")
-                        st.markdown(transcription.text)
-
-                        # Save to history
-                        st.session_state.transcription_history.append({
-                            'audio_file': audio_file,
-                            'transcription': transcription.text,
-                            'language': language,
-                            'model': model,
-                            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
-                        })
-
-                        # Display timestamps if available
-                        if hasattr(transcription, 'segments'):
-                            st.markdown("### Word Timestamps")
-                            for segment in transcription.segments:
-                                try:
-                                    text = segment.get('text')
-                                    start = segment.get('start')
-                                    end = segment.get('end')
-
-                                    if text is None or start is None or end is None:
-                                        continue  # Skip to the next segment
-
-                                    st.markdown(f"{text} ({start:.2f}s - {end:.2f}s)")
-
-                                except Exception as e:
-                                    st.error(f"Error processing segment: {e}")
-                                    break
-                    else:
-                        st.error("Transcription failed. Check the logs for details.")
+                    upload = audio_file
+                    if compress_audio:
+                        try:
+                            upload, stats = prepare_audio_for_upload(audio_file)
+                            reduction = 1 - stats['compressed_bytes'] / max(1, stats['original_bytes'])
+                            if stats['compressed']:
+                                st.caption(
+                                    f"Uploaded {stats['compressed_bytes'] / 1024:,.0f} KB {stats['format'].upper()} "
+                                    f"instead of {stats['original_bytes'] / 1024:,.0f} KB ({reduction:.0%} smaller, "
+                                    f"~{stats['seconds_saved']:.1f}s upload saved at {STT_UPLINK_MBPS:g} Mbps)"
+                                )
+                            else:
+                                st.caption("Uploaded the original file; it is already smaller than the compressed version")
+                        except Exception as e:
+                            st.caption(f"Uploading the original file; compression unavailable: {e}")
+                    result = transcribe_audio(client, upload, model, language, temperature)
+                    if result:
+                        transcription = transcription_to_dict(result)
+
+            if transcription and not from_cache:
+                cache_transcript(cache_key, transcription)
+
+            if transcription:
+                # Display transcription
+                st.markdown("### Transcription Result")
+                st.markdown(transcription['text'])
+
+                # Save to history; the audio moves to the blob store, owned by the history rather than the session
+                audio_hash = get_blob_store().put(uploaded_audio.getvalue(), get_history_key())
+                save_history_entry(
+                    "transcription",
+                    {
+                        'name': uploaded_audio.name,
+                        'audio_hash': audio_hash,
+                        'format': audio_format,
+                        'transcription': transcription['text'],
+                        'segments': transcription['segments'],
+                        'language': language,
+                        'model': model
+                    },
+                    f"{uploaded_audio.name}\n{transcription['text']}"
+                )
+
+                # Display timestamps if available
+                if transcription['segments']:
+                    st.markdown("### Word Timestamps")
+                    for segment in transcription['segments']:
+                        try:
+                            text = segment.get('text')
+                            start = segment.get('start')
+                            end = segment.get('end')
+
+                            if text is None or start is None or end is None:
+                                continue  # Skip to the next segment
+
+                            st.markdown(f"{text} ({start:.2f}s - {end:.2f}s)")
+
+                        except Exception as e:
+                            st.error(f"Error processing segment: {e}")
+                            break
+            elif audio_file:
+                st.error("Transcription failed. Check the logs for details.")
+            scratch.release(session_id, audio_file)
 
     # Display history
-    if st.session_state.transcription_history:
+    history = load_history_page("transcription", "transcriptions")
+    if history:
         st.markdown("---")
         st.subheader("Transcription History")
 
-        for idx, item in enumerate(reversed(st.session_state.transcription_history)):
-            with st.expander(f"Transcription {len(st.session_state.transcription_history)-idx} - {item['timestamp']}"):
-                st.audio(item['audio_file'], format="audio/wav")
+        blob_store = get_blob_store()
+        for item in history:
+            with st.expander(f"Transcription {item['number']} - {item['timestamp']}"):
                 st.markdown(f"**Transcription:** {item['transcription']}")
                 st.markdown(f"**Language:** {item['language']}")
                 st.markdown(f"**Model:** {item['model']}")
 
                 # Download options
-                col1, col2 = st.columns(2)
-                with col1:
-                    st.download_button(
-                        label="Download Audio",
-                        data=open(item['audio_file'], "rb").read(),
-                        file_name=f"audio_{idx+1}.wav",
-                        mime="audio/wav"
-                    )
-                with col2:
-                    st.download_button(
-                        label="Download Transcription",
-                        data=item['transcription'].encode('utf-8'),
-                        file_name=f"transcription_{idx+1}.txt",
-                        mime="text/plain"
-                    )
+                st.download_button(
+                    label="Download Transcription",
+                    data=item['transcription'].encode('utf-8'),
+                    file_name=f"transcription_{item['number']}.txt",
+                    mime="text/plain",
+                    key=f"download_transcription_{item['id']}"
+                )
+                if item.get('segments') and st.button("Send to Document Chat", key=f"send_to_doc_chat_{item['id']}"):
+                    name = f"{item.get('name', 'Recording')} ({item['timestamp']})"
+                    if send_to_document_chat(name, item['segments']):
+                        st.success(f"Indexed {name} in Document Chat")
+
+                # The audio file is only read when the entry's audio is loaded
+                render_lazy_audio(
+                    blob_store.path(item['audio_hash']) if item.get('audio_hash') else None,
+                    item.get('format', "wav"),
+                    f"audio_{item['number']}.{item.get('format', 'wav')}",
+                    key=f"stt_{item['id']}"
+                )
 
         # Clear history button
         if st.button("Clear Transcription History"):
-            st.session_state.transcription_history = []
+            clear_history("transcription")
             st.rerun()
@@ -0,0 +1,200 @@
+"""
+Tracing Module for NexusAI
+This module records nested timing spans for multi-stage pipelines such as Document Chat.
+
+Spans nest through a context variable, so stages opened anywhere below a span, e.g. inside the
+index manager or a retriever, become its children. Every span is mirrored to OpenTelemetry when the
+API is installed; it costs nothing until a tracer provider is configured (for example with
+opentelemetry-instrument), and then spans reach whatever exporter that sets up. Finished spans are
+also appended as JSON lines to NEXUSAI_TRACE_FILE when it is set.
+"""
+
+import os
+import json
+import time
+import secrets
+import asyncio
+import threading
+import contextvars
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, List, Optional
+from concurrency import RequestCancelled
+
+try:
+    from opentelemetry import trace as otel_trace
+    from opentelemetry.trace import Status, StatusCode
+except ImportError:
+    otel_trace = None
+
+_tracer = otel_trace.get_tracer("nexusai") if otel_trace else None
+_current_span = contextvars.ContextVar("nexusai_span", default=None)
+_export_lock = threading.Lock()
+
+def _otel_value(value: Any) -> Any:
+    """Convert an attribute value to a type OpenTelemetry accepts"""
+    return value if isinstance(value, (str, bool, int, float)) else str(value)
+
+class Span:
+    """One timed stage of a trace, with attributes describing its work"""
+
+    def __init__(self, name: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        """
+        Start timing a stage
+
+        Args:
+            name: Stage name (e.g. "embed")
+            parent: Enclosing span, or None for the root of a new trace
+            attributes: Initial attributes
+        """
+        self.name = name
+        self.parent = parent
+        self.attributes = dict(attributes)
+        self.depth = parent.depth + 1 if parent else 0
+        # Finished spans of the whole trace, shared by every span in it
+        self.finished = parent.finished if parent else []
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.start_time_ns = time.time_ns()
+        self.started_at = time.perf_counter()
+        self.duration = None
+        self.status = "ok"
+        self.error = None
+
+        self.otel_span = None
+        if _tracer is not None:
+            self.otel_span = _tracer.start_span(name, attributes={k: _otel_value(v) for k, v in self.attributes.items()})
+            context = self.otel_span.get_span_context()
+            if context.is_valid:
+                # Use OpenTelemetry's ids so the trace file lines up with the configured backend
+                self.trace_id = format(context.trace_id, "032x")
+                self.span_id = format(context.span_id, "016x")
+
+    def set(self, **attributes: Any) -> None:
+        """Add or update attributes"""
+        self.attributes.update(attributes)
+        if self.otel_span is not None:
+            self.otel_span.set_attributes({k: _otel_value(v) for k, v in attributes.items()})
+
+    def record_error(self, error: BaseException) -> None:
+        """Mark the span as failed, e.g. when the error is handled inside it"""
+        if isinstance(error, (GeneratorExit, RequestCancelled, asyncio.CancelledError)):
+            self.status = "cancelled"
+            return
+        self.status = "error"
+        self.error = f"{type(error).__name__}: {error}"
+        if self.otel_span is not None:
+            self.otel_span.record_exception(error)
+            self.otel_span.set_status(Status(StatusCode.ERROR, str(error)))
+
+    def end(self) -> None:
+        """Stop timing and export the span; later calls are ignored"""
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self.started_at
+        self.finished.append(self)
+        if self.otel_span is not None:
+            self.otel_span.end()
+        _export(self)
+
+    @property
+    def duration_ms(self) -> float:
+        """Elapsed milliseconds, so far if the span is still open"""
+        duration = self.duration if self.duration is not None else time.perf_counter() - self.started_at
+        return round(duration * 1000, 2)
+
+    def breakdown(self) -> List[Dict[str, Any]]:
+        """
+        List this span and its finished descendants in start order
+
+        Returns:
+            list: {"stage", "depth", "start_ms", "duration_ms", "status", "attributes"} per span, with
+            depth and start relative to this span
+        """
+        spans = [self] + [span for span in self.finished if span is not self and self._encloses(span)]
+        spans.sort(key=lambda span: (span.started_at, span.depth))
+        return [
+            {
+                'stage': span.name,
+                'depth': span.depth - self.depth,
+                'start_ms': round((span.started_at - self.started_at) * 1000, 2),
+                'duration_ms': span.duration_ms,
+                'status': span.status,
+                'attributes': dict(span.attributes),
+            }
+            for span in spans
+        ]
+
+    def _encloses(self, span: "Span") -> bool:
+        """Check whether span is a descendant of this one"""
+        while span is not None:
+            if span is self:
+                return True
+            span = span.parent
+        return False
+
+def current_span() -> Optional[Span]:
+    """Get the innermost open span of this context"""
+    return _current_span.get()
+
+def start_span(name: str, **attributes: Any) -> Span:
+    """
+    Start a span under the current one without making it current
+
+    For stages whose start and end arrive as separate callbacks; call end() on the result.
+    """
+    parent = _current_span.get()
+    if _tracer is not None and parent is not None and parent.otel_span is not None:
+        with otel_trace.use_span(parent.otel_span, end_on_exit=False):
+            return Span(name, parent, attributes)
+    return Span(name, parent, attributes)
+
+@contextmanager
+def span(name: str, **attributes: Any):
+    """
+    Time the with block as a stage of the current trace, or as the root of a new one
+
+    Exceptions are recorded on the span and re-raised.
+
+    Yields:
+        Span: Add attributes to it while the stage runs
+    """
+    current = start_span(name, **attributes)
+    token = _current_span.set(current)
+    try:
+        if current.otel_span is not None:
+            # Errors are recorded once, by record_error below
+            scope = otel_trace.use_span(
+                current.otel_span, end_on_exit=False, record_exception=False, set_status_on_exception=False
+            )
+        else:
+            scope = nullcontext()
+        with scope:
+            yield current
+    except BaseException as e:
+        current.record_error(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end()
+
+def _export(span: Span) -> None:
+    """Append a finished span to NEXUSAI_TRACE_FILE as one JSON line"""
+    path = os.getenv("NEXUSAI_TRACE_FILE")
+    if not path:
+        return
+    record = {
+        'trace_id': span.trace_id,
+        'span_id': span.span_id,
+        'parent_span_id': span.parent.span_id if span.parent else None,
+        'name': span.name,
+        'start_time_unix_nano': span.start_time_ns,
+        'end_time_unix_nano': span.start_time_ns + int(span.duration * 1e9),
+        'duration_ms': span.duration_ms,
+        'status': span.status,
+        'error': span.error,
+        'attributes': span.attributes,
+    }
+    line = json.dumps(record, default=str) + "\n"
+    with _export_lock:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line)
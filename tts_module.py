@@ -5,9 +5,25 @@ This module provides text-to-speech functionality using Groq's TTS API.
 
 import streamlit as st
 import os
-import time
+import re
+import hashlib
 import tempfile
+import threading
 from openai import OpenAI
+from concurrency import current_scope, get_rate_limiter, run_concurrently
+from audio_utils import JOINABLE_FORMATS, join_audio_chunks
+from cache_utils import DiskCache
+from media_utils import clear_history, load_history_page, render_lazy_audio, save_history_entry
+from instrumentation import track_call
+from async_providers import get_async_client, is_async_client, resolve
+
+# Texts longer than this are split at sentence boundaries and synthesized in parallel
+TTS_CHUNK_CHARS = int(os.getenv("TTS_CHUNK_CHARS", "1000"))
+# A chunk also ends after about one sentence in this many, chosen by the sentence's hash
+TTS_BOUNDARY_SENTENCES = 4
+
+_tts_cache = None
+_tts_cache_lock = threading.Lock()
 
 def initialize_tts_client():
     """Initialize the TTS client with Groq API"""
@@ -18,46 +34,208 @@ def initialize_tts_client():
     try:
         client = OpenAI(
             api_key=groq_api_key,
-            base_url="https://api.groq.com/openai/v1"
+            base_url=os.getenv("GROQ_BASE_URL", "https://api.groq.com").rstrip("/") + "/openai/v1"
         )
         return client
     except Exception as e:
         st.error(f"Failed to initialize Groq client: {e}")
         return None
 
+async def _read_speech_async(client, call, text, voice, model, output_format):
+    """Stream synthesized speech from an async client"""
+    async with client.audio.speech.with_streaming_response.create(
+        model=model,
+        voice=voice,
+        input=text,
+        response_format=output_format
+    ) as response:
+        parts = []
+        async for part in response.iter_bytes():
+            call.first_byte()
+            parts.append(part)
+    return parts
+
+def synthesize_speech(client, text, voice, model, output_format):
+    """Synthesize speech and return the encoded audio bytes"""
+    with track_call("groq", "speech", model) as call:
+        call.add_request_bytes(len(text.encode("utf-8")))
+        # Stream the body so time to first byte is measured separately from the full download
+        if is_async_client(client):
+            parts = resolve(_read_speech_async(client, call, text, voice, model, output_format))
+        else:
+            with client.audio.speech.with_streaming_response.create(
+                model=model,
+                voice=voice,
+                input=text,
+                response_format=output_format
+            ) as response:
+                parts = []
+                for part in response.iter_bytes():
+                    call.first_byte()
+                    parts.append(part)
+        audio_bytes = b"".join(parts)
+        call.add_response_bytes(len(audio_bytes))
+    return audio_bytes
+
+def get_tts_cache():
+    """Get the process-wide persistent audio cache configured from the environment"""
+    global _tts_cache
+    with _tts_cache_lock:
+        if _tts_cache is None:
+            root = os.getenv("NEXUSAI_TTS_CACHE_DIR", os.path.join(tempfile.gettempdir(), "nexusai_tts_cache"))
+            max_mb = int(os.getenv("TTS_CACHE_MAX_MB", "500"))
+            _tts_cache = DiskCache(root, max_mb * 1024 * 1024)
+        return _tts_cache
+
+def speech_cache_key(text, voice, model, output_format):
+    """Build the cache key for synthesized speech from normalized text and voice settings"""
+    normalized_text = " ".join(text.split())
+    return DiskCache.make_key(normalized_text, voice, model, output_format, suffix=f".{output_format}")
+
+def synthesize_speech_cached(client, text, voice, model, output_format, rate_limiter=None):
+    """Synthesize speech bytes, reusing cached audio for identical text and settings"""
+    cache = get_tts_cache()
+    key = speech_cache_key(text, voice, model, output_format)
+    audio_bytes = cache.get(key)
+    if audio_bytes is None:
+        # Only cache misses count against the provider's rate limit, and only while the run is current
+        if rate_limiter:
+            rate_limiter.acquire(current_scope())
+        audio_bytes = synthesize_speech(client, text, voice, model, output_format)
+        cache.set(key, audio_bytes)
+    return audio_bytes
+
 def generate_speech(client, text, voice, model, output_format):
     """Generate speech using Groq TTS API"""
     if not client:
         return "Error: Groq API key not set. Please enter your Groq API key in the API Setup page."
 
     try:
-        response = client.audio.speech.create(
-            model=model,
-            voice=voice,
-            input=text,
-            response_format=output_format
-        )
+        cache = get_tts_cache()
+        key = speech_cache_key(text, voice, model, output_format)
+        cached_path = cache.path(key)
+        if cached_path:
+            return cached_path
 
-        # Save to temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=f".{output_format}") as tmp_file:
-            for chunk in response.iter_bytes():
-                tmp_file.write(chunk)
-            tmp_file.flush()
-            return tmp_file.name
+        audio_bytes = synthesize_speech(client, text, voice, model, output_format)
+        return cache.set(key, audio_bytes)
     except Exception as e:
         st.error(f"TTS generation failed: {str(e)}")
         return None
 
+def _ends_chunk(sentence):
+    """Check whether a chunk boundary follows this sentence, independently of its position"""
+    return int(hashlib.sha256(sentence.encode("utf-8")).hexdigest()[:8], 16) % TTS_BOUNDARY_SENTENCES == 0
+
+def split_text_into_chunks(text, max_chars=TTS_CHUNK_CHARS):
+    """
+    Split text into sentence-aligned chunks of up to max_chars
+
+    Chunks end after sentences picked by their content, and otherwise only when full. Editing a
+    sentence therefore changes its own chunk, and at most the chunks up to the next content-picked
+    boundary, while the rest of the text keeps its chunks and their cached audio.
+    """
+    chunks = []
+    # Chunks never span paragraphs
+    for paragraph in re.split(r"\n\s*\n", text):
+        current = None
+        for sentence in re.split(r"(?<=[.!?])\s+", paragraph.strip()):
+            sentence = " ".join(sentence.split())
+            # Sentences that are too long on their own are split between words
+            while len(sentence) > max_chars:
+                if current:
+                    chunks.append(current)
+                    current = None
+                cut = sentence.rfind(" ", 0, max_chars)
+                cut = cut if cut > 0 else max_chars
+                chunks.append(sentence[:cut])
+                sentence = sentence[cut:].strip()
+            if not sentence:
+                continue
+            if current and len(current) + len(sentence) + 1 > max_chars:
+                chunks.append(current)
+                current = None
+            current = f"{current} {sentence}" if current else sentence
+            if _ends_chunk(sentence):
+                chunks.append(current)
+                current = None
+        if current:
+            chunks.append(current)
+    return chunks
+
+def generate_speech_long(client, text, voice, model, output_format, max_workers=4):
+    """
+    Synthesize long text as sentence-aligned chunks through a bounded worker pool
+
+    Each chunk is cached on its own, so editing a sentence only re-synthesizes the chunks around it.
+
+    Args:
+        client: The TTS client
+        text: The text to synthesize
+        voice: The voice name
+        model: The TTS model
+        output_format: A format from JOINABLE_FORMATS
+        max_workers: Maximum number of chunk requests in flight
+
+    Yields:
+        tuple: (index, total, audio_bytes) for each chunk as soon as it finishes
+    """
+    chunks = split_text_into_chunks(text)
+
+    rate_limiter = get_rate_limiter("groq")
+
+    def synthesize(item):
+        return synthesize_speech_cached(client, item[1], voice, model, output_format, rate_limiter)
+
+    for (index, _), audio_bytes, error in run_concurrently(synthesize, list(enumerate(chunks)), max_workers):
+        if error:
+            raise error
+        yield index, len(chunks), audio_bytes
+
+def display_long_form_speech(client, text, voice, model, output_format):
+    """
+    Synthesize long text chunk by chunk, playing each part as soon as it is ready
+
+    Returns:
+        tuple: (audio_file, format) for the joined audio, audio_file is None on failure
+    """
+    chunk_format = output_format if output_format in JOINABLE_FORMATS else "wav"
+    if chunk_format != output_format:
+        st.info(f"{output_format.upper()} chunks can't be joined gaplessly, so long texts are produced as WAV.")
+
+    cache = get_tts_cache()
+    key = speech_cache_key(text, voice, model, chunk_format)
+    cached_path = cache.path(key)
+    if cached_path:
+        return cached_path, chunk_format
+
+    progress = st.progress(0.0, text="Synthesizing speech...")
+    parts = st.container()
+    audio_chunks = {}
+    next_part = 0
+    try:
+        for index, total, audio_bytes in generate_speech_long(client, text, voice, model, chunk_format):
+            audio_chunks[index] = audio_bytes
+            progress.progress(len(audio_chunks) / total, text=f"Synthesized {len(audio_chunks)}/{total} chunks")
+
+            # Parts are released in order, so playback can start while later chunks are still running
+            while next_part in audio_chunks:
+                with parts:
+                    st.audio(audio_chunks[next_part], format=f"audio/{chunk_format}", autoplay=next_part == 0)
+                next_part += 1
+    except Exception as e:
+        st.error(f"TTS generation failed: {str(e)}")
+        return None, chunk_format
+
+    joined = join_audio_chunks([audio_chunks[index] for index in sorted(audio_chunks)], chunk_format)
+    return cache.set(key, joined), chunk_format
+
 def display_tts_interface():
     """Display the text-to-speech interface"""
     st.title("🗣️ Text-to-Speech")
     
-    # Initialize history
-    if 'tts_history' not in st.session_state:
-        st.session_state.tts_history = []
-    
-    # Initialize client
-    client = initialize_tts_client()
+    # Shared async client; requests run on the provider loop
+    client = get_async_client("groq")
     
     # TTS options
     text = st.text_area("Text to convert to speech:", height=150)
@@ -80,46 +258,50 @@ def display_tts_interface():
         if not text:
             st.warning("Please enter text")
         else:
-            with st.spinner("Generating speech..."):
-                audio_file = generate_speech(client, text, voice, model, output_format)
+            if not client:
+                st.error("Groq API key not set. Please enter your Groq API key in the API Setup page.")
+                audio_file = None
+            elif len(text) > TTS_CHUNK_CHARS:
+                audio_file, output_format = display_long_form_speech(client, text, voice, model, output_format)
+            else:
+                with st.spinner("Generating speech..."):
+                    audio_file = generate_speech(client, text, voice, model, output_format)
 
-                if audio_file:
-                    st.audio(audio_file, format=f"audio/{output_format}")
+            if audio_file:
+                st.audio(audio_file, format=f"audio/{output_format}")
+                with open(audio_file, "rb") as f:
                     st.download_button(
                         label="Download Audio",
-                        data=open(audio_file, "rb").read(),
+                        data=f.read(),
                         file_name=f"speech.{output_format}",
                         mime=f"audio/{output_format}"
                     )
 
-                    # Save to history
-                    st.session_state.tts_history.append({
-                        'text': text,
-                        'voice': voice,
-                        'model': model,
-                        'format': output_format,
-                        'audio_file': audio_file,
-                        'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
-                    })
+                # Save to history
+                save_history_entry(
+                    "tts",
+                    {'text': text, 'voice': voice, 'model': model, 'format': output_format, 'audio_file': audio_file},
+                    text
+                )
 
     # Display history
-    if st.session_state.tts_history:
+    history = load_history_page("tts", "clips")
+    if history:
         st.markdown("---")
         st.subheader("TTS History")
 
-        for idx, item in enumerate(reversed(st.session_state.tts_history)):
-            with st.expander(f"Speech {len(st.session_state.tts_history)-idx} - {item['timestamp']}"):
+        for item in history:
+            with st.expander(f"Speech {item['number']} - {item['timestamp']}"):
                 st.markdown(f"**Text:** {item['text'][:100]}...")
-                st.audio(item['audio_file'], format=f"audio/{item['format']}")
-                st.download_button(
-                    label=f"Download ({idx+1})",
-                    data=open(item['audio_file'], "rb").read(),
-                    file_name=f"speech_{idx+1}.{item['format']}",
-                    mime=f"audio/{item['format']}",
-                    key=f"download_{idx}"
+                # The file is only read when the entry's audio is loaded
+                render_lazy_audio(
+                    item['audio_file'],
+                    item['format'],
+                    f"speech_{item['number']}.{item['format']}",
+                    key=f"tts_{item['id']}"
                 )
 
         # Clear history button
         if st.button("Clear TTS History"):
-            st.session_state.tts_history = []
+            clear_history("tts")
             st.rerun()
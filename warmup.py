@@ -0,0 +1,248 @@
+"""
+Warm-up for NexusAI
+This module preloads heavy modules and process-wide resources at server boot and writes a readiness report with timings.
+
+Everything warmed here is a process-wide singleton (index manager, history store, provider clients,
+embedding model, cross-encoder), so it only helps when the server runs in the same process; see
+serve.py. Steps are chosen with NEXUSAI_WARMUP, e.g. "modules,index,history,clients,embeddings,reranker,probe",
+and for the HTTP API with NEXUSAI_API_WARMUP.
+"""
+
+import os
+import json
+import time
+import tempfile
+import importlib
+import threading
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+from concurrency import run_concurrently
+
+DEFAULT_STEPS = "modules,index,history,clients,embeddings,reranker"
+# The API serves requests through service.py, which builds synchronous clients per request and never
+# touches the page histories, so priming the pages' async clients or importing the pages would be wasted
+DEFAULT_API_STEPS = "index,embeddings,reranker"
+
+# The page modules and the heavy libraries behind them, imported in this order
+PRELOAD_MODULES = (
+    "chat_module",
+    "image_analysis_module",
+    "image_generation_module",
+    "tts_module",
+    "stt_module",
+    "document_chat",
+    "document_chat_module",
+    "diagnostics_module",
+)
+
+class WarmupSkipped(Exception):
+    """Raised by a warm-up step that has nothing to do, e.g. because a provider isn't configured"""
+
+def _timeout() -> float:
+    """Seconds a single warm-up request may take"""
+    return float(os.getenv("NEXUSAI_WARMUP_TIMEOUT_SECONDS", "10"))
+
+def warm_modules() -> str:
+    """Import the page modules so the first rerun of each page doesn't pay for langchain, chroma and the SDKs"""
+    for name in PRELOAD_MODULES:
+        importlib.import_module(name)
+    return f"{len(PRELOAD_MODULES)} modules"
+
+def warm_index() -> str:
+    """Open the Chroma database and load every shared workspace's vector index"""
+    from index_manager import get_index_manager
+
+    loaded = get_index_manager().preload()
+    return f"{loaded} shared collections"
+
+def warm_history() -> str:
+    """Open the history database, creating its schema and pruning expired histories"""
+    from history_store import get_history_store
+
+    store = get_history_store()
+    return "full-text search" if store.full_text else "substring search"
+
+def _prime(client: Any) -> str:
+    """Open a pooled connection to a provider with a cheap request; any HTTP answer will do"""
+    from async_providers import get_provider_loop, wait
+
+    started = time.perf_counter()
+    try:
+        wait(get_provider_loop().submit(client.with_options(timeout=_timeout(), max_retries=0).models.list()))
+        outcome = "ok"
+    except Exception as e:
+        # A status error means the server answered, so the connection is open and pooled
+        status = getattr(e, "status_code", None)
+        if status is None:
+            raise
+        outcome = f"HTTP {status}"
+    return f"{(time.perf_counter() - started) * 1000:.0f} ms ({outcome})"
+
+def warm_clients() -> str:
+    """Start the provider event loop and open a connection for each configured provider"""
+    from async_providers import get_async_client, get_provider_loop
+
+    get_provider_loop()
+    primed = []
+    for provider in ("groq", "whisper", "openai", "azure"):
+        client = get_async_client(provider)
+        if client is not None:
+            primed.append(f"{provider} {_prime(client)}")
+    if not primed:
+        raise WarmupSkipped("no provider API keys set")
+    return ", ".join(primed)
+
+def warm_embeddings() -> str:
+    """Configure Gemini and build the shared embedding model"""
+    import google.generativeai as genai
+    from document_chat import get_embeddings
+
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if not api_key:
+        raise WarmupSkipped("GOOGLE_API_KEY not set")
+    genai.configure(api_key=api_key)
+    get_embeddings(api_key)
+    return "models/embedding-001"
+
+def warm_reranker() -> str:
+    """Load the re-ranking cross-encoder and run it once"""
+    from reranker import get_cross_encoder
+
+    model_name = os.getenv("NEXUSAI_RERANK_MODEL")
+    if not model_name:
+        raise WarmupSkipped("NEXUSAI_RERANK_MODEL not set")
+    cross_encoder = get_cross_encoder()
+    if cross_encoder is None:
+        raise WarmupSkipped("sentence-transformers not installed")
+    cross_encoder.predict([("warm-up", "warm-up")])
+    return model_name
+
+def warm_probe() -> str:
+    """
+    Send a one-token chat completion and embed one query, end to end
+
+    These are real provider calls, billed like any other, but kept out of the provider metrics.
+    """
+    from async_providers import get_async_client, get_provider_loop, wait
+    from document_chat import get_embeddings
+    from service import DEFAULT_CHAT_MODEL
+
+    probed = []
+    client = get_async_client("groq")
+    if client is not None:
+        started = time.perf_counter()
+        wait(get_provider_loop().submit(client.with_options(timeout=_timeout(), max_retries=0).chat.completions.create(
+            model=DEFAULT_CHAT_MODEL,
+            messages=[{"role": "user", "content": "ping"}],
+            max_tokens=1
+        )))
+        probed.append(f"chat {(time.perf_counter() - started) * 1000:.0f} ms")
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if api_key:
+        started = time.perf_counter()
+        # The untracked model underneath the shared wrapper
+        get_embeddings(api_key).embeddings.embed_query("warm-up")
+        probed.append(f"embedding {(time.perf_counter() - started) * 1000:.0f} ms")
+    if not probed:
+        raise WarmupSkipped("no provider API keys set")
+    return ", ".join(probed)
+
+STEPS: Dict[str, Callable[[], str]] = {
+    "modules": warm_modules,
+    "index": warm_index,
+    "history": warm_history,
+    "clients": warm_clients,
+    "embeddings": warm_embeddings,
+    "reranker": warm_reranker,
+    "probe": warm_probe,
+}
+
+_report = None
+_report_lock = threading.Lock()
+
+def get_warmup_report() -> Optional[Dict[str, Any]]:
+    """Get this process's warm-up report, or None if no warm-up ran"""
+    with _report_lock:
+        return _report
+
+def configured_steps(variable: str = "NEXUSAI_WARMUP", default: str = DEFAULT_STEPS) -> List[str]:
+    """Read a comma-separated step list from the environment; "none" disables warm-up"""
+    steps = [step.strip() for step in os.getenv(variable, default).split(",") if step.strip()]
+    return [] if steps == ["none"] else steps
+
+def _ready_file() -> str:
+    """Path of the readiness file"""
+    return os.getenv("NEXUSAI_READY_FILE", os.path.join(tempfile.gettempdir(), "nexusai_ready.json"))
+
+def _run_step(name: str) -> Dict[str, Any]:
+    """Run one step and time it; failures are recorded, not raised"""
+    started = time.perf_counter()
+    try:
+        status, detail = "ok", STEPS[name]()
+    except WarmupSkipped as e:
+        status, detail = "skipped", str(e)
+    except Exception as e:
+        status, detail = "failed", f"{type(e).__name__}: {e}"
+    return {'step': name, 'status': status, 'seconds': round(time.perf_counter() - started, 3), 'detail': detail}
+
+def run_warmup(steps: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Run the warm-up steps and write the readiness file
+
+    Modules are imported first; the other steps then run concurrently. A failed step doesn't stop
+    the server from starting, it only leaves that resource to load on first use.
+
+    Args:
+        steps: Step names, defaulting to NEXUSAI_WARMUP ("none" disables warm-up)
+
+    Returns:
+        dict: {"ready", "started_at", "total_seconds", "steps": [{"step", "status", "seconds", "detail"}]}
+
+    Raises:
+        ValueError: If a step name is unknown
+    """
+    global _report
+    if steps is None:
+        steps = configured_steps()
+    unknown = [step for step in steps if step not in STEPS]
+    if unknown:
+        raise ValueError(f"Unknown warm-up steps: {', '.join(unknown)}")
+
+    path = _ready_file()
+    # A file left by an earlier process must not report this one as ready
+    if os.path.exists(path):
+        os.remove(path)
+
+    started_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    started = time.perf_counter()
+    results = []
+    if "modules" in steps:
+        results.append(_run_step("modules"))
+    rest = [step for step in steps if step != "modules"]
+    for _, result, _ in run_concurrently(_run_step, rest, max_workers=len(rest)):
+        results.append(result)
+    results.sort(key=lambda result: steps.index(result['step']))
+
+    report = {
+        'ready': True,
+        'started_at': started_at,
+        'total_seconds': round(time.perf_counter() - started, 3),
+        'steps': results,
+    }
+    with _report_lock:
+        _report = report
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp_path, path)
+    return report
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Format a warm-up report as log lines"""
+    lines = [f"Warm-up finished in {report['total_seconds']:.2f}s"]
+    for result in report['steps']:
+        lines.append(f"  {result['step']:<10} {result['status']:<7} {result['seconds']:>7.3f}s  {result['detail']}")
+    return "\n".join(lines)